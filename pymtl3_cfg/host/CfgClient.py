@@ -0,0 +1,213 @@
+'''
+==========================================================================
+CfgClient.py
+==========================================================================
+Host-side client for the config protocol of PushPull2ReqRespAdapter.
+
+The client talks to the chip through a CfgTransport, which exchanges one
+PushPullPkt word per cs window: the word sent by the host is pushed at
+the end of the window, and the word received in the same window was
+pulled at its start. Requests from any number of coroutines are queued
+and sent one per window by a single pump task, and every response is
+matched to the oldest outstanding request with the same type and
+address, so many reads and writes can be in flight at once:
+
+  client = CfgClient( transport, CfgPkt )
+  await client.write_many( [ ( 0x1000, 0xc0de ), ( 0x2000, 0xf00d ) ] )
+  data = await client.read_many( [ 0x1000, 0x2000 ] )
+
+Backpressure: a request pushed while the request queue of the adapter is
+full is dropped, and the host only learns how full the queue is from
+the word pulled at the start of a window, after it has started to send
+its own word. The client therefore decides whether to send a request in
+a window from the word received in the previous window. The queue only
+drains between two windows, so:
+
+ - without credits, a request is only sent if the previous window
+   reported no stall and did not carry a request itself, i.e., at most
+   one request every two windows;
+ - with credits (see PushPull2ReqRespAdapter), a request is sent if the
+   credits reported by the previous window cover the request sent in
+   it, so the client can send a request in every window.
+
+Windows without a request carry an invalid word and only pull a
+response. The client gives up with a TimeoutError if no response
+arrives in max_poll_windows windows while requests are outstanding.
+'''
+import abc
+import asyncio
+from collections import deque
+
+from pymtl3 import *
+
+from ..ifcs.msg_types import CfgType
+from ..spi.PushPull2ReqRespAdapter import credit_nbits, mk_push_pull_bitstruct
+
+#-------------------------------------------------------------------------
+# CfgTransport
+#-------------------------------------------------------------------------
+# A link to the SPI minion of a chip. nbits is the width of the words.
+
+class CfgTransport( abc.ABC ):
+  nbits = 0
+
+  # Sends word in one cs window and returns the word received in it
+  @abc.abstractmethod
+  async def exchange( s, word ):
+    ...
+
+#-------------------------------------------------------------------------
+# CfgClient
+#-------------------------------------------------------------------------
+# num_entries and credits must match the PushPull2ReqRespAdapter of the
+# chip.
+
+class CfgClient:
+  def __init__( s, transport, Cfg, num_entries=2, credits=False,
+                max_poll_windows=256 ):
+    s.transport        = transport
+    s.Cfg              = Cfg
+    s.credits          = credits
+    s.max_poll_windows = max_poll_windows
+
+    cnt_nbits     = credit_nbits( num_entries ) if credits else 0
+    s.PushPullPkt = mk_push_pull_bitstruct( Cfg, cnt_nbits )
+    assert transport.nbits == s.PushPullPkt.nbits
+
+    s.reqs     = deque() # requests and their futures, in send order
+    s.waiting  = {}      # (type_, addr) -> futures of sent requests
+    s.nwaiting = 0
+    s.can_send = True    # the request queue is empty after reset
+    s.pump     = None
+
+    # Statistics
+    s.nwindows = 0
+    s.nstalls  = 0 # windows that kept the client from sending
+
+  #-----------------------------------------------------------------------
+  # API
+  #-----------------------------------------------------------------------
+
+  # Writes data to every addr of a list of (addr, data) pairs. Posted
+  # writes complete once they have been sent.
+  async def write_many( s, writes, posted=False ):
+    type_ = CfgType.POSTED_WRITE if posted else CfgType.WRITE
+    await asyncio.gather( *[ s.submit( s.Cfg( type_, addr, data ), posted )
+                             for addr, data in writes ] )
+
+  # Returns the data of every address in addrs
+  async def read_many( s, addrs ):
+    resps = await asyncio.gather( *[ s.submit( s.Cfg( CfgType.READ, addr, 0 ) )
+                                     for addr in addrs ] )
+    return [ int( resp.data ) for resp in resps ]
+
+  async def write( s, addr, data, posted=False ):
+    await s.write_many( [ ( addr, data ) ], posted )
+
+  async def read( s, addr ):
+    return ( await s.read_many( [ addr ] ) )[0]
+
+  # Waits for all earlier requests to the terminal of addr, including
+  # posted writes. A fence only covers one terminal (see CfgType), so
+  # fence_many takes an address in every terminal to wait for.
+  async def fence( s, addr ):
+    await s.fence_many( [ addr ] )
+
+  async def fence_many( s, addrs ):
+    await asyncio.gather( *[ s.submit( s.Cfg( CfgType.FENCE, addr, 0 ) )
+                             for addr in addrs ] )
+
+  # Read-modify-write operations on the register at addr, which return
+  # the old value of the register. masked_write needs a Cfg type with a
+  # mask field.
+  async def set_bits( s, addr, bits ):
+    return await s.rmw( CfgType.SET_BITS, addr, bits )
+
+  async def clear_bits( s, addr, bits ):
+    return await s.rmw( CfgType.CLEAR_BITS, addr, bits )
+
+  async def toggle_bits( s, addr, bits ):
+    return await s.rmw( CfgType.TOGGLE_BITS, addr, bits )
+
+  async def masked_write( s, addr, data, mask ):
+    return await s.rmw( CfgType.MASKED_WRITE, addr, data, mask )
+
+  async def rmw( s, type_, addr, data, *mask ):
+    resp = await s.submit( s.Cfg( type_, addr, data, *mask ) )
+    return int( resp.data )
+
+  # Queues a request and returns a future of its response
+  def submit( s, pkt, posted=False ):
+    future = asyncio.get_running_loop().create_future()
+    s.reqs.append( ( pkt, future, posted ) )
+    if s.pump is None or s.pump.done():
+      s.pump = asyncio.ensure_future( s.run() )
+    return future
+
+  #-----------------------------------------------------------------------
+  # Pump
+  #-----------------------------------------------------------------------
+
+  async def run( s ):
+    try:
+      idle = 0
+      while s.reqs or s.nwaiting:
+        sent = bool( s.reqs ) and s.can_send
+        if sent:
+          pkt, future, posted = s.reqs.popleft()
+          word = s.PushPullPkt( 1, 0, payload=pkt )
+          if posted:
+            future.set_result( None )
+          else:
+            key = ( int( pkt.type_ ), int( pkt.addr ) )
+            s.waiting.setdefault( key, deque() ).append( future )
+            s.nwaiting += 1
+        else:
+          word = s.PushPullPkt( 0, 0, payload=s.Cfg() )
+
+        word = await s.transport.exchange( int( word.to_bits() ) )
+        msg  = s.PushPullPkt.from_bits( Bits( s.PushPullPkt.nbits, word ) )
+        s.nwindows += 1
+
+        if s.credits:
+          s.can_send = msg.credits > int( sent )
+        else:
+          s.can_send = not msg.stall and not sent
+        if s.reqs and not s.can_send:
+          s.nstalls += 1
+
+        if msg.valid:
+          s.deliver( msg.payload )
+          idle = 0
+        elif not sent:
+          idle += 1
+          if idle > s.max_poll_windows:
+            raise TimeoutError( f'no response in {idle} windows with '
+                                f'{s.nwaiting} requests outstanding' )
+
+    # The requests get the error, the pump task ends quietly
+    except Exception as e:
+      s.fail( e )
+    except asyncio.CancelledError as e:
+      s.fail( e )
+      raise
+
+  def deliver( s, resp ):
+    key     = ( int( resp.type_ ), int( resp.addr ) )
+    futures = s.waiting.get( key )
+    if not futures:
+      raise RuntimeError( f'response {resp} matches no request' )
+    s.nwaiting -= 1
+    futures.popleft().set_result( resp )
+
+  # Fails all queued and outstanding requests
+  def fail( s, e ):
+    futures = [ future for _, future, _ in s.reqs ]
+    for q in s.waiting.values():
+      futures.extend( q )
+    s.reqs.clear()
+    s.waiting.clear()
+    s.nwaiting = 0
+    for future in futures:
+      if not future.done():
+        future.set_exception( e )
@@ -0,0 +1,113 @@
+'''
+==========================================================================
+SimTransport.py
+==========================================================================
+A CfgTransport backed by a PyMTL simulation of the SPI config stack, to
+run host code without hardware.
+
+SimChip is the stack of a chip behind its SPI pins: a SpiMinion, a
+PushPull2ReqRespAdapter and a ReqRespRouter with one terminal per region
+of an address map. The host side of the pins is driven by a SpiMaster,
+so every word goes through the same cs windows as on a real SPI link.
+
+  transport = SimTransport( CfgPkt, [ ( 0x0000, 0x1000 ),
+                                      ( 0x1000, 0x1000 ) ] )
+  client    = CfgClient( transport, CfgPkt )
+
+TerminalType is instantiated as TerminalType( Cfg, num_config_regs,
+num_status_regs ) for every region, e.g., ConfigTerminal or
+ConfigTerminalFL.
+'''
+import asyncio
+
+from pymtl3 import *
+from pymtl3.stdlib.stream.ifcs import IStreamIfc, OStreamIfc
+
+from ..router.AddressMapRoutingLogic import mk_address_map_routing_logic
+from ..router.ReqRespRouter import ReqRespRouter
+from ..spi.PushPull2ReqRespAdapter import PushPull2ReqRespAdapter
+from ..spi.SpiMaster import SpiMaster
+from ..spi.SpiMinion import SpiMinion
+from ..terminal.ConfigTerminal import ConfigTerminal
+from .CfgClient import CfgTransport
+
+#-------------------------------------------------------------------------
+# SimChip
+#-------------------------------------------------------------------------
+# recv takes the words to send, send returns the received words
+
+class SimChip( Component ):
+  def construct( s, Cfg, address_map, num_config_regs=4, num_status_regs=0,
+                 num_entries=2, credits=False, half_period=4, cs_gap=8,
+                 nlanes=1, TerminalType=ConfigTerminal ):
+    num_terminals = len( address_map )
+
+    s.adapter   = PushPull2ReqRespAdapter( Cfg, num_entries, credits )
+    s.nbits     = s.adapter.PushPullPkt.nbits
+    s.master    = SpiMaster( s.nbits, half_period, cs_gap, nlanes )
+    s.minion    = SpiMinion( s.nbits, nlanes=nlanes )
+    s.router    = ReqRespRouter( Cfg, Bits1,
+                                 mk_address_map_routing_logic( address_map ),
+                                 num_terminals=num_terminals )
+    s.terminals = [ TerminalType( Cfg, num_config_regs, num_status_regs )
+                    for _ in range( num_terminals ) ]
+
+    # Interface
+    s.recv = IStreamIfc( mk_bits( s.nbits ) )
+    s.send = OStreamIfc( mk_bits( s.nbits ) )
+
+    # Connections
+    s.recv //= s.master.recv
+    s.send //= s.master.send
+    s.master.spi_ms //= s.minion.spi_min
+
+    s.minion.push.en //= s.adapter.push.en
+    s.minion.pull.en //= s.adapter.pull.en
+
+    @update
+    def up_push_pull_msg():
+      s.adapter.push.msg @= s.minion.push.msg
+      s.minion.pull.msg  @= s.adapter.pull.msg
+
+    s.adapter.req        //= s.router.minion_req
+    s.router.minion_resp //= s.adapter.resp
+    for i in range( num_terminals ):
+      s.router.master_req[i]     //= s.terminals[i].minion_req
+      s.terminals[i].minion_resp //= s.router.master_resp[i]
+
+  def line_trace( s ):
+    return f'{s.master.line_trace()} {s.adapter.line_trace()}'
+
+#-------------------------------------------------------------------------
+# SimTransport
+#-------------------------------------------------------------------------
+# Simulates the chip one window at a time. The parameters are those of
+# SimChip.
+
+class SimTransport( CfgTransport ):
+  def __init__( s, Cfg, address_map, **params ):
+    s.chip = SimChip( Cfg, address_map, **params )
+    s.chip.elaborate()
+    s.chip.apply( DefaultPassGroup() )
+    s.chip.recv.val @= 0
+    s.chip.send.rdy @= 1
+    s.chip.sim_reset()
+    s.nbits = s.chip.nbits
+
+  async def exchange( s, word ):
+    chip = s.chip
+    chip.recv.val @= 1
+    chip.recv.msg @= word
+    while not chip.recv.rdy:
+      chip.sim_tick()
+    chip.sim_tick()
+    chip.recv.val @= 0
+
+    while not chip.send.val:
+      chip.sim_tick()
+    word = int( chip.send.msg )
+    chip.sim_tick()
+
+    # Let other tasks run between windows
+    await asyncio.sleep( 0 )
+    return word
@@ -0,0 +1,149 @@
+'''
+==========================================================================
+CfgClient_test.py
+==========================================================================
+Test cases for CfgClient on a simulated chip.
+'''
+import asyncio
+
+import pytest
+
+from pymtl3 import *
+from pymtl3.stdlib.stream.ifcs import IStreamIfc, OStreamIfc
+
+from ...ifcs.msg_types import mk_cfg_pkt_type
+from ...terminal.ConfigTerminal import ConfigTerminal
+from ...test_utils import BurstyGate
+from ..CfgClient import CfgClient, CfgTransport
+from ..SimTransport import SimTransport
+
+# Three type bits for fences
+CfgPkt = mk_cfg_pkt_type( type_nbits=3, addr_nbits=16, data_nbits=32 )
+
+address_map = [ ( 0x1000 * i, 0x1000 ) for i in range( 4 ) ]
+
+def mk_client( credits=False, **params ):
+  transport = SimTransport( CfgPkt, address_map, credits=credits,
+                            half_period=3, cs_gap=2, **params )
+  return CfgClient( transport, CfgPkt, credits=credits ), transport.chip
+
+# A ConfigTerminal behind a gate that blocks requests for a while after
+# every two requests, so that the request queue of the adapter fills up
+
+class GatedTerminal( Component ):
+  def construct( s, Cfg, num_config_regs, num_status_regs ):
+    s.gate     = BurstyGate( Cfg, period=2, stall_cycles=1500 )
+    s.terminal = ConfigTerminal( Cfg, num_config_regs, num_status_regs )
+
+    s.minion_req  = IStreamIfc( Cfg )
+    s.minion_resp = OStreamIfc( Cfg )
+
+    s.minion_req //= s.gate.istream
+    s.gate.ostream //= s.terminal.minion_req
+    s.minion_resp //= s.terminal.minion_resp
+
+#-------------------------------------------------------------------------
+# Tests
+#-------------------------------------------------------------------------
+
+def test_transport_abstract():
+  # A transport must implement exchange
+  class NoExchange( CfgTransport ):
+    nbits = 8
+
+  with pytest.raises( TypeError ):
+    NoExchange()
+
+@pytest.mark.parametrize( "credits", [ False, True ] )
+def test_write_read( credits ):
+  client, chip = mk_client( credits )
+  writes = [ ( 0x1000 * i + i, 0xc0de0000 + i ) for i in range( 4 ) ]
+
+  async def main():
+    await client.write_many( writes )
+    return await client.read_many( [ addr for addr, _ in writes ] )
+
+  assert asyncio.run( main() ) == [ data for _, data in writes ]
+  for i in range( 4 ):
+    assert chip.terminals[i].o_config[i] == 0xc0de0000 + i
+
+def test_concurrent():
+  # Coroutines of different drivers share the link
+  client, _ = mk_client( credits=True )
+
+  async def driver( i ):
+    await client.write( 0x1000 * i, 0xf00d0000 + i )
+    await client.write( 0x1000 * i + 1, 0xbeef0000 + i )
+    return await client.read_many( [ 0x1000 * i + 1, 0x1000 * i ] )
+
+  async def main():
+    return await asyncio.gather( *[ driver( i ) for i in range( 4 ) ] )
+
+  assert asyncio.run( main() ) == [ [ 0xbeef0000 + i, 0xf00d0000 + i ]
+                                    for i in range( 4 ) ]
+
+def test_posted_fence():
+  client, chip = mk_client()
+
+  async def main():
+    await client.write_many( [ ( 0x2000, 0xaaaa ), ( 0x2001, 0xbbbb ),
+                               ( 0x3000, 0xcccc ) ], posted=True )
+    await client.fence_many( [ 0x2000, 0x3000 ] )
+    return [ int( chip.terminals[2].o_config[0] ),
+             int( chip.terminals[2].o_config[1] ),
+             int( chip.terminals[3].o_config[0] ) ]
+
+  assert asyncio.run( main() ) == [ 0xaaaa, 0xbbbb, 0xcccc ]
+
+@pytest.mark.parametrize( "credits", [ False, True ] )
+def test_backpressure( credits ):
+  # All requests go to one terminal, and there are more of them than
+  # the queues on the way can hold
+  client, _ = mk_client( credits, TerminalType=GatedTerminal )
+  writes = [ ( i % 4, 0xc0de0000 + i ) for i in range( 8 ) ]
+
+  async def main():
+    await client.write_many( writes )
+    return await client.read_many( range( 4 ) )
+
+  assert asyncio.run( main() ) == [ 0xc0de0000 + i for i in range( 4, 8 ) ]
+  assert client.nstalls > 0
+
+def test_credits_fewer_windows():
+  writes = [ ( 0x1000 * ( i % 4 ), i ) for i in range( 8 ) ]
+  nwindows = {}
+  for credits in [ False, True ]:
+    client, _ = mk_client( credits )
+    asyncio.run( client.write_many( writes ) )
+    nwindows[credits] = client.nwindows
+  assert nwindows[True] < nwindows[False]
+
+def test_timeout():
+  # Addresses outside the address map are dropped by the router
+  client, _ = mk_client()
+  client.max_poll_windows = 4
+
+  async def main():
+    await client.write( 0x1000, 0x1234 )
+    with pytest.raises( TimeoutError ):
+      await client.read_many( [ 0x0000, 0x8000 ] )
+
+  asyncio.run( main() )
+
+def test_rmw():
+  # MASKED_WRITE needs a 4-bit type field and a mask field
+  RmwPkt    = mk_cfg_pkt_type( type_nbits=4, addr_nbits=16, data_nbits=32,
+                               mask=True )
+  transport = SimTransport( RmwPkt, address_map, half_period=3, cs_gap=2 )
+  client    = CfgClient( transport, RmwPkt )
+
+  async def main():
+    await client.write( 0x1001, 0x00ff )
+    return [ await client.set_bits    ( 0x1001, 0x0f00 ),
+             await client.clear_bits  ( 0x1001, 0x000f ),
+             await client.toggle_bits ( 0x1001, 0xffff ),
+             await client.masked_write( 0x1001, 0x1234, 0x00f0 ),
+             await client.read        ( 0x1001 ) ]
+
+  assert asyncio.run( main() ) == [ 0x00ff, 0x0fff, 0x0ff0, 0xf00f, 0xf03f ]
+  assert transport.chip.terminals[1].o_config[1] == 0xf03f
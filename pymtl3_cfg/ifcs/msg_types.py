@@ -13,9 +13,44 @@ from pymtl3 import *
 # CfgType
 #-------------------------------------------------------------------------
 
+# A BURST_WRITE packet is a burst header: addr is the base address and
+# data is the number of data beats that follow. Each beat is a packet
+# carrying the same type and base address with the next data word. The
+# terminal writes the beats to consecutive addresses starting from the
+# base address and sends back a single response after the last beat (or
+# right away for a zero-length burst).
+#
+# A POSTED_WRITE is a write that the terminal performs without sending
+# back a response. A FENCE does not access any register; the terminal
+# responds to it once all earlier requests to it, including posted
+# writes, have been performed. FENCE needs a type field of at least 3
+# bits.
+#
+# A FENCE is routed by its address like any other request, so it only
+# orders the requests to one terminal and the host sends one fence to
+# every terminal it has sent posted writes to. The router does not
+# broadcast fences or merge their responses.
+#
+# SET_BITS, CLEAR_BITS and TOGGLE_BITS are read-modify-write operations
+# that a ConfigTerminal performs on a config register in a single
+# transaction: the register is ORed with data, ANDed with the inverse of
+# data or XORed with data, respectively. A MASKED_WRITE only writes the
+# bits of data that are set in the mask field of the packet. The response
+# to all four carries the value of the register before the operation.
+# SET_BITS, CLEAR_BITS and TOGGLE_BITS need a type field of at least 3
+# bits, MASKED_WRITE needs a type field of at least 4 bits and a packet
+# type made with mask=True.
+
 class CfgType:
-  WRITE = 0
-  READ  = 1
+  WRITE        = 0
+  READ         = 1
+  BURST_WRITE  = 2
+  POSTED_WRITE = 3
+  FENCE        = 4
+  SET_BITS     = 5
+  CLEAR_BITS   = 6
+  TOGGLE_BITS  = 7
+  MASKED_WRITE = 8
 
 #-------------------------------------------------------------------------
 # CfgReq
@@ -47,12 +82,22 @@ class CfgType:
 #   addr  : Bits17
 #   data  : Bits32
 
+# With mask=True the packet has a mask field as wide as the data field
+# for MASKED_WRITE. The mask field is the last field, so a packet can
+# still be built with only type_, addr and data.
+
 def mk_cfg_pkt_type( type_nbits=2, addr_nbits=16, data_nbits=32,
-                     prefix='CfgPkt'):
+                     prefix='CfgPkt', mask=False ):
   new_name = f'{prefix}_{type_nbits}_{addr_nbits}_{data_nbits}'
-  str_method = lambda s: f'{s.type_}:{s.addr}:{s.data}'
-  return mk_bitstruct( new_name, {
+  fields = {
     'type_' : mk_bits(type_nbits),
     'addr'  : mk_bits(addr_nbits),
     'data'  : mk_bits(data_nbits),
-  }, namespace={ '__str__' : str_method})
+  }
+  if mask:
+    new_name += '_mask'
+    fields['mask'] = mk_bits(data_nbits)
+    str_method = lambda s: f'{s.type_}:{s.addr}:{s.data}:{s.mask}'
+  else:
+    str_method = lambda s: f'{s.type_}:{s.addr}:{s.data}'
+  return mk_bitstruct( new_name, fields, namespace={ '__str__' : str_method})
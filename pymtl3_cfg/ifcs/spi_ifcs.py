@@ -4,6 +4,11 @@ spi_ifcs.py
 ==========================================================================
 Master and minion SPI interfaces.
 
+Both interfaces are parameterized by the number of data lanes. With
+nlanes > 1, mosi and miso are nlanes bits wide and nlanes bits are
+transferred on each sclk edge, most significant bits first. Lane i
+carries bit i of each group of nlanes bits.
+
 Author : Kyle Infantino, Yanghui Ou
   Date : Mar 22, 2022
 '''
@@ -23,11 +28,11 @@ def _spi_to_str( s ):
 
 class SpiMasterIfc( Interface ):
 
-  def construct( s ):
+  def construct( s, nlanes=1 ):
     s.cs    = OutPort()
     s.sclk  = OutPort()
-    s.mosi  = OutPort()
-    s.miso  = InPort()
+    s.mosi  = OutPort( nlanes )
+    s.miso  = InPort ( nlanes )
 
   def __str__( s ):
     return f"{s.sclk}|{s.cs}|{s.mosi}|{s.miso}"
@@ -38,11 +43,11 @@ class SpiMasterIfc( Interface ):
 
 class SpiMinionIfc( Interface ):
 
-  def construct( s ):
+  def construct( s, nlanes=1 ):
     s.cs    = InPort()
     s.sclk  = InPort()
-    s.mosi  = InPort()
-    s.miso  = OutPort()
+    s.mosi  = InPort ( nlanes )
+    s.miso  = OutPort( nlanes )
 
   def __str__( s ):
     return f"{s.sclk}|{s.cs}|{s.mosi}|{s.miso}"
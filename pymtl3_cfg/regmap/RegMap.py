@@ -0,0 +1,206 @@
+'''
+==========================================================================
+RegMap.py
+==========================================================================
+A register map of the config fabric, from which the terminals, the
+routing logic and the host-side addresses are generated.
+
+A register map is a list of blocks. Each block is served by one
+ConfigTerminal and holds named config registers followed by named
+status registers, which is the order in which the terminal indexes its
+registers by the LSBs of the address:
+
+  regmap = RegMap([
+    Block( 'clkgen', 0x0000, config_regs=[ 'div', 'en' ] ),
+    Block( 'accel',  0x0010, config_regs=[ 'mode' ],
+                             status_regs=[ 'busy', 'errors', 'cycles' ] ),
+  ])
+  regmap.addr( 'accel.busy' )                  # 0x0011
+  terminals    = regmap.mk_terminals( CfgPkt ) # one per block
+  RoutingLogic = regmap.mk_routing_logic()     # block i on outport i
+
+A ConfigTerminal only decodes csr_addr_nbits LSBs of the address, so a
+block whose region is larger than its registers need would make the
+terminal answer for addresses that alias its registers, and a block
+that is not aligned to its size would shift the registers. The size of a
+block therefore defaults to the smallest power of two that holds its
+registers, and a given size must be a power of two that is not larger
+than the registers need. Blocks must be aligned to their size, must not
+overlap and must fit in addr_nbits address bits. These rules, as well as
+unique block and register names, are checked when the RegMap is built.
+
+The routing logic is a TableRoutingLogic with one page per smallest
+block if the table needs at most max_pages pages. The table spans the
+address space from 0 to the end of the last block, so a sparse map,
+e.g., a small block at 0x0000 and another at 0x8000, would need
+thousands of pages. Such maps are routed by an AddressMapRoutingLogic
+instead, whose size only grows with the number of blocks. A register
+map can also be read from a dict, e.g., parsed from JSON, with
+from_dict:
+
+  { "addr_nbits": 16,
+    "blocks": [ { "name": "clkgen", "base": "0x0000",
+                  "config_regs": [ "div", "en" ] }, ... ] }
+'''
+import json
+from dataclasses import dataclass, field, replace
+
+from pymtl3 import *
+
+from ..router.AddressMapRoutingLogic import mk_address_map_routing_logic
+from ..router.TableRoutingLogic import mk_table_routing_logic
+from ..terminal.ConfigTerminal import ConfigTerminal
+
+#-------------------------------------------------------------------------
+# Block
+#-------------------------------------------------------------------------
+# size is the number of addresses of the block, 0 for the smallest size
+
+@dataclass
+class Block:
+  name        : str
+  base        : int
+  config_regs : list = field( default_factory=list )
+  status_regs : list = field( default_factory=list )
+  size        : int  = 0
+
+  @property
+  def regs( s ):
+    return list( s.config_regs ) + list( s.status_regs )
+
+  # Address bits decoded by the ConfigTerminal of the block
+  @property
+  def csr_addr_nbits( s ):
+    return max( clog2( len( s.regs ) ), 1 )
+
+  @property
+  def end( s ):
+    return s.base + s.size
+
+#-------------------------------------------------------------------------
+# RegMap
+#-------------------------------------------------------------------------
+
+class RegMap:
+  def __init__( s, blocks, addr_nbits=16 ):
+    s.addr_nbits = addr_nbits
+
+    assert len( blocks ) > 0, 'the register map has no blocks'
+    names = [ blk.name for blk in blocks ]
+    for name in names:
+      assert names.count( name ) == 1, f'block {name} is defined twice'
+    s.blocks = [ s._check_block( blk ) for blk in blocks ]
+
+    # Check for overlapping blocks
+    by_base = sorted( s.blocks, key=lambda blk: blk.base )
+    for blk0, blk1 in zip( by_base, by_base[1:] ):
+      assert blk0.end <= blk1.base, \
+        f'block {blk0.name} at {blk0.base:#x} overlaps block {blk1.name} ' \
+        f'at {blk1.base:#x}'
+
+    # Name -> address index
+    s.index = {}
+    for blk in s.blocks:
+      for i, reg in enumerate( blk.regs ):
+        s.index[ f'{blk.name}.{reg}' ] = blk.base + i
+    s.names = { addr: name for name, addr in s.index.items() }
+
+  # Returns a copy of the block with its size filled in
+  def _check_block( s, blk ):
+    regs = blk.regs
+    assert len( regs ) > 0, f'block {blk.name} has no registers'
+    assert '.' not in blk.name, f'block name {blk.name} contains a dot'
+    for reg in regs:
+      assert regs.count( reg ) == 1, \
+        f'register {reg} is defined twice in block {blk.name}'
+
+    min_size = 2**blk.csr_addr_nbits
+    blk = replace( blk, size=blk.size or min_size )
+    assert blk.size & ( blk.size - 1 ) == 0, \
+      f'size {blk.size:#x} of block {blk.name} is not a power of two'
+    assert blk.size >= len( regs ), \
+      f'block {blk.name} is too small for its {len( regs )} registers'
+    assert blk.size <= min_size, \
+      f'addresses from {blk.base + min_size:#x} in block {blk.name} ' \
+      f'alias its registers, the size must be at most {min_size:#x}'
+    assert blk.base % blk.size == 0, \
+      f'block {blk.name} at {blk.base:#x} is not aligned to its size ' \
+      f'{blk.size:#x}'
+    assert 0 <= blk.base and blk.end <= 2**s.addr_nbits, \
+      f'block {blk.name} does not fit in {s.addr_nbits} address bits'
+    return blk
+
+  #-----------------------------------------------------------------------
+  # Host side
+  #-----------------------------------------------------------------------
+
+  # Returns the address of a register named 'block.reg'
+  def addr( s, name ):
+    return s.index[name]
+
+  def addrs( s, names ):
+    return [ s.index[name] for name in names ]
+
+  # Returns the name of the register at addr, or None
+  def name_of( s, addr ):
+    return s.names.get( addr )
+
+  def block( s, name ):
+    return s.blocks[ s.outport( name ) ]
+
+  # Returns the output port of the router that a block is connected to
+  def outport( s, name ):
+    for i, blk in enumerate( s.blocks ):
+      if blk.name == name:
+        return i
+    raise KeyError( name )
+
+  #-----------------------------------------------------------------------
+  # Hardware
+  #-----------------------------------------------------------------------
+
+  def terminal_params( s, name ):
+    blk = s.block( name )
+    return { 'num_config_regs' : len( blk.config_regs ),
+             'num_status_regs' : len( blk.status_regs ) }
+
+  # Returns a terminal for every block, in the order of the blocks
+  def mk_terminals( s, Cfg, TerminalType=ConfigTerminal, **params ):
+    assert Cfg.get_field_type( 'addr' ).nbits == s.addr_nbits
+    return [ TerminalType( Cfg, **s.terminal_params( blk.name ), **params )
+             for blk in s.blocks ]
+
+  # The (base, size) regions for mk_address_map_routing_logic
+  def address_map( s ):
+    return [ ( blk.base, blk.size ) for blk in s.blocks ]
+
+  def mk_routing_logic( s, default_outport=None, max_pages=64 ):
+    page_nbits = clog2( min( blk.size for blk in s.blocks ) )
+    num_pages  = max( blk.end for blk in s.blocks ) >> page_nbits
+    if num_pages > max_pages:
+      return mk_address_map_routing_logic( s.address_map(), default_outport )
+
+    table      = [ 0 ] * num_pages
+    for i, blk in enumerate( s.blocks ):
+      for page in range( blk.base >> page_nbits, blk.end >> page_nbits ):
+        table[page] = 1 << i
+    return mk_table_routing_logic( table, page_nbits, default_outport )
+
+  #-----------------------------------------------------------------------
+  # Loading
+  #-----------------------------------------------------------------------
+  # Addresses and sizes may be given as integers or strings like '0x10'
+
+  @staticmethod
+  def from_dict( spec ):
+    to_int = lambda v: int( v, 0 ) if isinstance( v, str ) else v
+    blocks = [ Block( blk['name'], to_int( blk['base'] ),
+                      list( blk.get( 'config_regs', [] ) ),
+                      list( blk.get( 'status_regs', [] ) ),
+                      to_int( blk.get( 'size', 0 ) ) )
+               for blk in spec['blocks'] ]
+    return RegMap( blocks, spec.get( 'addr_nbits', 16 ) )
+
+  @staticmethod
+  def from_json( text ):
+    return RegMap.from_dict( json.loads( text ) )
@@ -0,0 +1,196 @@
+'''
+==========================================================================
+RegMap_test.py
+==========================================================================
+Test cases for RegMap.
+'''
+import pytest
+
+from pymtl3 import *
+from pymtl3.stdlib.stream import StreamSinkFL, StreamSourceFL
+from pymtl3.stdlib.test_utils import run_sim
+
+from ...ifcs.msg_types import CfgType, mk_cfg_pkt_type
+from ...router.ReqRespRouter import ReqRespRouter
+from ...terminal.ConfigTerminalFL import ConfigTerminalFL
+from ..RegMap import Block, RegMap
+
+CfgPkt = mk_cfg_pkt_type( type_nbits=2, addr_nbits=16, data_nbits=32 )
+wr = CfgType.WRITE
+rd = CfgType.READ
+
+def mk_regmap():
+  return RegMap([
+    Block( 'clkgen', 0x0000, config_regs=[ 'div', 'en' ] ),
+    Block( 'accel',  0x0010, config_regs=[ 'mode' ],
+                             status_regs=[ 'busy', 'errors', 'cycles' ] ),
+    Block( 'pads',   0x0100, config_regs=[ f'pad{i}' for i in range( 5 ) ] ),
+    Block( 'dbg',    0x1000, status_regs=[ 'id' ], size=2 ),
+  ])
+
+#-------------------------------------------------------------------------
+# Tests
+#-------------------------------------------------------------------------
+
+def test_index():
+  regmap = mk_regmap()
+  assert regmap.addr( 'clkgen.en' )     == 0x0001
+  assert regmap.addr( 'accel.mode' )    == 0x0010
+  assert regmap.addr( 'accel.cycles' )  == 0x0013
+  assert regmap.addr( 'pads.pad4' )     == 0x0104
+  assert regmap.addr( 'dbg.id' )        == 0x1000
+  assert regmap.addrs( [ 'clkgen.div', 'accel.busy' ] ) == [ 0x0000, 0x0011 ]
+  assert regmap.name_of( 0x0012 ) == 'accel.errors'
+  assert regmap.name_of( 0x0014 ) is None
+
+  assert [ blk.size for blk in regmap.blocks ] == [ 2, 4, 8, 2 ]
+  assert regmap.terminal_params( 'accel' ) == \
+    { 'num_config_regs' : 1, 'num_status_regs' : 3 }
+  assert regmap.outport( 'pads' ) == 2
+
+def test_blocks_unchanged():
+  # The sizes are filled in on copies, so the blocks can be reused
+  blocks = [ Block( 'a', 0x0000, config_regs=[ 'x', 'y', 'z' ] ),
+             Block( 'b', 0x0004, config_regs=[ 'x' ] ) ]
+  regmap = RegMap( blocks )
+  assert [ blk.size for blk in blocks ] == [ 0, 0 ]
+  assert [ blk.size for blk in regmap.blocks ] == [ 4, 2 ]
+  assert RegMap( blocks, addr_nbits=8 ).address_map() == \
+    regmap.address_map()
+
+def test_from_json():
+  regmap = RegMap.from_json( '''{
+    "addr_nbits": 16,
+    "blocks": [
+      { "name": "clkgen", "base": "0x0000", "config_regs": [ "div", "en" ] },
+      { "name": "accel", "base": 16, "config_regs": [ "mode" ],
+        "status_regs": [ "busy", "errors", "cycles" ] },
+      { "name": "pads", "base": "0x100",
+        "config_regs": [ "pad0", "pad1", "pad2", "pad3", "pad4" ] },
+      { "name": "dbg", "base": "0x1000", "status_regs": [ "id" ],
+        "size": "0x2" }
+    ]
+  }''' )
+  ref = mk_regmap()
+  assert regmap.index  == ref.index
+  assert regmap.blocks == ref.blocks
+
+@pytest.mark.parametrize( "blocks, msg", [
+  ( [ Block( 'a', 0x00, [ 'x', 'y', 'z' ] ), Block( 'b', 0x02, [ 'x' ] ) ],
+    'block a at 0x0 overlaps block b' ),
+  ( [ Block( 'a', 0x00, [ 'x', 'y' ], size=0x10 ) ],
+    'addresses from 0x2 in block a alias its registers' ),
+  ( [ Block( 'a', 0x02, [ 'x', 'y', 'z' ] ) ],
+    'block a at 0x2 is not aligned' ),
+  ( [ Block( 'a', 0x00, [ 'x', 'y', 'z' ], size=3 ) ],
+    'not a power of two' ),
+  ( [ Block( 'a', 0x00, [ 'x', 'y', 'z' ], size=2 ) ],
+    'too small for its 3 registers' ),
+  ( [ Block( 'a', 0xfffe, [ 'x', 'y', 'z' ] ) ],
+    'is not aligned' ),
+  ( [ Block( 'a', 0x10000, [ 'x' ] ) ],
+    'does not fit in 16 address bits' ),
+  ( [ Block( 'a', 0x00, [ 'x' ] ), Block( 'a', 0x10, [ 'y' ] ) ],
+    'block a is defined twice' ),
+  ( [ Block( 'a', 0x00, [ 'x' ], [ 'x' ] ) ],
+    'register x is defined twice' ),
+  ( [ Block( 'a', 0x00 ) ],
+    'block a has no registers' ),
+])
+def test_errors( blocks, msg ):
+  with pytest.raises( AssertionError, match=msg ):
+    RegMap( blocks )
+
+def mk_route( regmap, **params ):
+  RoutingLogic = regmap.mk_routing_logic( **params )
+  dut = RoutingLogic( CfgPkt, Bits1, len( regmap.blocks ) )
+  dut.elaborate()
+  dut.apply( DefaultPassGroup() )
+  dut.sim_reset()
+
+  def route( addr ):
+    dut.i_pkt @= CfgPkt( rd, addr, 0 )
+    dut.sim_eval_combinational()
+    return int( dut.o_val )
+
+  return RoutingLogic.__name__, route
+
+# The map spans 0x801 pages of two addresses
+@pytest.mark.parametrize( "max_pages, name", [
+  ( 4096, 'TableRoutingLogic' ), ( 64, 'AddressMapRoutingLogic' ),
+])
+def test_routing_logic( max_pages, name ):
+  regmap = mk_regmap()
+  logic_name, route = mk_route( regmap, max_pages=max_pages )
+  assert logic_name == name
+
+  for name, addr in regmap.index.items():
+    assert route( addr ) == 1 << regmap.outport( name.split( '.' )[0] )
+  # Holes and addresses past the last block
+  for addr in [ 0x0002, 0x0014, 0x00ff, 0x0108, 0x0fff, 0x1002, 0xffff ]:
+    assert route( addr ) == 0
+
+def test_sparse_routing_logic():
+  # A table would need 0x4001 pages
+  regmap = RegMap([
+    Block( 'lo', 0x0000, config_regs=[ 'a', 'b' ] ),
+    Block( 'hi', 0x8000, config_regs=[ 'c', 'd' ] ),
+  ])
+  logic_name, route = mk_route( regmap )
+  assert logic_name == 'AddressMapRoutingLogic'
+
+  assert [ route( addr ) for addr in [ 0x0000, 0x0001, 0x8000, 0x8001 ] ] \
+      == [ 0b01, 0b01, 0b10, 0b10 ]
+  for addr in [ 0x0002, 0x7fff, 0x8002, 0xffff ]:
+    assert route( addr ) == 0
+
+#-------------------------------------------------------------------------
+# Config fabric
+#-------------------------------------------------------------------------
+# A ReqRespRouter with the routing logic and terminals of a register map.
+# Status register i of every terminal reads 0x5a000000 + i.
+
+class TestHarness( Component ):
+  def construct( s, regmap, req_msgs, resp_msgs ):
+    num_blocks = len( regmap.blocks )
+    s.src  = StreamSourceFL( CfgPkt, req_msgs )
+    s.sink = StreamSinkFL  ( CfgPkt, resp_msgs, ordered=False )
+    s.dut  = ReqRespRouter( CfgPkt, Bits1, regmap.mk_routing_logic(),
+                            num_terminals=num_blocks )
+    s.terminals = regmap.mk_terminals( CfgPkt, ConfigTerminalFL )
+
+    s.src.ostream  //= s.dut.minion_req
+    s.sink.istream //= s.dut.minion_resp
+    for i in range( num_blocks ):
+      s.terminals[i].minion_req  //= s.dut.master_req[i]
+      s.terminals[i].minion_resp //= s.dut.master_resp[i]
+      for j in range( len( regmap.blocks[i].status_regs ) ):
+        s.terminals[i].i_status[j] //= 0x5a000000 + j
+
+  def done( s ):
+    return s.src.done() and s.sink.done()
+
+def test_fabric():
+  regmap = mk_regmap()
+  config = [ f'{blk.name}.{reg}' for blk in regmap.blocks
+             for reg in blk.config_regs ]
+  status = [ ( f'{blk.name}.{reg}', j ) for blk in regmap.blocks
+             for j, reg in enumerate( blk.status_regs ) ]
+
+  req_msgs, resp_msgs = [], []
+  for i, addr in enumerate( regmap.addrs( config ) ):
+    req_msgs  += [ CfgPkt( wr, addr, 0xc0de0000 + i ) ]
+    resp_msgs += [ CfgPkt( wr, addr, 0 ) ]
+  for i, addr in enumerate( regmap.addrs( config ) ):
+    req_msgs  += [ CfgPkt( rd, addr, 0 ) ]
+    resp_msgs += [ CfgPkt( rd, addr, 0xc0de0000 + i ) ]
+  for name, j in status:
+    req_msgs  += [ CfgPkt( rd, regmap.addr( name ), 0 ) ]
+    resp_msgs += [ CfgPkt( rd, regmap.addr( name ), 0x5a000000 + j ) ]
+
+  th = TestHarness( regmap, req_msgs, resp_msgs )
+  run_sim( th )
+  for i, name in enumerate( config ):
+    blk, reg = name.split( '.' )
+    idx = regmap.block( blk ).config_regs.index( reg )
+    assert th.terminals[ regmap.outport( blk ) ].o_config[idx] == 0xc0de0000 + i
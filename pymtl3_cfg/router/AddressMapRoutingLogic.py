@@ -0,0 +1,191 @@
+'''
+==========================================================================
+AddressMapRoutingLogic.py
+==========================================================================
+Routing logic generated from an address map.
+
+The address map is a list of regions. Each region is a tuple
+(base, size) or (base, size, outport). Without an outport, the i-th
+region is routed to output port i. Several regions can be routed to the
+same output port. The outport of a region can also be a list of output
+ports, which makes the region a multicast region: a packet to it is sent
+to all of the listed ports, and the multicast attribute of the routing
+logic class is set. Regions need not be aligned but must not
+overlap.
+
+The regions are sorted by base address and looked up with a balanced
+binary comparison tree: each level compares the address against one base
+address, so the logic depth grows with log2 of the number of regions,
+unlike a chain of if/elif statements whose depth grows linearly. A final
+comparison against the end of the selected region catches holes in the
+map. Packets whose address is not in any region are routed to
+default_outport, or dropped if default_outport is None.
+
+The routing logic follows the RoutingLogic(PacketType, IDType,
+num_outports) contract of RouteUnitRTL, so the address map is bound with
+mk_address_map_routing_logic:
+
+  RoutingLogic = mk_address_map_routing_logic([
+    ( 0x0000, 0x1000 ), # terminal 0
+    ( 0x1000, 0x0800 ), # terminal 1
+    ( 0x1800, 0x0300 ), # terminal 2
+    ( 0x2000, 0x0300, [ 1, 2 ] ), # multicast to terminals 1 and 2
+  ])
+  router = ReqRespRouter( CfgPkt, Bits1, RoutingLogic, num_terminals=3 )
+'''
+from pymtl3 import *
+
+#-------------------------------------------------------------------------
+# Helper functions
+#-------------------------------------------------------------------------
+
+def _normalize_address_map( address_map ):
+  regions = []
+  for i, region in enumerate( address_map ):
+    if len( region ) == 2:
+      base, size = region
+      outport    = i
+    else:
+      base, size, outport = region
+    if not isinstance( outport, int ):
+      outport = tuple( outport )
+      assert len( outport ) > 0, f'region {i} has no outport'
+    assert size > 0, f'region {i} is empty'
+    regions.append( ( base, size, outport ) )
+
+  # Check for overlapping regions
+  sorted_regions = sorted( regions )
+  for ( base0, size0, _ ), ( base1, _, _ ) in zip( sorted_regions,
+                                                    sorted_regions[1:] ):
+    assert base0 + size0 <= base1, \
+      f'region at {base0:#x} overlaps region at {base1:#x}'
+
+  return regions
+
+def _outport_list( outport ):
+  return [ outport ] if isinstance( outport, int ) else list( outport )
+
+def mk_address_map_routing_logic( address_map, default_outport=None ):
+  regions = _normalize_address_map( address_map )
+
+  class _AddressMapRoutingLogic( AddressMapRoutingLogic ):
+    def construct( s, PacketType, IDType, num_outports ):
+      super().construct( PacketType, IDType, num_outports, regions,
+                         default_outport )
+
+  _AddressMapRoutingLogic.__name__ = 'AddressMapRoutingLogic'
+  _AddressMapRoutingLogic.multicast = any(
+    len( _outport_list( outport ) ) > 1 for _, _, outport in regions )
+  return _AddressMapRoutingLogic
+
+#-------------------------------------------------------------------------
+# AddressDecoder
+#-------------------------------------------------------------------------
+# Looks up an address in a list of (base, size) regions sorted by base.
+# o_idx is the index of the region the address falls into and o_hit is
+# set if there is such a region.
+
+class AddressDecoder( Component ):
+  def construct( s, addr_nbits, regions ):
+    # Local parameters
+    assert len( regions ) > 0
+    assert list( regions ) == sorted( regions )
+
+    # The regions are padded to a power of two with bases that no
+    # address can reach
+    s.addr_nbits  = addr_nbits
+    s.num_regions = len( regions )
+    s.depth       = clog2( s.num_regions )
+    s.num_entries = 2**s.depth
+    s.idx_nbits   = max( s.depth, 1 )
+    s.BoundType   = mk_bits( addr_nbits + 1 )
+
+    # Interface
+    s.i_addr = InPort ( addr_nbits )
+    s.o_idx  = OutPort( s.idx_nbits )
+    s.o_hit  = OutPort()
+
+    # Wires
+    s.addr  = Wire( s.BoundType )
+    s.idx   = Wire( s.idx_nbits )
+    s.bases = [ Wire( s.BoundType ) for _ in range( s.num_entries ) ]
+    s.ends  = [ Wire( s.BoundType ) for _ in range( s.num_entries ) ]
+
+    # Region tables
+    for i in range( s.num_entries ):
+      if i < s.num_regions:
+        base, size = regions[i][0], regions[i][1]
+        s.bases[i] //= base
+        s.ends[i]  //= base + size
+      else:
+        s.bases[i] //= 2**addr_nbits
+        s.ends[i]  //= 2**addr_nbits
+
+    s.addr  //= lambda: zext( s.i_addr, s.addr_nbits+1 )
+    s.o_idx //= s.idx
+
+    # Binary search for the last region whose base is not above the
+    # address, one comparison per level of the tree
+    @update
+    def up_search():
+      s.idx @= 0
+      for lvl in range( s.depth ):
+        if s.addr >= s.bases[ s.idx | ( 1 << ( s.depth - 1 - lvl ) ) ]:
+          s.idx @= s.idx | ( 1 << ( s.depth - 1 - lvl ) )
+
+    s.o_hit //= lambda: ( ( s.addr >= s.bases[s.idx] ) &
+                          ( s.addr <  s.ends[s.idx] ) )
+
+  def line_trace( s ):
+    return f'{s.i_addr}({s.o_idx}){s.o_hit}'
+
+#-------------------------------------------------------------------------
+# AddressMapRoutingLogic
+#-------------------------------------------------------------------------
+
+class AddressMapRoutingLogic( Component ):
+  def construct( s, PacketType, IDType, num_outports, address_map,
+                 default_outport=None ):
+    # Local parameters
+    s.regions      = _normalize_address_map( address_map )
+    s.num_regions  = len( s.regions )
+    s.addr_nbits   = PacketType.get_field_type( 'addr' ).nbits
+    s.num_outports = num_outports
+    s.OutType      = mk_bits( num_outports )
+    s.miss_val     = 0 if default_outport is None else 1 << default_outport
+
+    assert s.num_regions > 0
+    for base, size, outport in s.regions:
+      assert base + size <= 2**s.addr_nbits
+      for port in _outport_list( outport ):
+        assert 0 <= port < num_outports
+    assert default_outport is None or 0 <= default_outport < num_outports
+
+    # Interface
+    s.i_id  = InPort( IDType )
+    s.i_pkt = InPort( PacketType )
+    s.o_val = OutPort( s.OutType )
+
+    # Components
+    sorted_regions = sorted( s.regions )
+    s.decoder = AddressDecoder( s.addr_nbits, sorted_regions )
+    s.decoder.i_addr //= s.i_pkt.addr
+
+    # Output port of each region
+    s.vals = [ Wire( s.OutType ) for _ in range( s.decoder.num_entries ) ]
+    for i in range( s.decoder.num_entries ):
+      if i < s.num_regions:
+        s.vals[i] //= sum( 1 << port for port in
+                           set( _outport_list( sorted_regions[i][2] ) ) )
+      else:
+        s.vals[i] //= 0
+
+    @update
+    def up_o_val():
+      if s.decoder.o_hit:
+        s.o_val @= s.vals[s.decoder.o_idx]
+      else:
+        s.o_val @= s.miss_val
+
+  def line_trace( s ):
+    return f"{s.i_pkt}({s.i_id}){s.o_val.bin()}"
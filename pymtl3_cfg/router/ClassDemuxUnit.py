@@ -0,0 +1,135 @@
+'''
+==========================================================================
+ClassDemuxUnit.py
+==========================================================================
+Sends each packet to the output of its traffic class. The class of a
+packet is given by the class logic (see ClassLogic). A packet only waits
+for the output of its own class, so the classes do not block each other
+once they are in separate queues.
+
+The packets to one output port of the router must still leave in the
+order they came in, e.g., a read must not overtake a write to the same
+terminal. The demux therefore looks up the output ports of every packet
+with its own instance of the routing logic, before the packet is queued,
+and counts the packets of each class that are queued for each output
+port. i_vals[c] and i_xfers[c] are the o_val and the handshake of the
+route unit of class c, which tell when a queued packet leaves. A packet
+only enters its class if no other class has a packet queued for one of
+its output ports, so the packets queued for an output port are always in
+a single class queue. max_pending is the number of packets a class can
+hold, i.e., the depth of its input queue.
+
+The beats of a burst write follow their header (see CfgType), whatever
+class the class logic picks for them, so a packet of another class
+cannot get between the header and the beats at the terminal.
+'''
+from pymtl3 import *
+from pymtl3.stdlib.stream.ifcs import IStreamIfc, OStreamIfc
+
+from ..ifcs.msg_types import CfgType
+
+
+class ClassDemuxUnit( Component ):
+  def construct( s, PacketType, IDType, RoutingLogic, ClassLogic,
+                 num_classes, num_outports, max_pending=1 ):
+    # Local parameters
+    s.num_classes  = num_classes
+    s.num_outports = num_outports
+    s.class_nbits  = max( clog2( num_classes ), 1 )
+    s.CntType      = mk_bits( clog2( max( max_pending, 1 ) + 1 ) )
+    s.DType        = PacketType.get_field_type( 'data' )
+    # Bursts can only be told apart with at least two type bits
+    s.has_burst    = PacketType.get_field_type( 'type_' ).nbits >= 2
+
+    # Interface
+    s.i_id    = InPort( IDType )
+    s.recv    = IStreamIfc( PacketType )
+    s.send    = [ OStreamIfc( PacketType ) for _ in range( num_classes ) ]
+    s.i_vals  = [ InPort( num_outports ) for _ in range( num_classes ) ]
+    s.i_xfers = [ InPort() for _ in range( num_classes ) ]
+
+    # Components
+    s.class_logic = ClassLogic( PacketType, num_classes )
+    s.class_logic.i_pkt //= s.recv.msg
+
+    s.routing_logic = RoutingLogic( PacketType, IDType, num_outports )
+    s.routing_logic.i_id  //= s.i_id
+    s.routing_logic.i_pkt //= s.recv.msg
+
+    # Wires and registers
+    s.cls         = Wire( s.class_nbits )
+    s.conflict    = Wire()
+    s.recv_xfer   = Wire()
+    s.cnt_r       = [ [ Wire( s.CntType ) for _ in range( num_outports ) ]
+                      for _ in range( num_classes ) ]
+
+    # Burst tracking
+    if s.has_burst:
+      s.in_burst    = Wire()
+      s.burst_cnt_r = Wire( s.DType )
+      s.burst_cls_r = Wire( s.class_nbits )
+
+      s.in_burst //= lambda: s.burst_cnt_r != 0
+
+      @update
+      def up_cls():
+        if s.in_burst:
+          s.cls @= s.burst_cls_r
+        else:
+          s.cls @= zext( s.class_logic.o_class, s.class_nbits )
+
+      @update_ff
+      def up_burst():
+        if s.reset:
+          s.burst_cnt_r <<= 0
+          s.burst_cls_r <<= 0
+        elif s.recv_xfer & s.in_burst:
+          s.burst_cnt_r <<= s.burst_cnt_r - 1
+        elif s.recv_xfer & ( s.recv.msg.type_ == CfgType.BURST_WRITE ):
+          s.burst_cnt_r <<= s.recv.msg.data
+          s.burst_cls_r <<= s.cls
+
+    else:
+      s.cls //= lambda: zext( s.class_logic.o_class, s.class_nbits )
+
+    # A packet waits while another class has packets queued for one of
+    # its output ports
+    @update
+    def up_conflict():
+      s.conflict @= 0
+      for c in range( num_classes ):
+        if s.cls != c:
+          for j in range( num_outports ):
+            if s.routing_logic.o_val[j] & ( s.cnt_r[c][j] != 0 ):
+              s.conflict @= 1
+
+    # Connections
+    for c in range( num_classes ):
+      s.send[c].msg //= s.recv.msg
+      s.send[c].val //= lambda: s.recv.val & ( s.cls == c ) & ~s.conflict
+
+    @update
+    def up_recv_rdy():
+      s.recv.rdy @= 0
+      for c in range( num_classes ):
+        if s.cls == c:
+          s.recv.rdy @= s.send[c].rdy & ~s.conflict
+
+    s.recv_xfer //= lambda: s.recv.val & s.recv.rdy
+
+    @update_ff
+    def up_cnt():
+      for c in range( num_classes ):
+        for j in range( num_outports ):
+          if s.reset:
+            s.cnt_r[c][j] <<= 0
+          elif ( s.recv_xfer & ( s.cls == c ) & s.routing_logic.o_val[j] &
+                 ~( s.i_xfers[c] & s.i_vals[c][j] ) ):
+            s.cnt_r[c][j] <<= s.cnt_r[c][j] + 1
+          elif ( ~( s.recv_xfer & ( s.cls == c ) & s.routing_logic.o_val[j] ) &
+                 s.i_xfers[c] & s.i_vals[c][j] ):
+            s.cnt_r[c][j] <<= s.cnt_r[c][j] - 1
+
+  def line_trace( s ):
+    out_str = "|".join([ str(x) for x in s.send ])
+    return f'{s.recv}({s.cls}){out_str}'
@@ -0,0 +1,82 @@
+'''
+==========================================================================
+ClassLogic.py
+==========================================================================
+Class logic that sorts packets into traffic classes for a Router with
+several classes (see ClassDemuxUnit).
+
+The class logic is a component with the following interface:
+
+Input:
+  - i_pkt  : PacketType
+
+Output:
+  - o_class: BitsN, where N is clog2 of the number of classes
+
+ReadWriteClassLogic puts reads into class 1 and every other packet into
+class 0. mk_field_class_logic takes the class from a field of the packet.
+'''
+from pymtl3 import *
+
+from ..ifcs.msg_types import CfgType
+
+#-------------------------------------------------------------------------
+# Helper functions
+#-------------------------------------------------------------------------
+
+def mk_field_class_logic( field ):
+
+  class _FieldClassLogic( FieldClassLogic ):
+    def construct( s, PacketType, num_classes ):
+      super().construct( PacketType, num_classes, field )
+
+  _FieldClassLogic.__name__ = 'FieldClassLogic'
+  return _FieldClassLogic
+
+#-------------------------------------------------------------------------
+# ReadWriteClassLogic
+#-------------------------------------------------------------------------
+
+class ReadWriteClassLogic( Component ):
+  def construct( s, PacketType, num_classes=2 ):
+    # Local parameters
+    assert num_classes == 2
+
+    # Interface
+    s.i_pkt   = InPort( PacketType )
+    s.o_class = OutPort()
+
+    s.o_class //= lambda: s.i_pkt.type_ == CfgType.READ
+
+  def line_trace( s ):
+    return f"{s.i_pkt}({s.o_class})"
+
+#-------------------------------------------------------------------------
+# FieldClassLogic
+#-------------------------------------------------------------------------
+# The low bits of the field are the class. Values beyond the last class
+# go to class 0.
+
+class FieldClassLogic( Component ):
+  def construct( s, PacketType, num_classes, field ):
+    # Local parameters
+    s.class_nbits = max( clog2( num_classes ), 1 )
+    FieldType     = PacketType.get_field_type( field )
+    assert FieldType.nbits >= s.class_nbits
+
+    # Interface
+    s.i_pkt   = InPort( PacketType )
+    s.o_class = OutPort( s.class_nbits )
+
+    # Wires
+    s.value = Wire( s.class_nbits )
+    s.value //= getattr( s.i_pkt, field )[0:s.class_nbits]
+
+    @update
+    def up_o_class():
+      s.o_class @= 0
+      if zext( s.value, s.class_nbits+1 ) < num_classes:
+        s.o_class @= s.value
+
+  def line_trace( s ):
+    return f"{s.i_pkt}({s.o_class})"
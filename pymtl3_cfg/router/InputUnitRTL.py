@@ -13,15 +13,25 @@ from pymtl3.stdlib.stream.queues import StreamNormalQueue as NormalQueueRTL
 
 
 class InputUnitRTL( Component ):
-  def construct( s, PacketType, QueueType=NormalQueueRTL ):
+  def construct( s, PacketType, QueueType=NormalQueueRTL, num_entries=1 ):
     # Interface
     s.recv = IStreamIfc( PacketType )
     s.send = OStreamIfc( PacketType )
 
+    s.QueueType = QueueType
+
     # Component
-    s.queue = QueueType( PacketType, num_entries=1 )
-    s.queue.istream //= s.recv
-    s.queue.ostream //= s.send
+    if s.QueueType != None:
+      s.queue = QueueType( PacketType, num_entries=num_entries )
+      s.queue.istream //= s.recv
+      s.queue.ostream //= s.send
+
+    # No input queue
+    else:
+      s.send //= s.recv
 
   def line_trace( s ):
-    return f"{s.recv}({s.queue.count}){s.send}"
+    if s.QueueType != None:
+      return f"{s.recv}({s.queue.count}){s.send}"
+    else:
+      return f"{s.recv}(0){s.send}"
@@ -0,0 +1,64 @@
+'''
+==========================================================================
+OneHotSwitchUnitRTL.py
+==========================================================================
+A switch unit that drives the data path directly from the one-hot grant
+vector of the arbiter. Each input message is ANDed with its grant bit
+and the results are ORed together, so there is no encoder and no
+binary-select mux between the arbiter and the output. It has the same
+interface as SwitchUnitRTL and can be selected in Router with
+SwitchUnitType. ArbiterType works as in SwitchUnitRTL.
+'''
+from pymtl3 import *
+from pymtl3.stdlib.stream.ifcs import IStreamIfc, OStreamIfc
+from pymtl3.stdlib.primitive import RoundRobinArbiterEn
+
+
+class OneHotSwitchUnitRTL( Component ):
+  def construct( s, PacketType, num_inports=5, ArbiterType=None ):
+    # Local parameters
+    s.num_inports = num_inports
+    s.nbits       = PacketType.nbits
+
+    # Interface
+    s.recv = [ IStreamIfc( PacketType ) for _ in range( s.num_inports ) ]
+    s.send = OStreamIfc( PacketType )
+
+    # Components
+    # The arbiter only moves on once the granted packet is sent, so a
+    # stalled output cannot skip over an input
+    if ArbiterType is None:
+      s.arbiter = RoundRobinArbiterEn( num_inports )
+    else:
+      s.arbiter = ArbiterType( PacketType, num_inports )
+      for i in range( num_inports ):
+        s.arbiter.msgs[i] //= s.recv[i].msg
+    s.arbiter.en //= s.send.rdy
+
+    # Wires
+    s.in_bits  = [ Wire( s.nbits ) for _ in range( s.num_inports ) ]
+    s.out_bits = Wire( s.nbits )
+
+    # Connections
+    for i in range( num_inports ):
+      s.recv[i].val //= s.arbiter.reqs[i]
+
+    # AND-OR reduction of the input messages
+    @update
+    def up_send():
+      s.out_bits @= 0
+      for i in range( num_inports ):
+        s.in_bits[i] @= s.recv[i].msg
+        s.out_bits @= s.out_bits | ( s.in_bits[i] &
+                                     sext( s.arbiter.grants[i], s.nbits ) )
+      s.send.msg @= s.out_bits
+      s.send.val @= s.arbiter.grants != 0
+
+    @update
+    def up_recv_rdy():
+      for i in range( num_inports ):
+        s.recv[i].rdy @= s.send.rdy & s.arbiter.grants[i]
+
+  def line_trace( s ):
+    in_trace = [ str(s.recv[i]) for i in range( s.num_inports ) ]
+    return "{}(){}".format( "|".join( in_trace ), s.send )
@@ -12,7 +12,7 @@ from pymtl3.stdlib.stream.ifcs import IStreamIfc, OStreamIfc
 
 
 class OutputUnitRTL( Component ):
-  def construct( s, PacketType, QueueType=None ):
+  def construct( s, PacketType, QueueType=None, num_entries=2 ):
 
     # Local parameter
     # gating_out = PacketType()
@@ -31,7 +31,7 @@ class OutputUnitRTL( Component ):
     if s.QueueType != None:
 
       # Component
-      s.queue = QueueType( PacketType )
+      s.queue = QueueType( PacketType, num_entries=num_entries )
 
       # Connections
       s.recv          //= s.queue.istream
@@ -0,0 +1,232 @@
+'''
+==========================================================================
+PriorityArbiters.py
+==========================================================================
+Arbiters that can be plugged into the switch units with ArbiterType to
+replace the default round-robin arbitration.
+
+An arbiter follows the ArbiterType(PacketType, nreqs) contract and has
+the following interface:
+
+Input:
+  - en    : Bits1, set when the granted packet can be sent
+  - reqs  : BitsN, the val bits of the inputs
+  - msgs  : [PacketType]*N, the messages of the inputs
+
+Output:
+  - grants: BitsN, one-hot encoding of the granted input, or zero
+
+The grants only depend on the state of the arbiter, reqs and msgs. The
+state is updated at the end of a cycle in which en is set and an input
+is granted.
+
+FixedPriorityArbiter always grants the lowest requesting input. The
+weighted round-robin and field priority arbiters need extra parameters
+and are bound with mk_weighted_round_robin_arbiter and
+mk_field_priority_arbiter:
+
+  # Terminal 0 may send up to four responses in a row
+  ArbiterType = mk_weighted_round_robin_arbiter([ 4, 1, 1, 1 ])
+
+  # Responses to reads win over all other responses
+  ArbiterType = mk_field_priority_arbiter( 'type_', { CfgType.READ : 1 } )
+'''
+from pymtl3 import *
+from pymtl3.stdlib.primitive import RoundRobinArbiterEn
+
+#-------------------------------------------------------------------------
+# Helper functions
+#-------------------------------------------------------------------------
+
+def mk_weighted_round_robin_arbiter( weights ):
+  weights = list( weights )
+
+  class _WeightedRoundRobinArbiter( WeightedRoundRobinArbiter ):
+    def construct( s, PacketType, nreqs ):
+      super().construct( PacketType, nreqs, weights )
+
+  _WeightedRoundRobinArbiter.__name__ = 'WeightedRoundRobinArbiter'
+  return _WeightedRoundRobinArbiter
+
+def mk_field_priority_arbiter( field, priorities=None ):
+  priorities = None if priorities is None else dict( priorities )
+
+  class _FieldPriorityArbiter( FieldPriorityArbiter ):
+    def construct( s, PacketType, nreqs ):
+      super().construct( PacketType, nreqs, field, priorities )
+
+  _FieldPriorityArbiter.__name__ = 'FieldPriorityArbiter'
+  return _FieldPriorityArbiter
+
+#-------------------------------------------------------------------------
+# FixedPriorityArbiter
+#-------------------------------------------------------------------------
+# Input 0 has the highest priority. The other inputs can starve.
+
+class FixedPriorityArbiter( Component ):
+  def construct( s, PacketType, nreqs ):
+    # Interface
+    s.en     = InPort()
+    s.reqs   = InPort ( nreqs )
+    s.msgs   = [ InPort( PacketType ) for _ in range( nreqs ) ]
+    s.grants = OutPort( nreqs )
+
+    # Wires
+    s.kills = Wire( nreqs + 1 )
+
+    @update
+    def up_grants():
+      s.kills[0] @= 0
+      for i in range( nreqs ):
+        s.grants[i]  @= s.reqs[i] & ~s.kills[i]
+        s.kills[i+1] @= s.kills[i] | s.reqs[i]
+
+  def line_trace( s ):
+    return f"{s.reqs} | {s.grants}"
+
+#-------------------------------------------------------------------------
+# WeightedRoundRobinArbiter
+#-------------------------------------------------------------------------
+# A round-robin arbiter where input i may be granted up to weights[i]
+# times in a row while it keeps requesting. The turn then moves on to the
+# next requesting input.
+
+class WeightedRoundRobinArbiter( Component ):
+  def construct( s, PacketType, nreqs, weights ):
+    # Local parameters
+    assert len( weights ) == nreqs
+    assert all( w > 0 for w in weights )
+    s.idx_nbits = max( clog2( nreqs ), 1 )
+    s.IdxType   = mk_bits( s.idx_nbits )
+    s.CntType   = mk_bits( clog2( max( weights ) + 1 ) )
+
+    # Interface
+    s.en     = InPort()
+    s.reqs   = InPort ( nreqs )
+    s.msgs   = [ InPort( PacketType ) for _ in range( nreqs ) ]
+    s.grants = OutPort( nreqs )
+
+    # Wires and registers
+    s.weights   = [ Wire( s.CntType ) for _ in range( nreqs ) ]
+    s.found     = Wire()
+    s.grant_idx = Wire( s.IdxType )
+    s.ptr_r     = Wire( s.IdxType )
+    s.cnt_r     = Wire( s.CntType )
+
+    for i in range( nreqs ):
+      s.weights[i] //= weights[i]
+
+    # The input that has the turn keeps the grant until it has used up
+    # its weight, otherwise the first requesting input after it wins
+    @update
+    def up_grants():
+      s.found     @= 0
+      s.grant_idx @= 0
+      if s.reqs[s.ptr_r] & ( s.cnt_r < s.weights[s.ptr_r] ):
+        s.found     @= 1
+        s.grant_idx @= s.ptr_r
+      for i in range( nreqs ):
+        if ~s.found & s.reqs[i] & ( s.ptr_r < i ):
+          s.found     @= 1
+          s.grant_idx @= i
+      for i in range( nreqs ):
+        if ~s.found & s.reqs[i]:
+          s.found     @= 1
+          s.grant_idx @= i
+      for i in range( nreqs ):
+        s.grants[i] @= s.found & ( s.grant_idx == i )
+
+    @update_ff
+    def up_state():
+      if s.reset:
+        s.ptr_r <<= 0
+        s.cnt_r <<= 0
+      elif s.en & s.found:
+        if ( s.grant_idx == s.ptr_r ) & ( s.cnt_r < s.weights[s.ptr_r] ):
+          s.cnt_r <<= s.cnt_r + 1
+        else:
+          s.ptr_r <<= s.grant_idx
+          s.cnt_r <<= 1
+
+  def line_trace( s ):
+    return f"{s.reqs}({s.ptr_r}:{s.cnt_r}){s.grants}"
+
+#-------------------------------------------------------------------------
+# FieldPriorityArbiter
+#-------------------------------------------------------------------------
+# The priority of a packet is taken from one of its fields. priorities
+# maps field values to priorities, and values that are not in the map
+# have priority zero. The map must not be empty, and only the values in
+# it are compared, so it can also pick out a few values of a wide field
+# such as addr. Without a map the field value itself is the
+# priority. Among the requesting inputs with the highest priority the
+# grant goes round-robin.
+
+class FieldPriorityArbiter( Component ):
+  def construct( s, PacketType, nreqs, field, priorities=None ):
+    # Local parameters
+    FieldType = PacketType.get_field_type( field )
+    if priorities is None:
+      s.PrioType = FieldType
+    else:
+      assert len( priorities ) > 0, 'the priority map is empty'
+      assert all( 0 <= v < 2**FieldType.nbits for v in priorities ), \
+        f'a field value of the priority map does not fit in {field}'
+      assert all( 0 <= p for p in priorities.values() )
+      s.PrioType = mk_bits( max( clog2( max( priorities.values() ) + 1 ), 1 ) )
+      s.entries  = sorted( priorities.items() )
+
+    # Interface
+    s.en     = InPort()
+    s.reqs   = InPort ( nreqs )
+    s.msgs   = [ InPort( PacketType ) for _ in range( nreqs ) ]
+    s.grants = OutPort( nreqs )
+
+    # Components
+    s.arbiter = RoundRobinArbiterEn( nreqs )
+    s.arbiter.en //= s.en
+
+    # Wires
+    s.prios    = [ Wire( s.PrioType ) for _ in range( nreqs ) ]
+    s.max_prio = Wire( s.PrioType )
+    s.top_reqs = Wire( nreqs )
+
+    if priorities is None:
+      for i in range( nreqs ):
+        s.prios[i] //= getattr( s.msgs[i], field )
+
+    else:
+      # Only the listed field values are compared, so the logic does not
+      # grow with the width of the field
+      nentries     = len( s.entries )
+      s.fields     = [ Wire( FieldType ) for _ in range( nreqs ) ]
+      s.entry_vals = [ Wire( FieldType ) for _ in range( nentries ) ]
+      s.entry_prio = [ Wire( s.PrioType ) for _ in range( nentries ) ]
+      for j, ( v, p ) in enumerate( s.entries ):
+        s.entry_vals[j] //= v
+        s.entry_prio[j] //= p
+      for i in range( nreqs ):
+        s.fields[i] //= getattr( s.msgs[i], field )
+
+      @update
+      def up_prios():
+        for i in range( nreqs ):
+          s.prios[i] @= 0
+          for j in range( nentries ):
+            if s.fields[i] == s.entry_vals[j]:
+              s.prios[i] @= s.entry_prio[j]
+
+    @update
+    def up_top_reqs():
+      s.max_prio @= 0
+      for i in range( nreqs ):
+        if s.reqs[i] & ( s.prios[i] > s.max_prio ):
+          s.max_prio @= s.prios[i]
+      for i in range( nreqs ):
+        s.top_reqs[i] @= s.reqs[i] & ( s.prios[i] == s.max_prio )
+
+    s.arbiter.reqs //= s.top_reqs
+    s.grants       //= s.arbiter.grants
+
+  def line_trace( s ):
+    return f"{s.reqs}({s.max_prio}){s.grants}"
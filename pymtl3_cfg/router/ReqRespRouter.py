@@ -4,22 +4,65 @@ ReqRespRouter.py
 ==========================================================================
 A req/resp router that routes incoming requests based on the address and
 sends back corresponding responses. It is parameterized by the routing
-logic.
+logic. The queue parameters are passed to both the request and the
+response router (see Router), and so are SwitchUnitType and ArbiterType.
+Only the response router has switch units, unless num_classes and
+ClassLogic split the request router into traffic classes (see Router) so
+that, e.g., reads to idle terminals are not stuck behind a write to a
+busy one.
+
+Burst writes need no special handling: every beat of a burst carries the
+base address of its header, so the routing logic sends all beats to the
+same terminal, and the terminal only sends back one response per burst.
+
+router_id drives the i_id port of the routing logic.
+
+By default the responses of different terminals are merged by a
+round-robin switch, so they can come back in a different order than the
+requests were sent. With in_order=True the response router is replaced
+by a RespOrderUnit that returns the responses in request order with up to
+max_outstanding responses in flight.
+
+A routing logic can send a request to several terminals (see
+RouteUnitRTL), and every terminal then sends back a response. With
+multicast=True a RespAggregator collapses these responses into one, so
+the host sees a single response per request. The aggregator takes the
+destinations of a request from the route unit of the request router, so
+it sits after the input queue, and it does not support traffic classes.
+The RespOrderUnit does not support multicast requests, so with
+in_order=True the routing logic must send every request to at most one
+terminal. This is checked for routing logics that declare multicast
+regions, such as those of mk_address_map_routing_logic; other routing
+logics must not set more than one bit of o_val.
 
 Author : Yanghui Ou
   Date : Sep 19, 2023
 '''
 from pymtl3 import *
 from pymtl3.stdlib.stream.ifcs import IStreamIfc, OStreamIfc
+from pymtl3.stdlib.stream.queues import StreamPipeQueue
 
+from .InputUnitRTL import InputUnitRTL
+from .RespAggregator import RespAggregator
+from .RespOrderUnit import RespOrderUnit
 from .Router import Router
+from .SwitchUnitRTL import SwitchUnitRTL
 from .DummyRoutingLogic import DummyRoutingLogic
 
 
 class ReqRespRouter( Component ):
-  def construct( s, PacketType, IDType, RoutingLogic, num_terminals ):
+  def construct( s, PacketType, IDType, RoutingLogic, num_terminals,
+                 InputQueueType=StreamPipeQueue, input_qsize=1,
+                 OutputQueueType=None, output_qsize=2, router_id=0,
+                 in_order=False, max_outstanding=4, multicast=False,
+                 SwitchUnitType=SwitchUnitRTL, ArbiterType=None,
+                 num_classes=1, ClassLogic=None ):
 
     # Local parameters
+    assert not ( in_order and multicast )
+    assert not ( in_order and getattr( RoutingLogic, 'multicast', False ) ), \
+      'in_order=True does not support a routing logic with multicast regions'
+    assert not ( multicast and num_classes > 1 )
     s.num_terminals = num_terminals
 
     # Interface
@@ -30,23 +73,65 @@ class ReqRespRouter( Component ):
     s.master_resp = [ IStreamIfc( PacketType ) for _ in range( s.num_terminals ) ]
 
     # Components
+    # With multicast the input queue is in front of the RespAggregator
     s.req_router = Router( PacketType, IDType, RoutingLogic,
-                           num_inports=1, num_outports=s.num_terminals )
-    s.resp_router = Router( PacketType, IDType, DummyRoutingLogic,
-                            num_inports=s.num_terminals, num_outports=1 )
-
-    # Connections
-    s.minion_req  //= s.req_router.recv[0]
-    s.minion_resp //= s.resp_router.send[0]
+                           num_inports=1, num_outports=s.num_terminals,
+                           InputQueueType=None if multicast else InputQueueType,
+                           input_qsize=input_qsize,
+                           OutputQueueType=OutputQueueType,
+                           output_qsize=output_qsize,
+                           SwitchUnitType=SwitchUnitType,
+                           ArbiterType=ArbiterType,
+                           num_classes=num_classes, ClassLogic=ClassLogic )
+    # The ID is only needed when the routing logic is shared by several
+    # ReqRespRouters that route differently.
+    s.req_router.i_id //= router_id
 
     for i in range( s.num_terminals ):
-      s.master_req[i]  //= s.req_router.send[i]
-      s.master_resp[i] //= s.resp_router.recv[i]
+      s.master_req[i] //= s.req_router.send[i]
+
+    if in_order:
+      s.resp_unit = RespOrderUnit( PacketType, IDType, RoutingLogic,
+                                   s.num_terminals, max_outstanding,
+                                   QueueType=InputQueueType,
+                                   qsize=input_qsize )
+      s.resp_unit.i_id //= router_id
+
+      s.minion_req          //= s.resp_unit.req_recv
+      s.resp_unit.req_send  //= s.req_router.recv[0]
+      s.minion_resp         //= s.resp_unit.resp_send
+      for i in range( s.num_terminals ):
+        s.master_resp[i] //= s.resp_unit.resp_recv[i]
+
+    else:
+      s.resp_router = Router( PacketType, IDType, DummyRoutingLogic,
+                              num_inports=s.num_terminals, num_outports=1,
+                              InputQueueType=InputQueueType,
+                              input_qsize=input_qsize,
+                              OutputQueueType=OutputQueueType,
+                              output_qsize=output_qsize,
+                              SwitchUnitType=SwitchUnitType,
+                              ArbiterType=ArbiterType )
+      s.resp_router.i_id //= router_id
+
+      for i in range( s.num_terminals ):
+        s.master_resp[i] //= s.resp_router.recv[i]
+
+      if multicast:
+        s.req_in    = InputUnitRTL( PacketType, InputQueueType, input_qsize )
+        s.resp_unit = RespAggregator( PacketType, s.num_terminals )
+        s.resp_unit.i_dsts //= s.req_router.o_vals[0]
+
+        s.minion_req           //= s.req_in.recv
+        s.req_in.send          //= s.resp_unit.req_recv
+        s.resp_unit.req_send   //= s.req_router.recv[0]
+        s.resp_router.send[0]  //= s.resp_unit.resp_recv
+        s.minion_resp          //= s.resp_unit.resp_send
 
-    # ID port of the router is not used since we expect there is only one
-    # ReqRespRouter in the system.
-    s.req_router.i_id  //= 0
-    s.resp_router.i_id //= 0
+      else:
+        s.minion_req  //= s.req_router.recv[0]
+        s.minion_resp //= s.resp_router.send[0]
 
   def line_trace( s ):
-    return f'{s.req_router.line_trace()} <> {s.resp_router.line_trace()}'
+    resp = s.resp_router if hasattr( s, 'resp_router' ) else s.resp_unit
+    return f'{s.req_router.line_trace()} <> {resp.line_trace()}'
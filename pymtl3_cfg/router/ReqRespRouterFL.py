@@ -0,0 +1,172 @@
+'''
+==========================================================================
+ReqRespRouterFL.py
+==========================================================================
+A functional-level model of ReqRespRouter for system-scale simulation.
+It has the same ports and parameters as ReqRespRouter, but the request
+and response queues are Python deques and all of the routing and
+arbitration is done by a single update_ff block instead of a tree of
+input, route, switch and output units.
+
+The routing logic is still the RoutingLogic component, so that the model
+routes exactly like the RTL router, but it is not part of the simulated
+design: it is elaborated on its own when the router is reset, evaluated
+only for packets that arrive, and its output is cached for every
+address, so the routing logic must only look at the address of a packet
+(and i_id). Every router has its own routing logic instance and cache,
+and the cache is cleared when it holds max_route_entries addresses. An
+idle router therefore costs one update block per cycle.
+
+A request is sent to all terminals selected by the routing logic once
+none of them holds an earlier request, and dropped if none is selected.
+Responses are accepted from all terminals in the same cycle and sent
+back one per cycle in the order they arrived.
+
+The model is not cycle-accurate. The queue, switch unit, arbiter and
+traffic class parameters are accepted so that the model can replace a
+ReqRespRouter without changing its parameters, and are ignored. The
+RespOrderUnit and RespAggregator of ReqRespRouter are not modeled, so
+in_order and multicast must be False.
+'''
+from collections import deque
+
+from pymtl3 import *
+from pymtl3.stdlib.stream.ifcs import IStreamIfc, OStreamIfc
+from pymtl3.stdlib.stream.queues import StreamPipeQueue
+
+from .SwitchUnitRTL import SwitchUnitRTL
+
+#-------------------------------------------------------------------------
+# RouteTable
+#-------------------------------------------------------------------------
+# Maps packet addresses to the output bit vector of a routing logic
+
+max_route_entries = 4096
+
+class RouteTable:
+  def __init__( s, RoutingLogic, PacketType, IDType, num_outports,
+                router_id ):
+    s.logic = RoutingLogic( PacketType, IDType, num_outports )
+    s.logic.elaborate()
+    s.logic.apply( DefaultPassGroup() )
+    s.logic.i_id @= router_id
+    s.table = {}
+
+  def lookup( s, pkt ):
+    key = int( pkt.addr )
+    if key not in s.table:
+      if len( s.table ) >= max_route_entries:
+        s.table.clear()
+      s.logic.i_pkt @= pkt
+      s.logic.sim_eval_combinational()
+      s.table[key] = int( s.logic.o_val )
+    return s.table[key]
+
+#-------------------------------------------------------------------------
+# ReqRespRouterFL
+#-------------------------------------------------------------------------
+
+
+class ReqRespRouterFL( Component ):
+  def construct( s, PacketType, IDType, RoutingLogic, num_terminals,
+                 InputQueueType=StreamPipeQueue, input_qsize=1,
+                 OutputQueueType=None, output_qsize=2, router_id=0,
+                 in_order=False, max_outstanding=4, multicast=False,
+                 SwitchUnitType=SwitchUnitRTL, ArbiterType=None,
+                 num_classes=1, ClassLogic=None, req_qsize=2 ):
+
+    # Local parameters
+    assert not in_order and not multicast
+    assert req_qsize > 0
+    s.num_terminals = num_terminals
+    s.req_qsize     = req_qsize
+    # Room for a response from every terminal on top of the ones that
+    # are waiting to be sent back
+    s.resp_qsize    = 2 * num_terminals
+
+    # Interface
+    s.minion_req  = IStreamIfc( PacketType )
+    s.minion_resp = OStreamIfc( PacketType )
+
+    s.master_req  = [ OStreamIfc( PacketType ) for _ in range( s.num_terminals ) ]
+    s.master_resp = [ IStreamIfc( PacketType ) for _ in range( s.num_terminals ) ]
+
+    # The route table cannot be built while the router is elaborated, so
+    # it is built on reset
+    s.mk_route_table = lambda: RouteTable(
+      RoutingLogic, PacketType, IDType, s.num_terminals, router_id )
+    s.route_table    = None
+
+    # State
+    s.reqs     = deque()
+    s.resps    = deque()
+    s.busy     = set() # terminals whose master_req is valid
+    s.resp_rdy = False
+
+    # All ports are written in the update block itself, since the
+    # helper methods are not visible to the elaboration
+    @update_ff
+    def up_fl():
+      if s.reset:
+        if s.route_table is None:
+          s.route_table = s.mk_route_table()
+        s.reqs.clear()
+        s.resps.clear()
+        s.busy.clear()
+        for i in range( s.num_terminals ):
+          s.master_req[i].val <<= 0
+
+      else:
+        # Requests taken by the terminals
+        for i in list( s.busy ):
+          if s.master_req[i].rdy:
+            s.busy.discard( i )
+            s.master_req[i].val <<= 0
+
+        if s.reqs:
+          dsts = s.route( s.reqs[0] )
+          if dsts is not None:
+            for i in dsts:
+              s.master_req[i].msg <<= s.reqs[0]
+              s.master_req[i].val <<= 1
+            s.reqs.popleft()
+
+        if s.minion_req.val & s.minion_req.rdy:
+          s.enq( s.reqs, s.minion_req.msg )
+
+        # Responses
+        if s.minion_resp.val & s.minion_resp.rdy:
+          s.resps.popleft()
+
+        if s.resp_rdy:
+          for i in range( s.num_terminals ):
+            if s.master_resp[i].val:
+              s.enq( s.resps, s.master_resp[i].msg )
+
+      rdy = len( s.resps ) + s.num_terminals <= s.resp_qsize
+      if s.reset | ( rdy != s.resp_rdy ):
+        s.resp_rdy = rdy
+        for i in range( s.num_terminals ):
+          s.master_resp[i].rdy <<= rdy
+
+      s.minion_req.rdy  <<= len( s.reqs ) < s.req_qsize
+      s.minion_resp.val <<= len( s.resps ) > 0
+      if s.resps:
+        s.minion_resp.msg <<= s.resps[0]
+
+  # Returns the terminals selected by the routing logic and marks them
+  # busy, or None if one of them is still busy
+  def route( s, pkt ):
+    out_val = s.route_table.lookup( pkt )
+    dsts = [ i for i in range( s.num_terminals ) if ( out_val >> i ) & 1 ]
+    if any( i in s.busy for i in dsts ):
+      return None
+    s.busy.update( dsts )
+    return dsts
+
+  # The value of a port changes in place, so the queues hold copies
+  def enq( s, q, msg ):
+    q.append( msg.clone() )
+
+  def line_trace( s ):
+    return f'{s.minion_req}(){s.minion_resp}'
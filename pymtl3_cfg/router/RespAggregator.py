@@ -0,0 +1,122 @@
+'''
+==========================================================================
+RespAggregator.py
+==========================================================================
+Collapses the responses of a multicast request into a single response.
+
+The routing logic of a ReqRespRouter can send a request to several
+terminals by setting several bits in o_val (see RouteUnitRTL). Every
+terminal then sends back its own response. The aggregator sits on both
+paths of the router. On the request path it sits between the input queue
+and the route unit of the request router, so i_dsts, the o_val of the
+route unit, holds the destinations of the request at req_recv. When a
+multicast request that gets a response goes by, it loads a counter with
+the number of destinations and records the type and address of the
+request. On the response path, the responses that match the recorded
+type and address are counted down: all but the last one are dropped and
+the last one is forwarded to the host. Other responses pass through
+untouched, so unicast requests can still be in flight while a multicast
+is being collected.
+
+Only one multicast can be collected at a time, so a multicast request
+waits until the responses of the previous one have been collected. The
+terminals echo the type and address of the request in the response, so a
+multicast address must not also be reached by a unicast request, which
+is the case for the multicast regions of AddressMapRoutingLogic. The
+last beat of a burst carries the type and address of its header (see
+CfgType). The responses of a multicast read are collapsed as well and
+the host gets the data of the last terminal to respond, which is meant
+for terminals that hold identical registers.
+'''
+from pymtl3 import *
+from pymtl3.stdlib.stream.ifcs import IStreamIfc, OStreamIfc
+
+from ..ifcs.msg_types import CfgType
+
+
+class RespAggregator( Component ):
+  def construct( s, PacketType, num_terminals ):
+    # Local parameters
+    s.num_terminals = num_terminals
+    s.CntType       = mk_bits( clog2( num_terminals + 1 ) )
+    s.TypeType      = PacketType.get_field_type( 'type_' )
+    s.AddrType      = PacketType.get_field_type( 'addr' )
+    s.DType         = PacketType.get_field_type( 'data' )
+
+    # Interface
+    s.i_dsts    = InPort( num_terminals )
+    s.req_recv  = IStreamIfc( PacketType )
+    s.req_send  = OStreamIfc( PacketType )
+    s.resp_recv = IStreamIfc( PacketType )
+    s.resp_send = OStreamIfc( PacketType )
+
+    # Wires and registers
+    s.num_dsts     = Wire( s.CntType )
+    s.is_burst_hdr = Wire()
+    s.is_posted    = Wire()
+    s.in_burst     = Wire()
+    s.is_mcast     = Wire()
+    s.can_send     = Wire()
+    s.req_xfer     = Wire()
+    s.is_match     = Wire()
+    s.burst_cnt_r  = Wire( s.DType )
+    s.cnt_r        = Wire( s.CntType )
+    s.type_r       = Wire( s.TypeType )
+    s.addr_r       = Wire( s.AddrType )
+
+    # Request path
+    @update
+    def up_num_dsts():
+      s.num_dsts @= 0
+      for i in range( num_terminals ):
+        s.num_dsts @= s.num_dsts + zext( s.i_dsts[i], s.CntType.nbits )
+
+    s.in_burst //= lambda: s.burst_cnt_r != 0
+    s.is_posted //= lambda: ( ~s.in_burst &
+      ( s.req_recv.msg.type_ == CfgType.POSTED_WRITE ) )
+    s.is_burst_hdr //= lambda: ( ~s.in_burst &
+      ( s.req_recv.msg.type_ == CfgType.BURST_WRITE ) )
+    # A multicast request that gets a response. The response of a burst
+    # comes with its last beat, so the counter is loaded with the header.
+    s.is_mcast //= lambda: ( ( s.num_dsts > 1 ) & ~s.in_burst &
+                             ~s.is_posted )
+
+    s.can_send     //= lambda: ~s.is_mcast | ( s.cnt_r == 0 )
+    s.req_send.msg //= s.req_recv.msg
+    s.req_send.val //= lambda: s.req_recv.val & s.can_send
+    s.req_recv.rdy //= lambda: s.req_send.rdy & s.can_send
+    s.req_xfer     //= lambda: s.req_recv.val & s.req_recv.rdy
+
+    @update_ff
+    def up_burst():
+      if s.reset:
+        s.burst_cnt_r <<= 0
+      elif s.req_xfer & s.is_burst_hdr:
+        s.burst_cnt_r <<= s.req_recv.msg.data
+      elif s.req_xfer & s.in_burst:
+        s.burst_cnt_r <<= s.burst_cnt_r - 1
+
+    # Response path
+    s.is_match //= lambda: ( ( s.cnt_r != 0 ) &
+                             ( s.resp_recv.msg.type_ == s.type_r ) &
+                             ( s.resp_recv.msg.addr  == s.addr_r ) )
+
+    s.resp_send.msg //= s.resp_recv.msg
+    s.resp_send.val //= lambda: s.resp_recv.val & ( ~s.is_match | ( s.cnt_r == 1 ) )
+    s.resp_recv.rdy //= lambda: s.resp_send.rdy | ( s.is_match & ( s.cnt_r != 1 ) )
+
+    @update_ff
+    def up_cnt():
+      if s.reset:
+        s.cnt_r  <<= 0
+        s.type_r <<= 0
+        s.addr_r <<= 0
+      elif s.req_xfer & s.is_mcast:
+        s.cnt_r  <<= s.num_dsts
+        s.type_r <<= s.req_recv.msg.type_
+        s.addr_r <<= s.req_recv.msg.addr
+      elif s.resp_recv.val & s.resp_recv.rdy & s.is_match:
+        s.cnt_r <<= s.cnt_r - 1
+
+  def line_trace( s ):
+    return f'{s.req_recv}({s.cnt_r}){s.resp_send}'
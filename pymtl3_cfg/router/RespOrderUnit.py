@@ -0,0 +1,113 @@
+'''
+==========================================================================
+RespOrderUnit.py
+==========================================================================
+Keeps the responses of a ReqRespRouter in request order.
+
+The unit sits on both paths of the router. On the request path it looks
+up the destination terminal of every request with its own instance of
+the routing logic and, if the request gets a response, records the
+terminal in an ordering tracker (a FIFO of terminal indices). On the
+response path only the terminal at the head of the tracker may send a
+response, and the head is dequeued once the response is sent. Responses
+from other terminals wait in their terminal until it is their turn, so
+requests to many terminals can be in flight at once while the responses
+still come back in order.
+
+Posted writes, non-empty burst headers and all but the last beat of a
+burst get no response (see CfgType) and are not recorded. Packets that
+the routing logic does not route anywhere are not recorded either. A
+request that gets a response is held back while the tracker is full, so
+max_outstanding bounds the number of responses in flight. Broadcast
+requests are not supported.
+'''
+from pymtl3 import *
+from pymtl3.stdlib.primitive import Encoder
+from pymtl3.stdlib.stream.ifcs import IStreamIfc, OStreamIfc
+from pymtl3.stdlib.stream.queues import StreamNormalQueue, StreamPipeQueue
+
+from ..ifcs.msg_types import CfgType
+
+
+class RespOrderUnit( Component ):
+  def construct( s, PacketType, IDType, RoutingLogic, num_terminals,
+                 max_outstanding=4, QueueType=StreamPipeQueue, qsize=1 ):
+    # Local parameters
+    assert max_outstanding > 0
+    s.num_terminals = num_terminals
+    s.idx_nbits     = max( clog2( num_terminals ), 1 )
+    s.IdxType       = mk_bits( s.idx_nbits )
+    s.DType         = PacketType.get_field_type( 'data' )
+
+    # Interface
+    s.i_id      = InPort( IDType )
+    s.req_recv  = IStreamIfc( PacketType )
+    s.req_send  = OStreamIfc( PacketType )
+    s.resp_recv = [ IStreamIfc( PacketType ) for _ in range( num_terminals ) ]
+    s.resp_send = OStreamIfc( PacketType )
+
+    # Components
+    s.routing_logic = RoutingLogic( PacketType, IDType, num_terminals )
+    s.encoder       = Encoder( num_terminals, s.idx_nbits )
+    s.tracker       = StreamNormalQueue( s.IdxType, num_entries=max_outstanding )
+    s.resp_q        = QueueType( PacketType, num_entries=qsize )
+
+    # Wires and registers
+    s.is_burst_hdr = Wire()
+    s.is_posted    = Wire()
+    s.in_burst     = Wire()
+    s.has_resp     = Wire()
+    s.can_send     = Wire()
+    s.req_xfer     = Wire()
+    s.burst_cnt_r  = Wire( s.DType )
+
+    # Request path
+    s.routing_logic.i_id  //= s.i_id
+    s.routing_logic.i_pkt //= s.req_recv.msg
+    s.encoder.in_         //= s.routing_logic.o_val
+
+    s.in_burst //= lambda: s.burst_cnt_r != 0
+    s.is_posted //= lambda: ( ~s.in_burst &
+      ( s.req_recv.msg.type_ == CfgType.POSTED_WRITE ) )
+    s.is_burst_hdr //= lambda: ( ~s.in_burst &
+      ( s.req_recv.msg.type_ == CfgType.BURST_WRITE ) )
+    s.has_resp //= lambda: ( ( s.routing_logic.o_val != 0 ) & ~(
+      ( s.is_burst_hdr & ( s.req_recv.msg.data != 0 ) ) |
+      ( s.in_burst & ( s.burst_cnt_r != 1 ) ) | s.is_posted ) )
+
+    s.can_send     //= lambda: ~s.has_resp | s.tracker.istream.rdy
+    s.req_send.msg //= s.req_recv.msg
+    s.req_send.val //= lambda: s.req_recv.val & s.can_send
+    s.req_recv.rdy //= lambda: s.req_send.rdy & s.can_send
+    s.req_xfer     //= lambda: s.req_recv.val & s.req_recv.rdy
+
+    s.tracker.istream.val //= lambda: s.req_xfer & s.has_resp
+    s.tracker.istream.msg //= s.encoder.out
+
+    @update_ff
+    def up_burst():
+      if s.reset:
+        s.burst_cnt_r <<= 0
+      elif s.req_xfer & s.is_burst_hdr:
+        s.burst_cnt_r <<= s.req_recv.msg.data
+      elif s.req_xfer & s.in_burst:
+        s.burst_cnt_r <<= s.burst_cnt_r - 1
+
+    # Response path
+    s.resp_send //= s.resp_q.ostream
+
+    @update
+    def up_resp():
+      s.resp_q.istream.val @= 0
+      s.resp_q.istream.msg @= s.resp_recv[0].msg
+      for i in range( num_terminals ):
+        s.resp_recv[i].rdy @= 0
+      if s.tracker.ostream.val:
+        s.resp_q.istream.val @= s.resp_recv[s.tracker.ostream.msg].val
+        s.resp_q.istream.msg @= s.resp_recv[s.tracker.ostream.msg].msg
+        s.resp_recv[s.tracker.ostream.msg].rdy @= s.resp_q.istream.rdy
+
+    s.tracker.ostream.rdy //= lambda: s.resp_q.istream.val & s.resp_q.istream.rdy
+
+  def line_trace( s ):
+    return f'{s.req_recv}({s.tracker.count}){s.resp_send}'
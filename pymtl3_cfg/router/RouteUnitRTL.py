@@ -17,7 +17,8 @@ Output:
 
 The 'o_val' is a one-hot encoding of the desired output port for the
 packet. for example, if `o_val` is 0b0010, then the packet should be
-routed to the second output port.
+routed to the second output port. The route unit passes it on through
+its own `o_val` port, and `o_xfer` is set when the packet leaves.
 
 Broadcasting can be achieved by setting multiple bits in `o_val` to 1. For
 example, if `o_val` is 0b0110, then the packet should be routed to the
@@ -40,6 +41,8 @@ class RouteUnitRTL( Component ):
 
     # Interface
     s.i_id  = InPort( IDType )
+    s.o_val  = OutPort( s.num_outports )
+    s.o_xfer = OutPort()
     s.recv = IStreamIfc( PacketType )
     s.send = [ OStreamIfc( PacketType ) for _ in range( s.num_outports ) ]
 
@@ -54,6 +57,7 @@ class RouteUnitRTL( Component ):
     # Connections and assignments
     s.routing_logic.i_id  //= s.i_id
     s.routing_logic.i_pkt //= s.recv.msg
+    s.o_val               //= s.routing_logic.o_val
 
     for i in range( s.num_outports ):
       s.send[i].msg //= s.recv.msg
@@ -67,6 +71,7 @@ class RouteUnitRTL( Component ):
           s.blocking[i] @= s.routing_logic.o_val[i] & ~s.send[i].rdy
 
     s.recv.rdy //= lambda: ~reduce_or( s.blocking )
+    s.o_xfer   //= lambda: s.recv.val & s.recv.rdy
 
   def line_trace( s ):
     out_str = "|".join([ str(x) for x in s.send ])
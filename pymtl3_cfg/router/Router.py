@@ -4,12 +4,37 @@ Router.py
 ==========================================================================
 A generic router parameterized by the routing logic.
 
+The input and output queues are parameterized by queue type and number of
+entries. By default each input unit has a 1-entry pipe queue and the
+output units have no queue, which sustains one packet per cycle per input
+port. InputQueueType=None removes the input queues. Setting OutputQueueType adds an output queue that breaks the
+combinational ready path at the cost of extra storage and latency. Note
+that a 1-entry normal queue limits the throughput to one packet every two
+cycles.
+
+SwitchUnitType selects the switch unit of the output ports. The default
+SwitchUnitRTL encodes the grants of the arbiter into the select of a mux,
+while OneHotSwitchUnitRTL drives an AND-OR data path directly from the
+one-hot grants. ArbiterType selects the arbiter of the switch units (see
+PriorityArbiters), and the default is round-robin.
+
+With num_classes > 1 every input port has a separate input queue and
+route unit per traffic class. A ClassDemuxUnit sorts the packets into
+their class with ClassLogic (see ClassLogic), and the switch units
+arbitrate between all classes of all input ports. A packet that waits
+for a busy output port then only blocks the packets of its own class.
+The packets to one output port still leave in order, since a packet
+waits in the ClassDemuxUnit while another class holds packets for the
+same output port.
+
 Author : Yanghui Ou
   Date : Sep 19, 2023
 '''
 from pymtl3 import *
 from pymtl3.stdlib.stream.ifcs import IStreamIfc, OStreamIfc
+from pymtl3.stdlib.stream.queues import StreamPipeQueue
 
+from .ClassDemuxUnit import ClassDemuxUnit
 from .InputUnitRTL import InputUnitRTL
 from .RouteUnitRTL import RouteUnitRTL
 from .OutputUnitRTL import OutputUnitRTL
@@ -17,36 +42,69 @@ from .SwitchUnitRTL import SwitchUnitRTL
 
 
 class Router( Component ):
-  def construct( s, PacketType, IDType, RoutingLogic, num_inports, num_outports ):
+  def construct( s, PacketType, IDType, RoutingLogic, num_inports, num_outports,
+                 InputQueueType=StreamPipeQueue, input_qsize=1,
+                 OutputQueueType=None, output_qsize=2,
+                 SwitchUnitType=SwitchUnitRTL, ArbiterType=None,
+                 num_classes=1, ClassLogic=None ):
     # Local parameters
+    assert num_classes == 1 or ClassLogic is not None
     s.num_inports  = num_inports
     s.num_outports = num_outports
+    s.num_classes  = num_classes
+    # Input queue and route unit i * num_classes + c serve class c of
+    # input port i
+    s.num_sources  = num_inports * num_classes
 
     # Interface
     s.recv = [ IStreamIfc( PacketType ) for _ in range( s.num_inports ) ]
     s.send = [ OStreamIfc( PacketType ) for _ in range( s.num_outports ) ]
     s.i_id = InPort( IDType )
+    # Output ports of the packet at the head of each input queue
+    s.o_vals = [ OutPort( num_outports ) for _ in range( s.num_sources ) ]
 
     # Components
-    s.input_units  = [ InputUnitRTL( PacketType ) for _ in range( s.num_inports ) ]
+    if s.num_classes > 1:
+      s.class_units = [ ClassDemuxUnit( PacketType, IDType, RoutingLogic,
+                                        ClassLogic, num_classes,
+                                        num_outports, input_qsize )
+                        for _ in range( s.num_inports ) ]
+
+    s.input_units  = [ InputUnitRTL( PacketType, InputQueueType, input_qsize )
+                       for _ in range( s.num_sources ) ]
     s.route_units  = [ RouteUnitRTL( PacketType, IDType, RoutingLogic, s.num_outports )
-                       for _ in range( s.num_inports ) ]
+                       for _ in range( s.num_sources ) ]
 
-    # No switch unit is needed if there is only one input port
-    if s.num_inports > 1:
-      s.switch_unit  = [ SwitchUnitRTL( PacketType, s.num_inports )
+    # No switch unit is needed if there is only one input queue
+    if s.num_sources > 1:
+      s.switch_unit  = [ SwitchUnitType( PacketType, s.num_sources,
+                                         ArbiterType=ArbiterType )
                         for _ in range( s.num_outports ) ]
 
-    s.output_units = [ OutputUnitRTL( PacketType ) for _ in range( s.num_outports ) ]
+    s.output_units = [ OutputUnitRTL( PacketType, OutputQueueType, output_qsize )
+                       for _ in range( s.num_outports ) ]
 
     # Connections
-    for i in range( s.num_inports ):
-      s.recv[i]             //= s.input_units[i].recv
+    if s.num_classes > 1:
+      for i in range( s.num_inports ):
+        s.recv[i] //= s.class_units[i].recv
+        s.class_units[i].i_id //= s.i_id
+        for c in range( s.num_classes ):
+          k = i * num_classes + c
+          s.class_units[i].send[c]    //= s.input_units[k].recv
+          s.class_units[i].i_vals[c]  //= s.route_units[k].o_val
+          s.class_units[i].i_xfers[c] //= s.route_units[k].o_xfer
+    else:
+      for i in range( s.num_inports ):
+        s.recv[i] //= s.input_units[i].recv
+
+    for i in range( s.num_sources ):
       s.input_units[i].send //= s.route_units[i].recv
       s.route_units[i].i_id //= s.i_id
+      s.o_vals[i]           //= s.route_units[i].o_val
 
-    if s.num_inports > 1:
-      for i in range( s.num_inports ):
+    if s.num_sources > 1:
+      for i in range( s.num_sources ):
         for j in range( s.num_outports):
           s.route_units[i].send[j] //= s.switch_unit[j].recv[i]
 
@@ -54,7 +112,7 @@ class Router( Component ):
         s.switch_unit[j].send //= s.output_units[j].recv
         s.output_units[j].send //= s.send[j]
 
-    # Skip the switch unit if there is only one input port
+    # Skip the switch unit if there is only one input queue
     else:
       for j in range( s.num_outports ):
         s.route_units[0].send[j] //= s.output_units[j].recv
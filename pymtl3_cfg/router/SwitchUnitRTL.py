@@ -4,6 +4,9 @@ SwitchUnitRTL.py
 =========================================================================
 A switch unit with GetIfcRTL and OStreamIfc.
 
+The inputs are arbitrated round-robin by default. ArbiterType replaces
+the round-robin arbiter with one of the arbiters in PriorityArbiters.
+
 Author : Yanghui Ou, Cheng Tan
   Date : Feb 28, 2019
 """
@@ -16,7 +19,7 @@ from pymtl3.stdlib.primitive import Encoder
 
 class SwitchUnitRTL( Component ):
 
-  def construct( s, PacketType, num_inports=5 ):
+  def construct( s, PacketType, num_inports=5, ArbiterType=None ):
 
     # Local parameters
 
@@ -30,8 +33,15 @@ class SwitchUnitRTL( Component ):
 
     # Components
 
-    s.arbiter = RoundRobinArbiterEn( num_inports )
-    s.arbiter.en //= 1
+    # The arbiter only moves on once the granted packet is sent, so a
+    # stalled output cannot skip over an input
+    if ArbiterType is None:
+      s.arbiter = RoundRobinArbiterEn( num_inports )
+    else:
+      s.arbiter = ArbiterType( PacketType, num_inports )
+      for i in range( num_inports ):
+        s.arbiter.msgs[i] //= s.recv[i].msg
+    s.arbiter.en //= s.send.rdy
 
     s.mux = Mux( PacketType, num_inports )
     s.mux.out //= s.send.msg
@@ -0,0 +1,92 @@
+'''
+==========================================================================
+TableRoutingLogic.py
+==========================================================================
+Routing logic that looks up the output ports of a packet in a table.
+
+The address space is split into pages of 2**page_nbits addresses, and
+the table holds the output port bit vector of each page, starting from
+address 0. A packet is routed with a single table read indexed by the
+page bits of its address, so the logic depth does not depend on the
+number of regions. Addresses above the last page of the table are routed
+to default_outport, or dropped if default_outport is None. A page whose
+entry is 0 is a hole in the map.
+
+The routing logic follows the RoutingLogic(PacketType, IDType,
+num_outports) contract of RouteUnitRTL, so the table is bound with
+mk_table_routing_logic:
+
+  RoutingLogic = mk_table_routing_logic( [ 0b01, 0b10, 0b00, 0b11 ],
+                                         page_nbits=12 )
+
+RegMap generates the table from a register map.
+'''
+from pymtl3 import *
+
+#-------------------------------------------------------------------------
+# Helper functions
+#-------------------------------------------------------------------------
+
+def mk_table_routing_logic( table, page_nbits, default_outport=None ):
+  table = tuple( table )
+
+  class _TableRoutingLogic( TableRoutingLogic ):
+    def construct( s, PacketType, IDType, num_outports ):
+      super().construct( PacketType, IDType, num_outports, table, page_nbits,
+                         default_outport )
+
+  _TableRoutingLogic.__name__ = 'TableRoutingLogic'
+  return _TableRoutingLogic
+
+#-------------------------------------------------------------------------
+# TableRoutingLogic
+#-------------------------------------------------------------------------
+
+class TableRoutingLogic( Component ):
+  def construct( s, PacketType, IDType, num_outports, table, page_nbits,
+                 default_outport=None ):
+    # Local parameters
+    s.addr_nbits   = PacketType.get_field_type( 'addr' ).nbits
+    s.num_pages    = len( table )
+    s.idx_nbits    = max( clog2( s.num_pages ), 1 )
+    s.num_entries  = 2**s.idx_nbits
+    s.page_nbits   = page_nbits
+    s.top_nbits    = page_nbits + s.idx_nbits
+    s.OutType      = mk_bits( num_outports )
+    s.miss_val     = 0 if default_outport is None else 1 << default_outport
+
+    assert s.num_pages > 0
+    assert s.top_nbits <= s.addr_nbits
+    for val in table:
+      assert 0 <= val < 2**num_outports
+    assert default_outport is None or 0 <= default_outport < num_outports
+
+    # Interface
+    s.i_id  = InPort( IDType )
+    s.i_pkt = InPort( PacketType )
+    s.o_val = OutPort( s.OutType )
+
+    # Wires
+    s.idx  = Wire( s.idx_nbits )
+    s.hit  = Wire()
+    s.vals = [ Wire( s.OutType ) for _ in range( s.num_entries ) ]
+
+    # The table is padded to a power of two with misses
+    for i in range( s.num_entries ):
+      s.vals[i] //= table[i] if i < s.num_pages else s.miss_val
+
+    s.idx //= s.i_pkt.addr[s.page_nbits:s.top_nbits]
+    if s.top_nbits < s.addr_nbits:
+      s.hit //= lambda: s.i_pkt.addr[s.top_nbits:s.addr_nbits] == 0
+    else:
+      s.hit //= 1
+
+    @update
+    def up_o_val():
+      if s.hit:
+        s.o_val @= s.vals[s.idx]
+      else:
+        s.o_val @= s.miss_val
+
+  def line_trace( s ):
+    return f"{s.i_pkt}({s.i_id}){s.o_val.bin()}"
@@ -0,0 +1,146 @@
+'''
+==========================================================================
+TreeReqRespRouter.py
+==========================================================================
+A k-ary tree of ReqRespRouters for a large number of terminals. It has
+the same interface as a flat ReqRespRouter, but every router in the tree
+only switches between at most radix ports. This keeps the arbiters and
+response muxes narrow at the cost of one router hop per level.
+
+The tree is generated from the address map of the terminals: a list of
+(base, size) regions where region i belongs to terminal i. Terminal t is
+reached through child (t // radix**(depth-1-l)) % radix on level l of the
+tree, so the routers on level l cover groups of consecutive terminals.
+
+Every router gets its own routing logic (see mk_tree_routing_logic),
+which only decodes the address spans of its children: the regions of the
+terminals in each child subtree, where regions that are next to each
+other in the address map are merged into one span. The decode logic of a
+router therefore grows with the number of spans in its subtree rather
+than with the whole address map, and the routers on the last level
+decode the exact regions of their terminals. Packets to unmapped
+addresses are dropped, either at the root or at the router where they
+fall between the spans of its children.
+
+RouterType selects the router model of the tree nodes, e.g.,
+ReqRespRouterFL for fast system-scale simulation.
+'''
+from pymtl3 import *
+from pymtl3.stdlib.stream.ifcs import IStreamIfc, OStreamIfc
+from pymtl3.stdlib.stream.queues import StreamPipeQueue
+
+from .AddressMapRoutingLogic import (_normalize_address_map,
+                                     mk_address_map_routing_logic)
+from .ReqRespRouter import ReqRespRouter
+from .SwitchUnitRTL import SwitchUnitRTL
+
+#-------------------------------------------------------------------------
+# Helper functions
+#-------------------------------------------------------------------------
+
+def _tree_depth( num_terminals, radix ):
+  depth = 1
+  while radix**depth < num_terminals:
+    depth += 1
+  return depth
+
+def _num_routers( num_terminals, radix, depth, level ):
+  span = radix**( depth - level )
+  return ( num_terminals + span - 1 ) // span
+
+def _num_children( num_terminals, radix, depth, level, idx ):
+  span     = radix**( depth - level )
+  child    = radix**( depth - level - 1 )
+  covered  = min( num_terminals, ( idx + 1 ) * span ) - idx * span
+  return ( covered + child - 1 ) // child
+
+# Address map of the router with index idx on level lvl: one
+# (base, size, child) span per run of child regions that are next to each
+# other when sorted by address
+
+def _subtree_address_map( regions, radix, depth, lvl, idx ):
+  span      = radix**( depth - lvl )
+  child     = radix**( depth - lvl - 1 )
+  terminals = range( idx * span, min( len( regions ), ( idx + 1 ) * span ) )
+
+  spans = []
+  for t in sorted( terminals, key=lambda t: regions[t] ):
+    base, size, _ = regions[t]
+    c = ( t - idx * span ) // child
+    if spans and spans[-1][2] == c:
+      spans[-1] = ( spans[-1][0], base + size - spans[-1][0], c )
+    else:
+      spans.append( ( base, size, c ) )
+  return spans
+
+def mk_tree_routing_logic( address_map, radix, lvl, idx ):
+  for region in address_map:
+    assert len( region ) == 2, 'terminal i owns region i'
+  regions = _normalize_address_map( address_map )
+  depth   = _tree_depth( len( regions ), radix )
+
+  RoutingLogic = mk_address_map_routing_logic(
+    _subtree_address_map( regions, radix, depth, lvl, idx ) )
+  RoutingLogic.__name__ = f'TreeRoutingLogic_{lvl}_{idx}'
+  return RoutingLogic
+
+#-------------------------------------------------------------------------
+# TreeReqRespRouter
+#-------------------------------------------------------------------------
+
+class TreeReqRespRouter( Component ):
+  def construct( s, PacketType, IDType, address_map, radix=4,
+                 InputQueueType=StreamPipeQueue, input_qsize=1,
+                 OutputQueueType=None, output_qsize=2,
+                 SwitchUnitType=SwitchUnitRTL, ArbiterType=None,
+                 RouterType=ReqRespRouter ):
+
+    # Local parameters
+    assert radix >= 2
+    s.num_terminals = len( address_map )
+    s.radix         = radix
+    s.depth         = _tree_depth( s.num_terminals, radix )
+
+    # Interface
+    s.minion_req  = IStreamIfc( PacketType )
+    s.minion_resp = OStreamIfc( PacketType )
+
+    s.master_req  = [ OStreamIfc( PacketType ) for _ in range( s.num_terminals ) ]
+    s.master_resp = [ IStreamIfc( PacketType ) for _ in range( s.num_terminals ) ]
+
+    # Components
+    # Routers are ordered level by level, starting from the root
+    s.router_pos = []
+    for lvl in range( s.depth ):
+      for i in range( _num_routers( s.num_terminals, radix, s.depth, lvl ) ):
+        s.router_pos.append( ( lvl, i ) )
+
+    s.routers = [
+      RouterType( PacketType, IDType,
+                  mk_tree_routing_logic( address_map, radix, lvl, i ),
+                  _num_children( s.num_terminals, radix, s.depth, lvl, i ),
+                  InputQueueType=InputQueueType, input_qsize=input_qsize,
+                  OutputQueueType=OutputQueueType,
+                  output_qsize=output_qsize,
+                  SwitchUnitType=SwitchUnitType,
+                  ArbiterType=ArbiterType )
+      for lvl, i in s.router_pos ]
+
+    # Connections
+    router_idx = { pos : n for n, pos in enumerate( s.router_pos ) }
+
+    s.minion_req  //= s.routers[0].minion_req
+    s.minion_resp //= s.routers[0].minion_resp
+
+    for n, ( lvl, i ) in enumerate( s.router_pos ):
+      for c in range( s.routers[n].num_terminals ):
+        if lvl < s.depth - 1:
+          child = s.routers[ router_idx[ ( lvl + 1, i * radix + c ) ] ]
+          s.routers[n].master_req[c]  //= child.minion_req
+          s.routers[n].master_resp[c] //= child.minion_resp
+        else:
+          s.routers[n].master_req[c]  //= s.master_req [ i * radix + c ]
+          s.routers[n].master_resp[c] //= s.master_resp[ i * radix + c ]
+
+  def line_trace( s ):
+    return s.routers[0].line_trace()
@@ -1,3 +1,4 @@
 from .InputUnitRTL import InputUnitRTL
+from .OneHotSwitchUnitRTL import OneHotSwitchUnitRTL
 from .OutputUnitRTL import OutputUnitRTL
 from .SwitchUnitRTL import SwitchUnitRTL
@@ -0,0 +1,160 @@
+'''
+==========================================================================
+AddressMapRoutingLogic_test.py
+==========================================================================
+Test cases for AddressMapRoutingLogic.
+'''
+import time
+
+import pytest
+
+from pymtl3 import *
+from pymtl3.stdlib.test_utils import config_model_with_cmdline_opts, run_sim
+
+from ..AddressMapRoutingLogic import mk_address_map_routing_logic
+from ..ReqRespRouter import ReqRespRouter
+from .ReqRespRouter_test import (TestHarness, TestPkt, addr_nbits,
+                                 mk_req_resp_msgs, rd, wr)
+
+#-------------------------------------------------------------------------
+# Helper functions
+#-------------------------------------------------------------------------
+
+def mk_routing_logic( address_map, num_outports, default_outport=None ):
+  RoutingLogic = mk_address_map_routing_logic( address_map, default_outport )
+  dut = RoutingLogic( TestPkt, mk_bits( addr_nbits ), num_outports )
+  dut.elaborate()
+  dut.apply( DefaultPassGroup() )
+  dut.sim_reset()
+  return dut
+
+def route( dut, addr ):
+  dut.i_pkt @= TestPkt( rd, addr, 0 )
+  dut.sim_eval_combinational()
+  return int( dut.o_val )
+
+#-------------------------------------------------------------------------
+# Tests
+#-------------------------------------------------------------------------
+
+def test_aligned_regions():
+  dut = mk_routing_logic( [ ( 0x0000, 0x1000 ), ( 0x1000, 0x1000 ),
+                            ( 0x4000, 0x4000 ) ], 3 )
+  assert route( dut, 0x0000 ) == 0b001
+  assert route( dut, 0x0fff ) == 0b001
+  assert route( dut, 0x1000 ) == 0b010
+  assert route( dut, 0x1fff ) == 0b010
+  assert route( dut, 0x2000 ) == 0b000
+  assert route( dut, 0x4000 ) == 0b100
+  assert route( dut, 0x7fff ) == 0b100
+  assert route( dut, 0x8000 ) == 0b000
+
+def test_unaligned_regions():
+  dut = mk_routing_logic( [ ( 0x0010, 0x0030 ), ( 0x0040, 0x0003 ),
+                            ( 0xfff0, 0x0010 ) ], 3 )
+  assert route( dut, 0x000f ) == 0b000
+  assert route( dut, 0x0010 ) == 0b001
+  assert route( dut, 0x003f ) == 0b001
+  assert route( dut, 0x0040 ) == 0b010
+  assert route( dut, 0x0042 ) == 0b010
+  assert route( dut, 0x0043 ) == 0b000
+  assert route( dut, 0xffff ) == 0b100
+
+def test_shared_outport_and_default():
+  dut = mk_routing_logic( [ ( 0x0000, 0x0100, 1 ), ( 0x0200, 0x0100, 1 ),
+                            ( 0x0100, 0x0100, 0 ) ], 3, default_outport=2 )
+  assert route( dut, 0x0000 ) == 0b010
+  assert route( dut, 0x0100 ) == 0b001
+  assert route( dut, 0x02ff ) == 0b010
+  assert route( dut, 0x0300 ) == 0b100
+  assert route( dut, 0xffff ) == 0b100
+
+def test_multicast_region():
+  dut = mk_routing_logic( [ ( 0x0000, 0x0100 ), ( 0x0100, 0x0100 ),
+                            ( 0x0200, 0x0100 ),
+                            ( 0x1000, 0x0100, [ 0, 1, 2 ] ),
+                            ( 0x1100, 0x0100, ( 0, 2 ) ) ], 3 )
+  assert route( dut, 0x0100 ) == 0b010
+  assert route( dut, 0x1000 ) == 0b111
+  assert route( dut, 0x10ff ) == 0b111
+  assert route( dut, 0x1100 ) == 0b101
+  assert route( dut, 0x1200 ) == 0b000
+
+def test_multicast_in_order():
+  # The RespOrderUnit tracks one terminal per request
+  RoutingLogic = mk_address_map_routing_logic(
+    [ ( 0x0000, 0x1000 ), ( 0x1000, 0x1000 ), ( 0x2000, 0x1000, [ 0, 1 ] ) ] )
+  assert RoutingLogic.multicast
+  assert not mk_address_map_routing_logic(
+    [ ( 0x0000, 0x1000 ), ( 0x1000, 0x1000, [ 1 ] ) ] ).multicast
+  with pytest.raises( AssertionError, match='multicast' ):
+    ReqRespRouter( TestPkt, mk_bits( addr_nbits ), RoutingLogic,
+                   num_terminals=2, in_order=True ).elaborate()
+
+def test_overlap():
+  with pytest.raises( AssertionError ):
+    mk_address_map_routing_logic( [ ( 0x0000, 0x1000 ), ( 0x0800, 0x1000 ) ] )
+
+def test_rd_wr_router( cmdline_opts ):
+  RoutingLogic = mk_address_map_routing_logic( [
+    ( 0x0000, 0x1000 ), ( 0x1000, 0x1000 ), ( 0x2000, 0x1000 ),
+    ( 0x3000, 0xd000 ),
+  ])
+  data = [ 0xdeadbeef, 0xcafec001, 0xbadbed00, 0xc01dbeef ]
+  req_resps = []
+  for i in range( 4 ):
+    req_resps += [ (wr, 0x1000 * i, data[i]), (wr, 0x1000 * i, 0) ]
+  for i in range( 4 ):
+    req_resps += [ (rd, 0x1000 * i, 0), (rd, 0x1000 * i, data[i]) ]
+  req_msgs, resp_msgs = mk_req_resp_msgs( req_resps )
+  th = TestHarness( TestPkt, req_msgs, resp_msgs, RoutingLogic=RoutingLogic )
+  config_model_with_cmdline_opts( th, cmdline_opts, duts=['dut'] )
+  run_sim( th, cmdline_opts )
+  for i in range( 4 ):
+    assert th.cfg_terminals[i].o_config[0] == data[i]
+
+#-------------------------------------------------------------------------
+# Simulation speed
+#-------------------------------------------------------------------------
+# Compares against a hand-written style if/elif chain over the same
+# regions. Run with -m benchmark -s to see the results.
+
+class ChainRoutingLogic( Component ):
+  def construct( s, PacketType, IDType, num_outports ):
+    s.i_id  = InPort( IDType )
+    s.i_pkt = InPort( PacketType )
+    s.o_val = OutPort( mk_bits( num_outports ) )
+
+    s.limits = [ ( i + 1 ) * ( 2**addr_nbits // num_outports )
+                 for i in range( num_outports ) ]
+
+    @update
+    def up_routing_logic():
+      s.o_val @= 0
+      for i in range( num_outports ):
+        if zext( s.i_pkt.addr, addr_nbits+1 ) < s.limits[i]:
+          s.o_val[i] @= 1
+          break
+
+@pytest.mark.benchmark
+def test_sim_speed():
+  num_outports = 128
+  size = 2**addr_nbits // num_outports
+  addrs = [ ( i * 7919 ) % 2**addr_nbits for i in range( 2000 ) ]
+
+  results = {}
+  for name, RoutingLogic in [
+    ( 'if/elif chain', ChainRoutingLogic ),
+    ( 'address map  ', mk_address_map_routing_logic(
+                          [ ( i * size, size ) for i in range( num_outports ) ] ) ),
+  ]:
+    dut = RoutingLogic( TestPkt, mk_bits( addr_nbits ), num_outports )
+    dut.elaborate()
+    dut.apply( DefaultPassGroup() )
+    dut.sim_reset()
+    start = time.perf_counter()
+    results[name] = [ route( dut, addr ) for addr in addrs ]
+    elapsed = time.perf_counter() - start
+    print( f'{name}: {len( addrs ) / elapsed:8.0f} lookups/s' )
+
+  assert results['if/elif chain'] == results['address map  ']
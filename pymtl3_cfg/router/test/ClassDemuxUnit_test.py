@@ -0,0 +1,275 @@
+'''
+==========================================================================
+ClassDemuxUnit_test.py
+==========================================================================
+Test cases for routers with several traffic classes.
+'''
+import pytest
+
+from pymtl3 import *
+from pymtl3.stdlib.stream.ifcs import IStreamIfc, OStreamIfc
+from pymtl3.stdlib.stream.queues import StreamNormalQueue
+from pymtl3.stdlib.test_utils import config_model_with_cmdline_opts, run_sim
+
+from ...ifcs.msg_types import CfgType
+from ...terminal.ConfigTerminal import ConfigTerminal
+from ..ClassDemuxUnit import ClassDemuxUnit
+from ..ClassLogic import ReadWriteClassLogic, mk_field_class_logic
+from ..ReqRespRouter import ReqRespRouter
+from .ReqRespRouter_test import (TestHarness, TestPkt, TestRoutingLogic,
+                                 addr_nbits, mk_req_resp_msgs, rd, wr)
+
+#-------------------------------------------------------------------------
+# Class logic and demux
+#-------------------------------------------------------------------------
+
+def mk_dut( ClassLogic, num_classes ):
+  dut = ClassDemuxUnit( TestPkt, mk_bits( addr_nbits ), TestRoutingLogic,
+                        ClassLogic, num_classes, num_outports=4,
+                        max_pending=2 )
+  dut.elaborate()
+  dut.apply( DefaultPassGroup() )
+  for c in range( num_classes ):
+    dut.i_xfers[c] @= 0
+    dut.i_vals[c]  @= 0
+  dut.sim_reset()
+  return dut
+
+def demux( dut, pkt, rdys ):
+  dut.recv.val @= 1
+  dut.recv.msg @= pkt
+  for c, rdy in enumerate( rdys ):
+    dut.send[c].rdy @= rdy
+  dut.sim_eval_combinational()
+  vals = [ int( dut.send[c].val ) for c in range( dut.num_classes ) ]
+  return vals, int( dut.recv.rdy )
+
+# Sends pkt into its class queue and lets the route unit of class c take
+# a packet to the output ports in deq_vals
+def demux_tick( dut, pkt, deq_class=None, deq_vals=0 ):
+  vals, rdy = demux( dut, pkt, [ 1 ] * dut.num_classes )
+  for c in range( dut.num_classes ):
+    dut.i_xfers[c] @= c == deq_class
+    dut.i_vals[c]  @= deq_vals if c == deq_class else 0
+  dut.sim_tick()
+  dut.recv.val @= 0
+  for c in range( dut.num_classes ):
+    dut.i_xfers[c] @= 0
+  return vals, rdy
+
+def test_read_write_demux():
+  dut = mk_dut( ReadWriteClassLogic, 2 )
+  assert demux( dut, TestPkt( wr, 0, 0 ), [ 1, 1 ] ) == ( [ 1, 0 ], 1 )
+  assert demux( dut, TestPkt( rd, 0, 0 ), [ 1, 1 ] ) == ( [ 0, 1 ], 1 )
+  # Only the queue of its own class can stall a packet
+  assert demux( dut, TestPkt( rd, 0, 0 ), [ 0, 1 ] ) == ( [ 0, 1 ], 1 )
+  assert demux( dut, TestPkt( wr, 0, 0 ), [ 0, 1 ] ) == ( [ 1, 0 ], 0 )
+
+def test_field_demux():
+  dut = mk_dut( mk_field_class_logic( 'data' ), 3 )
+  assert demux( dut, TestPkt( wr, 0, 0 ), [ 1, 1, 1 ] ) == ( [ 1, 0, 0 ], 1 )
+  assert demux( dut, TestPkt( wr, 0, 2 ), [ 1, 1, 1 ] ) == ( [ 0, 0, 1 ], 1 )
+  # Values beyond the last class go to class 0
+  assert demux( dut, TestPkt( wr, 0, 3 ), [ 1, 1, 1 ] ) == ( [ 1, 0, 0 ], 1 )
+  assert demux( dut, TestPkt( wr, 0, 5 ), [ 1, 1, 1 ] ) == ( [ 0, 1, 0 ], 1 )
+
+def test_same_outport_order():
+  dut = mk_dut( ReadWriteClassLogic, 2 )
+  # A write to terminal 0 is queued in class 0
+  assert demux_tick( dut, TestPkt( wr, 0x0000, 0 ) ) == ( [ 1, 0 ], 1 )
+  # Reads to other terminals pass, a read to terminal 0 waits
+  assert demux( dut, TestPkt( rd, 0x1000, 0 ), [ 1, 1 ] ) == ( [ 0, 1 ], 1 )
+  assert demux( dut, TestPkt( rd, 0x0000, 0 ), [ 1, 1 ] ) == ( [ 0, 0 ], 0 )
+  # until the write has left
+  demux_tick( dut, TestPkt( rd, 0x0000, 0 ), deq_class=0, deq_vals=0b1 )
+  assert demux( dut, TestPkt( rd, 0x0000, 0 ), [ 1, 1 ] ) == ( [ 0, 1 ], 1 )
+
+def test_burst_class():
+  bwr = CfgType.BURST_WRITE
+  dut = mk_dut( mk_field_class_logic( 'data' ), 2 )
+  # The beats go to the class of the header, whatever their data
+  assert demux_tick( dut, TestPkt( bwr, 0x0000, 2 ) ) == ( [ 1, 0 ], 1 )
+  assert demux_tick( dut, TestPkt( wr,  0x0000, 1 ) ) == ( [ 1, 0 ], 1 )
+  assert demux_tick( dut, TestPkt( wr,  0x0000, 3 ),
+                     deq_class=0, deq_vals=0b1 ) == ( [ 1, 0 ], 1 )
+  assert demux( dut, TestPkt( wr, 0x1000, 1 ), [ 1, 1 ] ) == ( [ 0, 1 ], 1 )
+
+@pytest.mark.parametrize( "sink_delay", [0, 20] )
+def test_rd_wr_all( cmdline_opts, sink_delay ):
+  req_resps = []
+  for i in range( 4 ):
+    req_resps += [ (wr, 0x1000 * i, 0xc0de0000 + i), (wr, 0x1000 * i, 0) ]
+  for i in range( 4 ):
+    req_resps += [ (rd, 0x1000 * i, 0), (rd, 0x1000 * i, 0xc0de0000 + i) ]
+  req_msgs, resp_msgs = mk_req_resp_msgs( req_resps )
+  th = TestHarness( TestPkt, req_msgs, resp_msgs, num_classes=2,
+                    ClassLogic=ReadWriteClassLogic )
+  th.set_param( "top.sink.construct", initial_delay=sink_delay )
+  config_model_with_cmdline_opts( th, cmdline_opts, duts=['dut'] )
+  run_sim( th, cmdline_opts )
+
+# The RespOrderUnit relies on the requests to a terminal staying in order
+def test_in_order( cmdline_opts ):
+  req_resps = []
+  for i in range( 4 ):
+    req_resps += [ (wr, 0x1000 * i, 0xc0de0000 + i), (wr, 0x1000 * i, 0),
+                   (rd, 0x1000 * i, 0), (rd, 0x1000 * i, 0xc0de0000 + i) ]
+  req_msgs, resp_msgs = mk_req_resp_msgs( req_resps )
+  th = TestHarness( TestPkt, req_msgs, resp_msgs, ordered=True,
+                    resp_delays=[ 8, 0, 3, 1 ], in_order=True,
+                    num_classes=2, ClassLogic=ReadWriteClassLogic )
+  config_model_with_cmdline_opts( th, cmdline_opts, duts=['dut'] )
+  run_sim( th, cmdline_opts )
+
+#-------------------------------------------------------------------------
+# Read latency under mixed traffic
+#-------------------------------------------------------------------------
+# Terminal 0 is busy: it only takes a request every slow_period cycles.
+# Every round_period cycles the host writes a few words to terminal 0 and
+# reads from terminals 1 to 3. With a single class the reads wait behind
+# the writes to terminal 0. The input queues are deep enough to hold the
+# writes of a round, so that with two classes the reads can pass them.
+
+slow_period  = 16
+round_period = 80
+round_writes = 4
+
+class Throttle( Component ):
+  def construct( s, PacketType, period ):
+    s.recv = IStreamIfc( PacketType )
+    s.send = OStreamIfc( PacketType )
+
+    s.cnt_r = Wire( clog2( period ) )
+
+    s.send.msg //= s.recv.msg
+    s.send.val //= lambda: s.recv.val & ( s.cnt_r == 0 )
+    s.recv.rdy //= lambda: s.send.rdy & ( s.cnt_r == 0 )
+
+    @update_ff
+    def up_cnt():
+      if s.reset:
+        s.cnt_r <<= 0
+      elif s.cnt_r != 0:
+        s.cnt_r <<= s.cnt_r + 1 if s.cnt_r != period - 1 else 0
+      elif s.recv.val & s.recv.rdy:
+        s.cnt_r <<= 1
+
+class MixedTrafficHarness( Component ):
+  def construct( s, num_config_regs=1, **router_params ):
+    s.req  = IStreamIfc( TestPkt )
+    s.resp = OStreamIfc( TestPkt )
+
+    s.dut = ReqRespRouter( TestPkt, mk_bits( addr_nbits ), TestRoutingLogic,
+                           num_terminals=4, **router_params )
+    s.throttle = Throttle( TestPkt, slow_period )
+    s.cfg_terminals = [
+      ConfigTerminal( TestPkt, num_config_regs=num_config_regs,
+                      num_status_regs=0 )
+      for _ in range( 4 ) ]
+
+    s.req  //= s.dut.minion_req
+    s.resp //= s.dut.minion_resp
+
+    s.dut.master_req[0] //= s.throttle.recv
+    s.throttle.send     //= s.cfg_terminals[0].minion_req
+    for i in range( 1, 4 ):
+      s.dut.master_req[i] //= s.cfg_terminals[i].minion_req
+    for i in range( 4 ):
+      s.cfg_terminals[i].minion_resp //= s.dut.master_resp[i]
+
+# Returns the latency of every read, counted from the cycle the host
+# wants to send it to the cycle its response comes back
+def run_mixed_traffic( num_rounds=8, **router_params ):
+  th = MixedTrafficHarness( **router_params )
+  th.elaborate()
+  th.apply( DefaultPassGroup() )
+  th.sim_reset()
+
+  # Requests the host wants to send and the cycle they were issued
+  reqs    = []
+  issued  = {}
+  latency = []
+  nresps  = 0
+  cycle   = 0
+  th.resp.rdy @= 1
+  while nresps < num_rounds * ( round_writes + 3 ):
+    assert cycle < 2 * num_rounds * round_period
+    if cycle % round_period == 0 and cycle < num_rounds * round_period:
+      n = cycle // round_period
+      for _ in range( round_writes ):
+        reqs.append( TestPkt( wr, 0x0000, n ) )
+      for i in range( 1, 4 ):
+        # The address tells the reads apart
+        reqs.append( TestPkt( rd, 0x1000 * i + n, 0 ) )
+        issued[0x1000 * i + n] = cycle
+
+    th.req.val @= len( reqs ) > 0
+    if reqs:
+      th.req.msg @= reqs[0]
+    th.sim_eval_combinational()
+
+    if th.req.val & th.req.rdy:
+      reqs.pop( 0 )
+    if th.resp.val:
+      nresps += 1
+      if th.resp.msg.type_ == rd:
+        latency.append( cycle - issued[int( th.resp.msg.addr )] )
+    th.sim_tick()
+    cycle += 1
+
+  return latency
+
+def test_read_latency():
+  results = {}
+  for name, params in [
+    ( '1 class          ', {} ),
+    ( 'read/write classes', dict( num_classes=2,
+                                  ClassLogic=ReadWriteClassLogic ) ),
+  ]:
+    latency = run_mixed_traffic( InputQueueType=StreamNormalQueue,
+                                 input_qsize=round_writes, **params )
+    results[name.strip()] = latency
+    print( f'{name}: read latency avg {sum( latency ) / len( latency ):.1f} '
+           f'max {max( latency )} cycles' )
+
+  assert max( results['read/write classes'] ) < min( results['1 class'] )
+
+#-------------------------------------------------------------------------
+# Bursts
+#-------------------------------------------------------------------------
+# The beats of a burst to the busy terminal 0 wait in the write class. A
+# read to terminal 1 can pass the burst, while a read to terminal 0 must
+# not get between the header and the beats. The read to terminal 0 waits
+# in front of the class queues, so the packets behind it wait as well.
+
+def test_read_during_burst():
+  bwr  = CfgType.BURST_WRITE
+  reqs = [ TestPkt( bwr, 0x0000, 3 ), TestPkt( wr, 0x0000, 0xa0 ),
+           TestPkt( wr, 0x0000, 0xa1 ), TestPkt( wr, 0x0000, 0xa2 ),
+           TestPkt( rd, 0x1000, 0 ), TestPkt( rd, 0x0000, 0 ),
+           TestPkt( rd, 0x0001, 0 ) ]
+
+  th = MixedTrafficHarness( num_config_regs=4, num_classes=2,
+                            ClassLogic=ReadWriteClassLogic,
+                            InputQueueType=StreamNormalQueue, input_qsize=4 )
+  th.elaborate()
+  th.apply( DefaultPassGroup() )
+  th.sim_reset()
+
+  resps = []
+  th.resp.rdy @= 1
+  for _ in range( 10 * slow_period ):
+    th.req.val @= len( reqs ) > 0
+    if reqs:
+      th.req.msg @= reqs[0]
+    th.sim_eval_combinational()
+    if th.req.val & th.req.rdy:
+      reqs.pop( 0 )
+    if th.resp.val:
+      resps.append( th.resp.msg.clone() )
+    th.sim_tick()
+
+  assert resps == [ TestPkt( rd, 0x1000, 0    ), TestPkt( wr, 0x0000, 0 ),
+                    TestPkt( rd, 0x0000, 0xa0 ), TestPkt( rd, 0x0001, 0xa1 ) ]
+  assert [ th.cfg_terminals[0].o_config[i] for i in range( 3 ) ] == \
+         [ 0xa0, 0xa1, 0xa2 ]
@@ -0,0 +1,204 @@
+'''
+==========================================================================
+OneHotSwitchUnitRTL_test.py
+==========================================================================
+Test cases for OneHotSwitchUnitRTL.
+'''
+import random
+import re
+import time
+
+import pytest
+
+from pymtl3 import *
+from pymtl3.stdlib.stream import StreamSinkFL, StreamSourceFL
+from pymtl3.stdlib.test_utils import config_model_with_cmdline_opts, run_sim
+
+from ..DummyRoutingLogic import DummyRoutingLogic
+from ..OneHotSwitchUnitRTL import OneHotSwitchUnitRTL
+from ..Router import Router
+from ..SwitchUnitRTL import SwitchUnitRTL
+from .ReqRespRouter_test import TestHarness as ReqRespTestHarness
+from .ReqRespRouter_test import TestPkt, mk_req_resp_msgs, rd, wr
+
+switch_unit_types = [ SwitchUnitRTL, OneHotSwitchUnitRTL ]
+
+#-------------------------------------------------------------------------
+# TestHarness
+#-------------------------------------------------------------------------
+# Several sources send to a single sink through an N-to-1 Router
+
+class TestHarness( Component ):
+  def construct( s, src_msgs, SwitchUnitType, src_delay=0,
+                 ArbiterType=None ):
+    num_inports = len( src_msgs )
+    sink_msgs   = sum( src_msgs, [] )
+
+    s.srcs = [ StreamSourceFL( TestPkt, msgs, interval_delay=src_delay )
+               for msgs in src_msgs ]
+    s.sink = StreamSinkFL( TestPkt, sink_msgs, ordered=False )
+    s.dut  = Router( TestPkt, Bits1, DummyRoutingLogic,
+                     num_inports=num_inports, num_outports=1,
+                     SwitchUnitType=SwitchUnitType,
+                     ArbiterType=ArbiterType )
+    s.dut.i_id //= 0
+
+    for i in range( num_inports ):
+      s.srcs[i].ostream //= s.dut.recv[i]
+    s.dut.send[0] //= s.sink.istream
+
+  def done( s ):
+    return all( src.done() for src in s.srcs ) and s.sink.done()
+
+  def line_trace( s ):
+    return s.dut.line_trace()
+
+def mk_src_msgs( num_inports, num_msgs ):
+  return [ [ TestPkt( wr, 0x1000 * i + j, 0xc0de0000 + j )
+             for j in range( num_msgs ) ] for i in range( num_inports ) ]
+
+#-------------------------------------------------------------------------
+# Tests
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "SwitchUnitType", switch_unit_types )
+@pytest.mark.parametrize( "num_inports, src_delay", [
+  ( 2, 0 ), ( 5, 0 ), ( 5, 3 ), ( 8, 1 ),
+])
+def test_router( cmdline_opts, SwitchUnitType, num_inports, src_delay ):
+  th = TestHarness( mk_src_msgs( num_inports, 8 ), SwitchUnitType,
+                    src_delay )
+  config_model_with_cmdline_opts( th, cmdline_opts, duts=['dut'] )
+  run_sim( th, cmdline_opts )
+
+def test_same_as_switch_unit():
+  # Both units share the arbiter, so they must make the same choices
+  num_inports = 5
+  ref = SwitchUnitRTL( TestPkt, num_inports )
+  dut = OneHotSwitchUnitRTL( TestPkt, num_inports )
+  for m in [ ref, dut ]:
+    m.elaborate()
+    m.apply( DefaultPassGroup() )
+    m.sim_reset()
+
+  rng = random.Random( 0xdeadbeef )
+  for _ in range( 500 ):
+    vals = [ rng.randint( 0, 1 ) for _ in range( num_inports ) ]
+    msgs = [ TestPkt( rng.randint( 0, 1 ), rng.randint( 0, 0xffff ),
+                      rng.randint( 0, 0xffffffff ) )
+             for _ in range( num_inports ) ]
+    rdy = rng.randint( 0, 1 )
+    for m in [ ref, dut ]:
+      for i in range( num_inports ):
+        m.recv[i].val @= vals[i]
+        m.recv[i].msg @= msgs[i]
+      m.send.rdy @= rdy
+      m.sim_eval_combinational()
+
+    assert dut.send.val == ref.send.val
+    if ref.send.val:
+      assert dut.send.msg == ref.send.msg
+    # SwitchUnitRTL sets the rdy of input 0 when nothing is granted
+    for i in range( num_inports ):
+      assert ( dut.recv[i].val & dut.recv[i].rdy ) == \
+             ( ref.recv[i].val & ref.recv[i].rdy )
+
+    ref.sim_tick()
+    dut.sim_tick()
+
+def test_req_resp_router( cmdline_opts ):
+  req_resps = []
+  for i in range( 4 ):
+    req_resps += [ (wr, 0x1000 * i, 0xc0de0000 + i), (wr, 0x1000 * i, 0) ]
+  for i in range( 4 ):
+    req_resps += [ (rd, 0x1000 * i, 0), (rd, 0x1000 * i, 0xc0de0000 + i) ]
+  req_msgs, resp_msgs = mk_req_resp_msgs( req_resps )
+  th = ReqRespTestHarness( TestPkt, req_msgs, resp_msgs,
+                           SwitchUnitType=OneHotSwitchUnitRTL )
+  config_model_with_cmdline_opts( th, cmdline_opts, duts=['dut'] )
+  run_sim( th, cmdline_opts )
+
+#-------------------------------------------------------------------------
+# Benchmarks
+#-------------------------------------------------------------------------
+# Run with -m benchmark -s to see the results.
+
+# Simulates the bare switch units with every input valid, and a Router
+# with a source per input.
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize( "num_inports", [ 4, 16 ] )
+def test_sim_speed( num_inports ):
+  ncycles = 2000
+  for SwitchUnitType in switch_unit_types:
+    dut = SwitchUnitType( TestPkt, num_inports )
+    dut.elaborate()
+    dut.apply( DefaultPassGroup() )
+    dut.sim_reset()
+    for i in range( num_inports ):
+      dut.recv[i].val @= 1
+      dut.recv[i].msg @= TestPkt( wr, i, 0xc0de0000 + i )
+    dut.send.rdy @= 1
+
+    start = time.perf_counter()
+    for _ in range( ncycles ):
+      dut.sim_tick()
+    elapsed = time.perf_counter() - start
+    print( f'{num_inports:3} inports, {SwitchUnitType.__name__:20}: '
+           f'{ncycles/elapsed:6.0f} cycles/sec (switch unit)' )
+
+  src_msgs = mk_src_msgs( num_inports, 512 // num_inports )
+  router_ncycles = {}
+  for SwitchUnitType in switch_unit_types:
+    th = TestHarness( src_msgs, SwitchUnitType )
+    th.elaborate()
+    th.apply( DefaultPassGroup() )
+    th.sim_reset()
+
+    start = time.perf_counter()
+    while not th.done():
+      th.sim_tick()
+    elapsed = time.perf_counter() - start
+
+    router_ncycles[SwitchUnitType] = th.sim_cycle_count()
+    print( f'{num_inports:3} inports, {SwitchUnitType.__name__:20}: '
+           f'{router_ncycles[SwitchUnitType]/elapsed:6.0f} cycles/sec (router)' )
+
+  assert router_ncycles[OneHotSwitchUnitRTL] == router_ncycles[SwitchUnitRTL]
+
+# Translates both units to Verilog and counts the modules and the
+# combinational blocks between the arbiter and the output. The logic
+# depth from the grants to the data is the depth of the encoder plus the
+# depth of the mux for SwitchUnitRTL, and one AND plus an OR tree for
+# OneHotSwitchUnitRTL.
+
+def translate( m ):
+  from pymtl3.passes.backends.verilog import VerilogTranslationPass
+  m.elaborate()
+  m.set_metadata( VerilogTranslationPass.enable, True )
+  m.apply( VerilogTranslationPass() )
+  with open( m.get_metadata( VerilogTranslationPass.translated_filename ) ) as f:
+    return f.read()
+
+@pytest.mark.parametrize( "num_inports", [ 4, 16 ] )
+def test_translated_logic( num_inports, tmp_path, monkeypatch ):
+  pytest.importorskip( 'pymtl3.passes.backends.verilog' )
+  monkeypatch.chdir( tmp_path )
+
+  stats = {}
+  for SwitchUnitType in switch_unit_types:
+    src = translate( SwitchUnitType( TestPkt, num_inports ) )
+    stats[SwitchUnitType] = (
+      len( re.findall( r'^module ', src, re.M ) ),
+      len( re.findall( r'\balways_comb\b', src ) ),
+      len( src.splitlines() ),
+    )
+    print( f'{num_inports:3} inports, {SwitchUnitType.__name__:20}: '
+           '{} modules, {} always_comb blocks, {} lines'.format(
+           *stats[SwitchUnitType] ) )
+
+  ref_modules, ref_blocks, _ = stats[SwitchUnitRTL]
+  modules,     blocks,     _ = stats[OneHotSwitchUnitRTL]
+  # No encoder and no mux
+  assert modules == ref_modules - 2
+  assert blocks  <  ref_blocks
@@ -0,0 +1,188 @@
+'''
+==========================================================================
+PriorityArbiters_test.py
+==========================================================================
+Test cases for the arbiters in PriorityArbiters.
+'''
+import random
+
+import pytest
+
+from pymtl3 import *
+from pymtl3.stdlib.test_utils import config_model_with_cmdline_opts, run_sim
+
+from ..DummyRoutingLogic import DummyRoutingLogic
+from ..OneHotSwitchUnitRTL import OneHotSwitchUnitRTL
+from ..PriorityArbiters import (FixedPriorityArbiter,
+                                mk_field_priority_arbiter,
+                                mk_weighted_round_robin_arbiter)
+from ..Router import Router
+from ..SwitchUnitRTL import SwitchUnitRTL
+from .OneHotSwitchUnitRTL_test import TestHarness, mk_src_msgs
+from .ReqRespRouter_test import TestPkt, rd, wr
+
+#-------------------------------------------------------------------------
+# Helper functions
+#-------------------------------------------------------------------------
+
+def mk_arbiter( ArbiterType, nreqs ):
+  dut = ArbiterType( TestPkt, nreqs )
+  dut.elaborate()
+  dut.apply( DefaultPassGroup() )
+  dut.sim_reset()
+  return dut
+
+# Sets the requests and returns the index of the granted input, or None.
+# The grant is taken if take is set.
+def arbitrate( dut, reqs, msgs=None, take=True ):
+  dut.reqs @= sum( 1 << i for i in reqs )
+  for i, msg in enumerate( msgs or [] ):
+    dut.msgs[i] @= msg
+  dut.en @= take
+  dut.sim_eval_combinational()
+  grants = int( dut.grants )
+  dut.sim_tick()
+  if grants == 0:
+    return None
+  assert grants & ( grants - 1 ) == 0, 'grants must be one-hot'
+  return grants.bit_length() - 1
+
+#-------------------------------------------------------------------------
+# Arbiters
+#-------------------------------------------------------------------------
+
+def test_fixed_priority():
+  dut = mk_arbiter( FixedPriorityArbiter, 4 )
+  assert arbitrate( dut, [] ) is None
+  assert arbitrate( dut, [ 3 ] ) == 3
+  assert arbitrate( dut, [ 1, 2, 3 ] ) == 1
+  assert arbitrate( dut, [ 1, 2, 3 ] ) == 1
+  assert arbitrate( dut, [ 0, 1, 2, 3 ] ) == 0
+
+def test_weighted_round_robin():
+  dut = mk_arbiter( mk_weighted_round_robin_arbiter( [ 3, 1, 2 ] ), 3 )
+  grants = [ arbitrate( dut, [ 0, 1, 2 ] ) for _ in range( 12 ) ]
+  assert grants == [ 0, 0, 0, 1, 2, 2 ] * 2
+
+  # A grant that is not taken does not use up the weight
+  assert arbitrate( dut, [ 0, 1, 2 ], take=False ) == 0
+  assert [ arbitrate( dut, [ 0, 1, 2 ] ) for _ in range( 4 ) ] == [ 0, 0, 0, 1 ]
+
+  # An input that requests alone keeps the grant
+  assert [ arbitrate( dut, [ 1 ] ) for _ in range( 3 ) ] == [ 1, 1, 1 ]
+  assert arbitrate( dut, [ 0, 1 ] ) == 0
+
+def test_field_priority():
+  ArbiterType = mk_field_priority_arbiter( 'type_', { rd : 1 } )
+  dut  = mk_arbiter( ArbiterType, 4 )
+  msgs = [ TestPkt( wr, 0, 0 ), TestPkt( rd, 0, 0 ),
+           TestPkt( wr, 0, 0 ), TestPkt( rd, 0, 0 ) ]
+  # Round-robin among the reads, then among the writes
+  assert [ arbitrate( dut, [ 0, 1, 2, 3 ], msgs ) for _ in range( 4 ) ] == \
+         [ 1, 3, 1, 3 ]
+  assert [ arbitrate( dut, [ 0, 2 ], msgs ) for _ in range( 3 ) ] == [ 0, 2, 0 ]
+
+def test_field_priority_wide_field():
+  # Only the listed addresses are decoded, the others have priority zero
+  ArbiterType = mk_field_priority_arbiter( 'addr', { 0x1000 : 2, 0x2000 : 1 } )
+  dut  = mk_arbiter( ArbiterType, 3 )
+  msgs = [ TestPkt( wr, 0x2000, 0 ), TestPkt( wr, 0x3000, 0 ),
+           TestPkt( wr, 0x1000, 0 ) ]
+  assert arbitrate( dut, [ 0, 1, 2 ], msgs ) == 2
+  assert arbitrate( dut, [ 0, 1 ], msgs ) == 0
+  assert arbitrate( dut, [ 1 ], msgs ) == 1
+
+def test_field_priority_empty_map():
+  with pytest.raises( AssertionError, match='empty' ):
+    mk_arbiter( mk_field_priority_arbiter( 'type_', {} ), 2 )
+
+def test_field_value_priority():
+  # Without a map the field value is the priority
+  dut  = mk_arbiter( mk_field_priority_arbiter( 'data' ), 3 )
+  msgs = [ TestPkt( wr, 0, 7 ), TestPkt( wr, 0, 9 ), TestPkt( wr, 0, 8 ) ]
+  assert arbitrate( dut, [ 0, 1, 2 ], msgs ) == 1
+  assert arbitrate( dut, [ 0, 2 ], msgs ) == 2
+
+arbiter_types = [
+  None,
+  FixedPriorityArbiter,
+  mk_weighted_round_robin_arbiter( [ 4, 1, 2, 1, 1 ] ),
+  mk_field_priority_arbiter( 'type_', { rd : 1 } ),
+]
+
+@pytest.mark.parametrize( "SwitchUnitType", [ SwitchUnitRTL,
+                                              OneHotSwitchUnitRTL ] )
+@pytest.mark.parametrize( "ArbiterType", arbiter_types )
+def test_router( cmdline_opts, SwitchUnitType, ArbiterType ):
+  th = TestHarness( mk_src_msgs( 5, 8 ), SwitchUnitType, src_delay=1,
+                    ArbiterType=ArbiterType )
+  config_model_with_cmdline_opts( th, cmdline_opts, duts=['dut'] )
+  run_sim( th, cmdline_opts )
+
+#-------------------------------------------------------------------------
+# Latency distribution
+#-------------------------------------------------------------------------
+# Input 0 of an N-to-1 router sends status polls (reads) at random times
+# while the other inputs always have a write response to send, like
+# terminals that return long bursts. The output only takes a packet every
+# other cycle, so the inputs compete for it. The latency of a poll is
+# counted from the cycle it is created to the cycle it leaves the router.
+
+def percentile( lst, p ):
+  lst = sorted( lst )
+  return lst[ min( len( lst ) - 1, len( lst ) * p // 100 ) ]
+
+def run_latency( ArbiterType, num_inports=4, ncycles=4000, poll_prob=0.05,
+                 seed=0xc0ffee ):
+  dut = Router( TestPkt, Bits1, DummyRoutingLogic,
+                num_inports=num_inports, num_outports=1,
+                ArbiterType=ArbiterType )
+  dut.elaborate()
+  dut.apply( DefaultPassGroup() )
+  dut.sim_reset()
+  dut.i_id @= 0
+
+  rng     = random.Random( seed )
+  polls   = [] # creation cycles of pending polls
+  latency = []
+  nbulk   = 0
+  for cycle in range( ncycles ):
+    if rng.random() < poll_prob:
+      polls.append( cycle )
+
+    dut.recv[0].val @= len( polls ) > 0
+    dut.recv[0].msg @= TestPkt( rd, 0, polls[0] if polls else 0 )
+    for i in range( 1, num_inports ):
+      dut.recv[i].val @= 1
+      dut.recv[i].msg @= TestPkt( wr, 0x1000 * i, cycle )
+    dut.send[0].rdy @= cycle % 2
+    dut.sim_eval_combinational()
+
+    if dut.recv[0].val & dut.recv[0].rdy:
+      polls.pop( 0 )
+    if dut.send[0].val & dut.send[0].rdy:
+      if dut.send[0].msg.type_ == rd:
+        latency.append( cycle - int( dut.send[0].msg.data ) )
+      else:
+        nbulk += 1
+    dut.sim_tick()
+
+  return latency, nbulk
+
+def test_poll_latency():
+  results = {}
+  for name, ArbiterType in [
+    ( 'round robin         ', None ),
+    ( 'fixed priority      ', FixedPriorityArbiter ),
+    ( 'weighted round robin', mk_weighted_round_robin_arbiter( [ 3, 1, 1, 1 ] ) ),
+    ( 'field priority      ', mk_field_priority_arbiter( 'type_', { rd : 1 } ) ),
+  ]:
+    latency, nbulk = run_latency( ArbiterType )
+    results[name.strip()] = latency
+    print( f'{name}: {len( latency )} polls, latency '
+           f'p50 {percentile( latency, 50 )} p99 {percentile( latency, 99 )} '
+           f'max {max( latency )} cycles, {nbulk} bulk packets' )
+
+  rr_p99 = percentile( results['round robin'], 99 )
+  assert percentile( results['fixed priority'], 99 ) < rr_p99
+  assert percentile( results['field priority'], 99 ) < rr_p99
@@ -0,0 +1,148 @@
+'''
+==========================================================================
+ReqRespRouterFL_test.py
+==========================================================================
+Test cases for ReqRespRouterFL, and a chip-scale benchmark of the RTL
+and FL models of the config fabric.
+'''
+import time
+
+import pytest
+
+from pymtl3 import *
+from pymtl3.stdlib.test_utils import run_sim
+
+from ...terminal.ConfigTerminal import ConfigTerminal
+from ...terminal.ConfigTerminalFL import ConfigTerminalFL
+from ..AddressMapRoutingLogic import mk_address_map_routing_logic
+from ..ReqRespRouter import ReqRespRouter
+from ..ReqRespRouterFL import ReqRespRouterFL, RouteTable
+from .ReqRespRouter_test import TestHarness, TestPkt, mk_req_resp_msgs, rd, wr
+from .TreeReqRespRouter_test import TestHarness as TreeTestHarness
+from .TreeReqRespRouter_test import mk_wr_rd_msgs
+
+terminal_types = [ ConfigTerminal, ConfigTerminalFL ]
+
+#-------------------------------------------------------------------------
+# Tests
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "TerminalType", terminal_types )
+@pytest.mark.parametrize( "sink_delay", [ 0, 20 ] )
+def test_rd_wr_all( TerminalType, sink_delay ):
+  req_resps = []
+  for i in range( 4 ):
+    req_resps += [ (wr, 0x1000 * i, 0xc0de0000 + i), (wr, 0x1000 * i, 0) ]
+  for i in range( 4 ):
+    req_resps += [ (rd, 0x1000 * i, 0), (rd, 0x1000 * i, 0xc0de0000 + i) ]
+  req_msgs, resp_msgs = mk_req_resp_msgs( req_resps )
+  th = TestHarness( TestPkt, req_msgs, resp_msgs, RouterType=ReqRespRouterFL,
+                    TerminalType=TerminalType )
+  th.set_param( "top.sink.construct", initial_delay=sink_delay )
+  run_sim( th )
+  for i in range( 4 ):
+    assert th.cfg_terminals[i].o_config[0] == 0xc0de0000 + i
+
+def test_resp_delays():
+  # Terminals with slow responses must not hold up the others
+  req_resps = []
+  for j in range( 2 ):
+    for i in range( 4 ):
+      req_resps += [ (wr, 0x1000 * i + j, 0xc0de0000 + i),
+                     (wr, 0x1000 * i + j, 0) ]
+  req_msgs, resp_msgs = mk_req_resp_msgs( req_resps )
+  th = TestHarness( TestPkt, req_msgs, resp_msgs, RouterType=ReqRespRouterFL,
+                    TerminalType=ConfigTerminalFL, resp_delays=[ 8, 0, 3, 1 ] )
+  run_sim( th )
+
+def test_multicast():
+  # Every terminal in a multicast region sends back a response
+  RoutingLogic = mk_address_map_routing_logic([
+    ( 0x0000, 0x1000 ), ( 0x1000, 0x1000 ), ( 0x2000, 0x1000 ),
+    ( 0x3000, 0x1000 ), ( 0x4000, 0x1000, [ 1, 3 ] ),
+  ])
+  req_msgs  = [ TestPkt( wr, 0x4000, 0xcafef00d ),
+                TestPkt( rd, 0x1000, 0 ),
+                TestPkt( rd, 0x3000, 0 ) ]
+  resp_msgs = [ TestPkt( wr, 0x4000, 0 ),
+                TestPkt( wr, 0x4000, 0 ),
+                TestPkt( rd, 0x1000, 0xcafef00d ),
+                TestPkt( rd, 0x3000, 0xcafef00d ) ]
+  th = TestHarness( TestPkt, req_msgs, resp_msgs, RoutingLogic=RoutingLogic,
+                    RouterType=ReqRespRouterFL, TerminalType=ConfigTerminalFL )
+  run_sim( th )
+  assert th.cfg_terminals[0].o_config[0] == 0
+  assert th.cfg_terminals[2].o_config[0] == 0
+
+# Packets to the same address share a table entry, whatever their data
+def test_route_table():
+  RoutingLogic = mk_address_map_routing_logic([
+    ( 0x0000, 0x1000 ), ( 0x1000, 0x1000 ),
+  ])
+  table = RouteTable( RoutingLogic, TestPkt, Bits1, 2, 0 )
+  assert table.lookup( TestPkt( wr, 0x1000, 0xcafef00d ) ) == 0b10
+  assert table.lookup( TestPkt( rd, 0x1000, 0          ) ) == 0b10
+  assert table.lookup( TestPkt( wr, 0x0010, 0xdeadbeef ) ) == 0b01
+  assert len( table.table ) == 2
+
+@pytest.mark.parametrize( "num_terminals, radix", [
+  ( 4, None ), ( 20, None ), ( 20, 4 ), ( 30, 8 ),
+])
+def test_tree( num_terminals, radix ):
+  req_msgs, resp_msgs = mk_wr_rd_msgs( range( num_terminals ) )
+  th = TreeTestHarness( req_msgs, resp_msgs, num_terminals, radix,
+                        RouterType=ReqRespRouterFL,
+                        TerminalType=ConfigTerminalFL )
+  run_sim( th )
+  for i in range( num_terminals ):
+    assert th.cfg_terminals[i].o_config[0] == 0xc0de0000 + i
+
+#-------------------------------------------------------------------------
+# Benchmarks
+#-------------------------------------------------------------------------
+# A chip-scale config fabric: a radix-4 tree of routers with 200
+# terminals. The host sends a request every 20 cycles, so the fabric is
+# idle most of the time, like in an SoC simulation. Run with -m benchmark
+# -s to see the results.
+
+num_chip_terminals = 200
+
+def run_chip( RouterType, TerminalType, req_msgs, resp_msgs ):
+  start = time.perf_counter()
+  th = TreeTestHarness( req_msgs, resp_msgs, num_chip_terminals, radix=4,
+                        RouterType=RouterType, TerminalType=TerminalType )
+  th.set_param( "top.src.construct", interval_delay=20 )
+  th.elaborate()
+  th.apply( DefaultPassGroup() )
+  th.sim_reset()
+  elab_time = time.perf_counter() - start
+
+  ncycles = 0
+  start   = time.perf_counter()
+  while not th.done():
+    th.sim_tick()
+    ncycles += 1
+  sim_time = time.perf_counter() - start
+
+  configs = [ int( t.o_config[0] ) for t in th.cfg_terminals ]
+  return elab_time, ncycles / sim_time, configs
+
+@pytest.mark.benchmark
+def test_sim_speed():
+  terminals = [ ( i * 37 ) % num_chip_terminals for i in range( 4 ) ]
+  req_msgs, resp_msgs = mk_wr_rd_msgs( terminals )
+
+  results = {}
+  for name, RouterType, TerminalType in [
+    ( 'RTL routers, RTL terminals', ReqRespRouter,   ConfigTerminal   ),
+    ( 'FL routers,  FL terminals ', ReqRespRouterFL, ConfigTerminalFL ),
+  ]:
+    elab_time, cycles_per_sec, configs = run_chip( RouterType, TerminalType,
+                                                   req_msgs, resp_msgs )
+    results[RouterType, TerminalType] = ( cycles_per_sec, configs )
+    print( f'{num_chip_terminals} terminals, {name}: elaboration '
+           f'{elab_time:.2f}s, {cycles_per_sec:7.0f} cycles/s' )
+
+  _, rtl_configs = results[ReqRespRouter, ConfigTerminal]
+  _, fl_configs  = results[ReqRespRouterFL, ConfigTerminalFL]
+  assert fl_configs == rtl_configs
@@ -11,6 +11,9 @@ import pytest
 
 from pymtl3 import *
 from pymtl3.stdlib.stream import StreamSinkFL, StreamSourceFL
+from pymtl3.stdlib.stream.ifcs import IStreamIfc, OStreamIfc
+from pymtl3.stdlib.stream.queues import (StreamBypassQueue, StreamNormalQueue,
+                                         StreamPipeQueue)
 from pymtl3.stdlib.test_utils import config_model_with_cmdline_opts, run_sim
 
 from ...ifcs.msg_types import CfgType, mk_cfg_pkt_type
@@ -61,22 +64,48 @@ def test_elaborate( ):
   for _ in range(10): dut.sim_tick()
 
 
+# Delays the responses of a terminal by a chain of pipe queues
+class RespDelay( Component ):
+  def construct( s, PacketType, delay ):
+    s.recv = IStreamIfc( PacketType )
+    s.send = OStreamIfc( PacketType )
+
+    if delay == 0:
+      s.send //= s.recv
+    else:
+      s.queues = [ StreamPipeQueue( PacketType, num_entries=1 )
+                   for _ in range( delay ) ]
+      s.recv //= s.queues[0].istream
+      for i in range( delay - 1 ):
+        s.queues[i].ostream //= s.queues[i+1].istream
+      s.send //= s.queues[-1].ostream
+
 class TestHarness( Component ):
-  def construct( s, PacketType, req_msgs, resp_msgs, num_terminals=4 ):
+  def construct( s, PacketType, req_msgs, resp_msgs, num_terminals=4,
+                 RoutingLogic=TestRoutingLogic, ordered=False,
+                 resp_delays=None, RouterType=ReqRespRouter,
+                 TerminalType=ConfigTerminal, **router_params ):
+    if resp_delays is None:
+      resp_delays = [ 0 ] * num_terminals
+
     s.src  = StreamSourceFL( PacketType, req_msgs )
-    s.sink = StreamSinkFL  ( PacketType, resp_msgs, ordered=False )
-    s.dut  = ReqRespRouter( PacketType, mk_bits( addr_nbits ),
-                            TestRoutingLogic, num_terminals=num_terminals )
+    s.sink = StreamSinkFL  ( PacketType, resp_msgs, ordered=ordered )
+    s.dut  = RouterType( PacketType, mk_bits( addr_nbits ),
+                         RoutingLogic, num_terminals=num_terminals,
+                         **router_params )
     s.cfg_terminals = [
-      ConfigTerminal( PacketType, num_config_regs=1, num_status_regs=0 )
+      TerminalType( PacketType, num_config_regs=1, num_status_regs=0 )
       for _ in range(num_terminals) ]
+    s.resp_delays = [ RespDelay( PacketType, resp_delays[i] )
+                      for i in range(num_terminals) ]
 
     s.src.ostream //= s.dut.minion_req
     s.sink.istream //= s.dut.minion_resp
 
     for i in range( num_terminals ):
       s.cfg_terminals[i].minion_req  //= s.dut.master_req[i]
-      s.cfg_terminals[i].minion_resp //= s.dut.master_resp[i]
+      s.cfg_terminals[i].minion_resp //= s.resp_delays[i].recv
+      s.resp_delays[i].send          //= s.dut.master_resp[i]
 
   def done( s ):
     return s.src.done() and s.sink.done()
@@ -122,3 +151,149 @@ def test_rd_wr_all_debug_unit( cmdline_opts, sink_delay ):
   assert th.cfg_terminals[1].o_config[0] == 0xcafec001
   assert th.cfg_terminals[2].o_config[0] == 0xbadbed00
   assert th.cfg_terminals[3].o_config[0] == 0xc01dbeef
+
+def test_posted_wr_fence( cmdline_opts ):
+  # Only the fences get a response. A fence only covers the terminal it
+  # is routed to, so every terminal gets one. FENCE needs a 3-bit type
+  # field.
+  FencePkt = mk_cfg_pkt_type( type_nbits=3, addr_nbits=addr_nbits,
+                              data_nbits=32 )
+  pwr   = CfgType.POSTED_WRITE
+  fence = CfgType.FENCE
+  data  = [ 0xdeadbeef, 0xcafec001, 0xbadbed00, 0xc01dbeef ]
+  req_msgs  = [ FencePkt( pwr, 0x1000 * i, data[i] ) for i in range( 4 ) ]
+  req_msgs += [ FencePkt( fence, 0x1000 * i, 0 ) for i in range( 4 ) ]
+  resp_msgs = [ FencePkt( fence, 0x1000 * i, 0 ) for i in range( 4 ) ]
+  th = TestHarness( FencePkt, req_msgs, resp_msgs )
+  config_model_with_cmdline_opts( th, cmdline_opts, duts=['dut'] )
+  run_sim( th, cmdline_opts )
+  for i in range( 4 ):
+    assert th.cfg_terminals[i].o_config[0] == data[i]
+
+
+# Queue configurations that should all sustain one packet per cycle:
+# (InputQueueType, input_qsize, OutputQueueType, output_qsize)
+full_bw_configs = [
+  ( StreamPipeQueue,   1, None,              2 ),
+  ( StreamBypassQueue, 1, None,              2 ),
+  ( StreamNormalQueue, 2, None,              2 ),
+  ( StreamPipeQueue,   1, StreamPipeQueue,   1 ),
+  ( StreamPipeQueue,   1, StreamNormalQueue, 2 ),
+  ( StreamNormalQueue, 2, StreamNormalQueue, 2 ),
+]
+
+def run_sim_count_cycles( th, cmdline_opts, max_cycles=1000 ):
+  config_model_with_cmdline_opts( th, cmdline_opts, duts=['dut'] )
+  th.apply( DefaultPassGroup() )
+  th.sim_reset()
+  while not th.done() and th.sim_cycle_count() < max_cycles:
+    th.sim_tick()
+  assert th.done()
+  return th.sim_cycle_count()
+
+@pytest.mark.parametrize(
+  "InputQueueType, input_qsize, OutputQueueType, output_qsize",
+  full_bw_configs )
+def test_throughput( cmdline_opts, InputQueueType, input_qsize,
+                     OutputQueueType, output_qsize ):
+  num_reqs = 64
+  req_resps = []
+  for i in range( num_reqs ):
+    req_resps.append( (wr, 0x1000 * (i % 4), i) )
+    req_resps.append( (wr, 0x1000 * (i % 4), 0) )
+  req_msgs, resp_msgs = mk_req_resp_msgs( req_resps )
+  th = TestHarness( TestPkt, req_msgs, resp_msgs,
+                    InputQueueType=InputQueueType, input_qsize=input_qsize,
+                    OutputQueueType=OutputQueueType,
+                    output_qsize=output_qsize )
+
+  # Latency of a single request/response round trip
+  lat_req_msgs, lat_resp_msgs = mk_req_resp_msgs( req_resps[:2] )
+  lat_th = TestHarness( TestPkt, lat_req_msgs, lat_resp_msgs,
+                        InputQueueType=InputQueueType,
+                        input_qsize=input_qsize,
+                        OutputQueueType=OutputQueueType,
+                        output_qsize=output_qsize )
+  latency = run_sim_count_cycles( lat_th, cmdline_opts )
+
+  # One packet per cycle once the pipeline is filled
+  assert run_sim_count_cycles( th, cmdline_opts ) <= num_reqs + latency
+
+#-------------------------------------------------------------------------
+# In-order responses
+#-------------------------------------------------------------------------
+# Terminal 0 is slow: its responses are delayed by slow_delay cycles.
+# Without in_order, responses from the fast terminals overtake the ones
+# from terminal 0.
+
+slow_delay = 8
+
+def mk_mixed_latency_msgs( num_reqs ):
+  req_resps = []
+  for i in range( num_reqs ):
+    addr = 0x1000 * ( i % 4 )
+    req_resps += [ (wr, addr, i), (wr, addr, 0), (rd, addr, 0), (rd, addr, i) ]
+  return mk_req_resp_msgs( req_resps )
+
+def test_out_of_order_without_in_order( cmdline_opts ):
+  req_msgs, resp_msgs = mk_mixed_latency_msgs( 4 )
+  th = TestHarness( TestPkt, req_msgs, resp_msgs, ordered=True,
+                    resp_delays=[ slow_delay, 0, 0, 0 ] )
+  config_model_with_cmdline_opts( th, cmdline_opts, duts=['dut'] )
+  with pytest.raises( Exception ):
+    run_sim( th, cmdline_opts )
+
+@pytest.mark.parametrize( "max_outstanding", [1, 2, 4, 16] )
+def test_in_order( cmdline_opts, max_outstanding ):
+  req_msgs, resp_msgs = mk_mixed_latency_msgs( 8 )
+  th = TestHarness( TestPkt, req_msgs, resp_msgs, ordered=True,
+                    resp_delays=[ slow_delay, 0, 3, 1 ], in_order=True,
+                    max_outstanding=max_outstanding )
+  config_model_with_cmdline_opts( th, cmdline_opts, duts=['dut'] )
+  run_sim( th, cmdline_opts )
+
+def test_in_order_posted_burst( cmdline_opts ):
+  # Posted writes, burst headers and all but the last beat of a burst get
+  # no response. FENCE needs a 3-bit type field.
+  Pkt   = mk_cfg_pkt_type( type_nbits=3, addr_nbits=addr_nbits,
+                           data_nbits=32 )
+  pwr   = CfgType.POSTED_WRITE
+  bwr   = CfgType.BURST_WRITE
+  fence = CfgType.FENCE
+  req_msgs = [
+    Pkt( pwr,   0x0000, 0xdeadbeef ),
+    Pkt( bwr,   0x1000, 2          ), # burst header
+    Pkt( wr,    0x1000, 0xcafec001 ),
+    Pkt( wr,    0x1000, 0xcafec002 ),
+    Pkt( rd,    0x2000, 0          ),
+    Pkt( fence, 0x0000, 0          ),
+    Pkt( rd,    0x1000, 0          ),
+    Pkt( rd,    0x0000, 0          ),
+  ]
+  resp_msgs = [
+    Pkt( wr,    0x1000, 0          ), # last beat
+    Pkt( rd,    0x2000, 0          ),
+    Pkt( fence, 0x0000, 0          ),
+    Pkt( rd,    0x1000, 0xcafec001 ),
+    Pkt( rd,    0x0000, 0xdeadbeef ),
+  ]
+  th = TestHarness( Pkt, req_msgs, resp_msgs, ordered=True,
+                    resp_delays=[ slow_delay, 0, 0, 0 ], in_order=True )
+  config_model_with_cmdline_opts( th, cmdline_opts, duts=['dut'] )
+  run_sim( th, cmdline_opts )
+
+def test_in_order_throughput( cmdline_opts ):
+  # With max_outstanding=1 the router behaves like a host that waits for
+  # each response before it sends the next request.
+  req_msgs, resp_msgs = mk_mixed_latency_msgs( 32 )
+  ncycles = {}
+  for max_outstanding in [ 1, 4, 16 ]:
+    th = TestHarness( TestPkt, req_msgs, resp_msgs, ordered=True,
+                      resp_delays=[ slow_delay, 0, 0, 0 ], in_order=True,
+                      max_outstanding=max_outstanding )
+    ncycles[max_outstanding] = run_sim_count_cycles( th, cmdline_opts )
+    print( f'max_outstanding={max_outstanding:2}: '
+           f'{ncycles[max_outstanding]} cycles' )
+
+  assert ncycles[4]  < ncycles[1]
+  assert ncycles[16] < ncycles[4]
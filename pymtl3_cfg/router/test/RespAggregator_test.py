@@ -0,0 +1,194 @@
+'''
+==========================================================================
+RespAggregator_test.py
+==========================================================================
+Test cases for multicast requests through a ReqRespRouter with a
+RespAggregator.
+'''
+from pymtl3 import *
+from pymtl3.stdlib.stream import StreamSinkFL, StreamSourceFL
+from pymtl3.stdlib.test_utils import config_model_with_cmdline_opts, run_sim
+
+from ...ifcs import PullOutIfc, PushInIfc
+from ...ifcs.msg_types import CfgType, mk_cfg_pkt_type
+from ...spi.PushPull2ReqRespAdapter import PushPull2ReqRespAdapter
+from ...spi.test.PushPull2ReqRespAdapter_test import CfgPkt, SpiFrameDriver
+from ...terminal.ConfigTerminal import ConfigTerminal
+from ..AddressMapRoutingLogic import mk_address_map_routing_logic
+from ..ReqRespRouter import ReqRespRouter
+
+#-------------------------------------------------------------------------
+# TestHarness
+#-------------------------------------------------------------------------
+# Eight identical lane terminals with four config registers each. Lane i
+# owns 0x10 addresses starting from 0x10 * i. A write to 0x100 + r writes
+# register r of all lanes and a write to 0x200 + r writes register r of
+# the even lanes.
+
+num_lanes = 8
+all_lanes  = list( range( num_lanes ) )
+even_lanes = list( range( 0, num_lanes, 2 ) )
+
+address_map = [ ( 0x10 * i, 0x10 ) for i in all_lanes ] + [
+  ( 0x100, 0x10, all_lanes  ),
+  ( 0x200, 0x10, even_lanes ),
+]
+
+Pkt   = mk_cfg_pkt_type( type_nbits=3, addr_nbits=16, data_nbits=32 )
+wr    = CfgType.WRITE
+rd    = CfgType.READ
+bwr   = CfgType.BURST_WRITE
+pwr   = CfgType.POSTED_WRITE
+fence = CfgType.FENCE
+
+class TestHarness( Component ):
+  def construct( s, req_msgs, resp_msgs, multicast=True ):
+    s.src  = StreamSourceFL( Pkt, req_msgs )
+    s.sink = StreamSinkFL  ( Pkt, resp_msgs, ordered=False )
+    s.dut  = ReqRespRouter( Pkt, Bits1,
+                            mk_address_map_routing_logic( address_map ),
+                            num_terminals=num_lanes, multicast=multicast )
+    s.cfg_terminals = [
+      ConfigTerminal( Pkt, num_config_regs=4, num_status_regs=0 )
+      for _ in range( num_lanes ) ]
+
+    s.src.ostream  //= s.dut.minion_req
+    s.sink.istream //= s.dut.minion_resp
+
+    for i in range( num_lanes ):
+      s.cfg_terminals[i].minion_req  //= s.dut.master_req[i]
+      s.cfg_terminals[i].minion_resp //= s.dut.master_resp[i]
+
+  def done( s ):
+    return s.src.done() and s.sink.done()
+
+  def line_trace( s ):
+    return s.dut.line_trace()
+
+def mk_msgs( req_resps ):
+  req_msgs  = [ Pkt( *req  ) for req  in req_resps[0::2] ]
+  resp_msgs = [ Pkt( *resp ) for resp in req_resps[1::2] ]
+  return req_msgs, resp_msgs
+
+def check_config( th, lanes, reg, value ):
+  for i in lanes:
+    assert th.cfg_terminals[i].o_config[reg] == value
+
+#-------------------------------------------------------------------------
+# Tests
+#-------------------------------------------------------------------------
+
+def test_mcast_write( cmdline_opts ):
+  req_resps = [ (wr, 0x102, 0xca11b000), (wr, 0x102, 0) ]
+  for i in all_lanes:
+    req_resps += [ (rd, 0x10 * i + 2, 0), (rd, 0x10 * i + 2, 0xca11b000) ]
+  th = TestHarness( *mk_msgs( req_resps ) )
+  config_model_with_cmdline_opts( th, cmdline_opts, duts=['dut'] )
+  run_sim( th, cmdline_opts )
+  check_config( th, all_lanes, 2, 0xca11b000 )
+
+def test_mcast_and_unicast( cmdline_opts ):
+  # Unicast requests are in flight while the multicast responses are
+  # collected, and back-to-back multicasts wait for each other.
+  req_resps = [
+    (wr, 0x100, 0x11111111), (wr, 0x100, 0),
+    (wr, 0x011, 0x22222222), (wr, 0x011, 0),
+    (wr, 0x201, 0x33333333), (wr, 0x201, 0),
+    (rd, 0x030, 0         ), (rd, 0x030, 0x11111111),
+    (wr, 0x200, 0x44444444), (wr, 0x200, 0),
+    (rd, 0x101, 0         ), (rd, 0x101, 0x33333333),
+    (rd, 0x071, 0         ), (rd, 0x071, 0         ),
+  ]
+  th = TestHarness( *mk_msgs( req_resps ) )
+  config_model_with_cmdline_opts( th, cmdline_opts, duts=['dut'] )
+  run_sim( th, cmdline_opts )
+  check_config( th, even_lanes, 0, 0x44444444 )
+  check_config( th, [ 1, 3, 5, 7 ], 0, 0x11111111 )
+  check_config( th, even_lanes, 1, 0x33333333 )
+  assert th.cfg_terminals[1].o_config[1] == 0x22222222
+
+def test_mcast_burst_posted_fence( cmdline_opts ):
+  # A multicast burst gets one response after its last beat, a posted
+  # multicast write gets none and a multicast fence gets one.
+  data = [ 0xa0, 0xa1, 0xa2, 0xa3 ]
+  req_resps = [ (bwr, 0x100, 4), (bwr, 0x100, 0) ]
+  req_msgs, resp_msgs = mk_msgs( req_resps )
+  req_msgs  += [ Pkt( bwr, 0x100, d ) for d in data ]
+  req_msgs  += [ Pkt( pwr, 0x203, 0xb3 ), Pkt( fence, 0x200, 0 ) ]
+  resp_msgs += [ Pkt( fence, 0x200, 0 ) ]
+  th = TestHarness( req_msgs, resp_msgs )
+  config_model_with_cmdline_opts( th, cmdline_opts, duts=['dut'] )
+  run_sim( th, cmdline_opts )
+  for reg in range( 3 ):
+    check_config( th, all_lanes, reg, data[reg] )
+  check_config( th, even_lanes, 3, 0xb3 )
+  check_config( th, [ 1, 3, 5, 7 ], 3, data[3] )
+
+def test_no_aggregation( cmdline_opts ):
+  # Without the aggregator every lane sends back its own response
+  req_resps = [ (wr, 0x102, 0xca11b000), (wr, 0x102, 0) ]
+  req_msgs, resp_msgs = mk_msgs( req_resps )
+  th = TestHarness( req_msgs, resp_msgs * num_lanes, multicast=False )
+  config_model_with_cmdline_opts( th, cmdline_opts, duts=['dut'] )
+  run_sim( th, cmdline_opts )
+  check_config( th, all_lanes, 2, 0xca11b000 )
+
+#-------------------------------------------------------------------------
+# SPI transactions
+#-------------------------------------------------------------------------
+# The lanes behind a PushPull2ReqRespAdapter, driven with SPI frames as in
+# PushPull2ReqRespAdapter_test. Each frame pulls a response and pushes a
+# request.
+
+class SpiTestHarness( Component ):
+  def construct( s ):
+    s.adapter = PushPull2ReqRespAdapter( CfgPkt )
+    s.router  = ReqRespRouter( CfgPkt, Bits1,
+                               mk_address_map_routing_logic( address_map ),
+                               num_terminals=num_lanes, multicast=True )
+    s.cfg_terminals = [
+      ConfigTerminal( CfgPkt, num_config_regs=4, num_status_regs=0 )
+      for _ in range( num_lanes ) ]
+
+    s.push = PushInIfc ( s.adapter.PushPullPkt )
+    s.pull = PullOutIfc( s.adapter.PushPullPkt )
+
+    s.push //= s.adapter.push
+    s.pull //= s.adapter.pull
+    s.adapter.req  //= s.router.minion_req
+    s.adapter.resp //= s.router.minion_resp
+    for i in range( num_lanes ):
+      s.router.master_req[i]  //= s.cfg_terminals[i].minion_req
+      s.router.master_resp[i] //= s.cfg_terminals[i].minion_resp
+
+def broadcast( use_multicast ):
+  th = SpiTestHarness()
+  th.elaborate()
+  th.apply( DefaultPassGroup() )
+  th.sim_reset()
+
+  drv = SpiFrameDriver( th )
+  if use_multicast:
+    drv.write( 0x102, 0xca11b000 )
+  else:
+    for i in all_lanes:
+      drv.write( 0x10 * i + 2, 0xca11b000 )
+  drv.drain( 1 if use_multicast else num_lanes )
+  check_config( th, all_lanes, 2, 0xca11b000 )
+  return drv
+
+def test_broadcast_spi_frames():
+  mcast   = broadcast( use_multicast=True )
+  unicast = broadcast( use_multicast=False )
+  print( f'{num_lanes} lanes: multicast {mcast.nframes} SPI frames, '
+         f'unicast {unicast.nframes} SPI frames' )
+  assert mcast.resps == [ CfgPkt( wr, 0x102, 0 ) ]
+  assert len( unicast.resps ) == num_lanes
+  # One frame pushes the write, the others wait for its response
+  assert unicast.nframes > num_lanes
+  assert mcast.nframes < unicast.nframes
+
+  # No response is left behind
+  for _ in range( 4 ):
+    mcast.frame( 0 )
+  assert len( mcast.resps ) == 1
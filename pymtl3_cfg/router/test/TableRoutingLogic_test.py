@@ -0,0 +1,62 @@
+'''
+==========================================================================
+TableRoutingLogic_test.py
+==========================================================================
+Test cases for TableRoutingLogic.
+'''
+import pytest
+
+from pymtl3 import *
+
+from ..TableRoutingLogic import mk_table_routing_logic
+from .ReqRespRouter_test import TestPkt, addr_nbits, rd
+
+#-------------------------------------------------------------------------
+# Helper functions
+#-------------------------------------------------------------------------
+
+def mk_routing_logic( table, page_nbits, num_outports, default_outport=None ):
+  RoutingLogic = mk_table_routing_logic( table, page_nbits, default_outport )
+  dut = RoutingLogic( TestPkt, mk_bits( addr_nbits ), num_outports )
+  dut.elaborate()
+  dut.apply( DefaultPassGroup() )
+  dut.sim_reset()
+  return dut
+
+def route( dut, addr ):
+  dut.i_pkt @= TestPkt( rd, addr, 0 )
+  dut.sim_eval_combinational()
+  return int( dut.o_val )
+
+#-------------------------------------------------------------------------
+# Tests
+#-------------------------------------------------------------------------
+
+def test_pages():
+  dut = mk_routing_logic( [ 0b001, 0b010, 0b000, 0b100, 0b101 ], 12, 3 )
+  assert route( dut, 0x0000 ) == 0b001
+  assert route( dut, 0x0fff ) == 0b001
+  assert route( dut, 0x1000 ) == 0b010
+  assert route( dut, 0x2abc ) == 0b000
+  assert route( dut, 0x3000 ) == 0b100
+  assert route( dut, 0x4fff ) == 0b101
+  # Past the end of the table
+  assert route( dut, 0x5000 ) == 0b000
+  assert route( dut, 0x8000 ) == 0b000
+  assert route( dut, 0xffff ) == 0b000
+
+@pytest.mark.parametrize( "page_nbits", [ 0, 4, 15 ] )
+def test_default_outport( page_nbits ):
+  dut = mk_routing_logic( [ 0b01 ], page_nbits, 2, default_outport=1 )
+  page = 1 << page_nbits
+  assert route( dut, 0 ) == 0b01
+  assert route( dut, page - 1 ) == 0b01
+  assert route( dut, page ) == 0b10
+  assert route( dut, 0xffff ) == 0b10
+
+def test_full_address_space():
+  # The index covers all address bits
+  table = [ 1 << ( i % 4 ) for i in range( 16 ) ]
+  dut = mk_routing_logic( table, 12, 4 )
+  for i in range( 16 ):
+    assert route( dut, 0x1000 * i + 0x123 ) == table[i]
@@ -0,0 +1,157 @@
+'''
+==========================================================================
+TreeReqRespRouter_test.py
+==========================================================================
+Test cases for TreeReqRespRouter.
+'''
+import time
+
+import pytest
+
+from pymtl3 import *
+from pymtl3.stdlib.stream import StreamSinkFL, StreamSourceFL
+from pymtl3.stdlib.test_utils import config_model_with_cmdline_opts, run_sim
+
+from ...terminal.ConfigTerminal import ConfigTerminal
+from ..AddressMapRoutingLogic import mk_address_map_routing_logic
+from ..ReqRespRouter import ReqRespRouter
+from ..AddressMapRoutingLogic import _normalize_address_map
+from ..TreeReqRespRouter import TreeReqRespRouter, _subtree_address_map
+from .ReqRespRouter_test import TestPkt, mk_req_resp_msgs, rd, wr
+
+#-------------------------------------------------------------------------
+# TestHarness
+#-------------------------------------------------------------------------
+# Terminal i owns 0x10 addresses starting from 0x10 * i
+
+def mk_address_map( num_terminals ):
+  return [ ( 0x10 * i, 0x10 ) for i in range( num_terminals ) ]
+
+class TestHarness( Component ):
+  def construct( s, req_msgs, resp_msgs, num_terminals, radix=None,
+                 RouterType=ReqRespRouter, TerminalType=ConfigTerminal ):
+    address_map = mk_address_map( num_terminals )
+
+    s.src  = StreamSourceFL( TestPkt, req_msgs )
+    s.sink = StreamSinkFL  ( TestPkt, resp_msgs, ordered=False )
+    if radix is None:
+      s.dut = RouterType( TestPkt, Bits1,
+                          mk_address_map_routing_logic( address_map ),
+                          num_terminals=num_terminals )
+    else:
+      s.dut = TreeReqRespRouter( TestPkt, Bits4, address_map, radix=radix,
+                                 RouterType=RouterType )
+    s.cfg_terminals = [
+      TerminalType( TestPkt, num_config_regs=1, num_status_regs=0 )
+      for _ in range( num_terminals ) ]
+
+    s.src.ostream  //= s.dut.minion_req
+    s.sink.istream //= s.dut.minion_resp
+
+    for i in range( num_terminals ):
+      s.cfg_terminals[i].minion_req  //= s.dut.master_req[i]
+      s.cfg_terminals[i].minion_resp //= s.dut.master_resp[i]
+
+  def done( s ):
+    return s.src.done() and s.sink.done()
+
+  def line_trace( s ):
+    return s.dut.line_trace()
+
+def mk_wr_rd_msgs( terminals ):
+  req_resps = []
+  for i in terminals:
+    req_resps += [ (wr, 0x10 * i, 0xc0de0000 + i), (wr, 0x10 * i, 0) ]
+  for i in terminals:
+    req_resps += [ (rd, 0x10 * i, 0), (rd, 0x10 * i, 0xc0de0000 + i) ]
+  return mk_req_resp_msgs( req_resps )
+
+#-------------------------------------------------------------------------
+# Tests
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "num_terminals, radix", [
+  ( 4, 4 ), ( 16, 4 ), ( 20, 4 ), ( 9, 2 ), ( 30, 8 ),
+])
+def test_rd_wr_all( cmdline_opts, num_terminals, radix ):
+  req_msgs, resp_msgs = mk_wr_rd_msgs( range( num_terminals ) )
+  th = TestHarness( req_msgs, resp_msgs, num_terminals, radix )
+  config_model_with_cmdline_opts( th, cmdline_opts, duts=['dut'] )
+  run_sim( th, cmdline_opts )
+  for i in range( num_terminals ):
+    assert th.cfg_terminals[i].o_config[0] == 0xc0de0000 + i
+
+def test_unmapped_addr( cmdline_opts ):
+  req_msgs = [ TestPkt( wr, 0x0130, 0xdeadbeef ),
+               TestPkt( wr, 0x2000, 0xcafef00d ), # dropped
+               TestPkt( rd, 0x0130, 0          ) ]
+  resp_msgs = [ TestPkt( wr, 0x0130, 0          ),
+                TestPkt( rd, 0x0130, 0xdeadbeef ) ]
+  th = TestHarness( req_msgs, resp_msgs, 20, radix=4 )
+  config_model_with_cmdline_opts( th, cmdline_opts, duts=['dut'] )
+  run_sim( th, cmdline_opts )
+
+# Every router only decodes the address spans of its children. The
+# terminals of a child subtree own adjacent regions here, so a router
+# decodes one span per child.
+def test_subtree_decode():
+  th = TestHarness( [], [], 30, radix=4 )
+  th.elaborate()
+  for router in th.dut.routers:
+    logic = router.req_router.route_units[0].routing_logic
+    assert logic.num_regions == router.num_terminals
+
+# Adjacent regions of one child are merged across holes in the map, while
+# a region of another child in between splits the span
+def test_subtree_address_map():
+  regions = _normalize_address_map(
+    [ ( 0x000, 0x10 ), ( 0x100, 0x10 ), ( 0x400, 0x10 ), ( 0x200, 0x10 ) ] )
+  assert _subtree_address_map( regions, 2, 2, 0, 0 ) == [
+    ( 0x000, 0x110, 0 ), ( 0x200, 0x210, 1 ) ]
+  assert _subtree_address_map( regions, 2, 2, 1, 1 ) == [
+    ( 0x200, 0x10, 1 ), ( 0x400, 0x10, 0 ) ]
+
+  regions = _normalize_address_map(
+    [ ( 0x000, 0x10 ), ( 0x100, 0x10 ), ( 0x400, 0x10 ), ( 0x080, 0x10 ) ] )
+  assert _subtree_address_map( regions, 2, 2, 0, 0 ) == [
+    ( 0x000, 0x10, 0 ), ( 0x080, 0x10, 1 ), ( 0x100, 0x10, 0 ),
+    ( 0x400, 0x10, 1 ) ]
+
+#-------------------------------------------------------------------------
+# Benchmarks
+#-------------------------------------------------------------------------
+# Compares a flat ReqRespRouter with radix-4 and radix-8 trees on
+# elaboration time, simulation speed and the latency of one request. The
+# tree adds a router hop per level to the latency in exchange for
+# arbiters and muxes that are at most radix ports wide.
+# Run with -m benchmark -s to see the results.
+
+def run_benchmark( req_msgs, resp_msgs, num_terminals, radix ):
+  start = time.perf_counter()
+  th = TestHarness( req_msgs, resp_msgs, num_terminals, radix )
+  th.elaborate()
+  th.apply( DefaultPassGroup() )
+  th.sim_reset()
+  elab_time = time.perf_counter() - start
+
+  start = time.perf_counter()
+  while not th.done():
+    th.sim_tick()
+  sim_time = time.perf_counter() - start
+  return elab_time, th.sim_cycle_count() / sim_time, th.sim_cycle_count()
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize( "num_terminals", [ 64 ] )
+def test_sim_speed( num_terminals ):
+  terminals = [ ( i * 37 ) % num_terminals for i in range( 16 ) ]
+  req_msgs,     resp_msgs     = mk_wr_rd_msgs( terminals )
+  lat_req_msgs, lat_resp_msgs = mk_wr_rd_msgs( [ num_terminals - 1 ] )
+
+  for name, radix in [ ( 'flat   ', None ), ( 'radix 4', 4 ),
+                       ( 'radix 8', 8 ) ]:
+    elab_time, cycles_per_sec, _ = run_benchmark( req_msgs, resp_msgs,
+                                                  num_terminals, radix )
+    _, _, ncycles = run_benchmark( lat_req_msgs[:1], lat_resp_msgs[:1],
+                                   num_terminals, radix )
+    print( f'{num_terminals} terminals, {name}: elaboration {elab_time:.2f}s, '
+           f'{cycles_per_sec:7.0f} cycles/s, {ncycles} cycles for one request' )
@@ -0,0 +1,155 @@
+'''
+==========================================================================
+AsyncFifo.py
+==========================================================================
+Asynchronous FIFO split into a write half and a read half that live in
+different clock domains.
+
+The write half holds the storage and the write pointer, the read half
+holds the read pointer. The pointers cross the clock domain boundary as
+gray codes and are synchronized with two flops on the receiving side.
+The storage is read directly by the read half; an entry is only read
+after its write pointer update has been synchronized, so the data is
+stable by then. Both halves must be built with the same type and number
+of entries, and the number of entries must be a power of two.
+
+Cross-domain connections:
+
+  write half     read half
+  o_entries  ->  i_entries
+  o_wptr     ->  i_wptr
+  i_rptr     <-  o_rptr
+'''
+from pymtl3 import *
+from pymtl3.stdlib.stream.ifcs import IStreamIfc, OStreamIfc
+
+#-------------------------------------------------------------------------
+# Helper functions
+#-------------------------------------------------------------------------
+
+def _check_num_entries( num_entries ):
+  assert num_entries >= 2 and num_entries & ( num_entries - 1 ) == 0
+
+#-------------------------------------------------------------------------
+# AsyncFifoWriteHalf
+#-------------------------------------------------------------------------
+
+class AsyncFifoWriteHalf( Component ):
+  def construct( s, Type, num_entries=2 ):
+    # Local parameters
+    _check_num_entries( num_entries )
+    s.num_entries = num_entries
+    s.addr_nbits  = clog2( num_entries )
+    s.PtrType     = mk_bits( s.addr_nbits + 1 )
+    # XOR mask that turns a gray pointer into the pointer one lap ahead
+    s.full_mask   = 0b11 << ( s.addr_nbits - 1 )
+
+    # Interface
+    s.istream   = IStreamIfc( Type )
+    s.empty     = OutPort()
+
+    s.o_entries = [ OutPort( Type ) for _ in range( num_entries ) ]
+    s.o_wptr    = OutPort( s.PtrType )
+    s.i_rptr    = InPort ( s.PtrType )
+
+    # Registers
+    s.entries    = [ Wire( Type ) for _ in range( num_entries ) ]
+    s.wptr_bin   = Wire( s.PtrType )
+    s.wptr_gray  = Wire( s.PtrType )
+    s.rptr_sync0 = Wire( s.PtrType )
+    s.rptr_sync1 = Wire( s.PtrType )
+
+    # Wires
+    s.enq_xfer      = Wire()
+    s.wptr_bin_next = Wire( s.PtrType )
+
+    # Connections and assignments
+    for i in range( num_entries ):
+      s.o_entries[i] //= s.entries[i]
+    s.o_wptr //= s.wptr_gray
+
+    s.istream.rdy   //= lambda: s.wptr_gray != ( s.rptr_sync1 ^ s.full_mask )
+    s.empty         //= lambda: s.wptr_gray == s.rptr_sync1
+    s.enq_xfer      //= lambda: s.istream.val & s.istream.rdy
+    s.wptr_bin_next //= lambda: s.wptr_bin + 1
+
+    # Logic
+    @update_ff
+    def up_wptr():
+      if s.reset:
+        s.wptr_bin   <<= 0
+        s.wptr_gray  <<= 0
+        s.rptr_sync0 <<= 0
+        s.rptr_sync1 <<= 0
+      else:
+        s.rptr_sync0 <<= s.i_rptr
+        s.rptr_sync1 <<= s.rptr_sync0
+        if s.enq_xfer:
+          s.wptr_bin  <<= s.wptr_bin_next
+          s.wptr_gray <<= s.wptr_bin_next ^ ( s.wptr_bin_next >> 1 )
+
+    @update_ff
+    def up_entries():
+      if s.enq_xfer:
+        s.entries[ s.wptr_bin[0:s.addr_nbits] ] <<= s.istream.msg
+
+  def line_trace( s ):
+    return f'{s.istream}({s.wptr_gray}|{s.rptr_sync1})'
+
+#-------------------------------------------------------------------------
+# AsyncFifoReadHalf
+#-------------------------------------------------------------------------
+
+class AsyncFifoReadHalf( Component ):
+  def construct( s, Type, num_entries=2 ):
+    # Local parameters
+    _check_num_entries( num_entries )
+    s.num_entries = num_entries
+    s.addr_nbits  = clog2( num_entries )
+    s.PtrType     = mk_bits( s.addr_nbits + 1 )
+
+    # Interface
+    s.ostream   = OStreamIfc( Type )
+
+    s.i_entries = [ InPort( Type ) for _ in range( num_entries ) ]
+    s.i_wptr    = InPort ( s.PtrType )
+    s.o_rptr    = OutPort( s.PtrType )
+
+    # Registers
+    s.rptr_bin   = Wire( s.PtrType )
+    s.rptr_gray  = Wire( s.PtrType )
+    s.wptr_sync0 = Wire( s.PtrType )
+    s.wptr_sync1 = Wire( s.PtrType )
+
+    # Wires
+    s.deq_xfer      = Wire()
+    s.rptr_bin_next = Wire( s.PtrType )
+
+    # Connections and assignments
+    s.o_rptr //= s.rptr_gray
+
+    s.ostream.val   //= lambda: s.rptr_gray != s.wptr_sync1
+    s.deq_xfer      //= lambda: s.ostream.val & s.ostream.rdy
+    s.rptr_bin_next //= lambda: s.rptr_bin + 1
+
+    @update
+    def up_deq_msg():
+      s.ostream.msg @= s.i_entries[ s.rptr_bin[0:s.addr_nbits] ]
+
+    # Logic
+    @update_ff
+    def up_rptr():
+      if s.reset:
+        s.rptr_bin   <<= 0
+        s.rptr_gray  <<= 0
+        s.wptr_sync0 <<= 0
+        s.wptr_sync1 <<= 0
+      else:
+        s.wptr_sync0 <<= s.i_wptr
+        s.wptr_sync1 <<= s.wptr_sync0
+        if s.deq_xfer:
+          s.rptr_bin  <<= s.rptr_bin_next
+          s.rptr_gray <<= s.rptr_bin_next ^ ( s.rptr_bin_next >> 1 )
+
+  def line_trace( s ):
+    return f'({s.rptr_gray}|{s.wptr_sync1}){s.ostream}'
@@ -0,0 +1,110 @@
+'''
+==========================================================================
+IdleFastForward.py
+==========================================================================
+Skips idle cycles in simulations of the SPI stack.
+
+Between SPI transactions cs is high and nothing changes, yet every
+synchronizer, shift register and queue is still evaluated on every
+cycle. IdleFastForward advances a simulation by a number of cycles and
+skips them once the design has reached a fixed point:
+
+  ff = IdleFastForward( th, lambda: th.minion.is_idle() and
+                                    th.adapter.is_idle() )
+  ff.tick( 10000 ) # returns the number of skipped cycles
+
+is_idle is a cheap check that the SPI side is quiet (see
+SpiMinion.is_idle and PushPull2ReqRespAdapter.is_idle). While it holds,
+IdleFastForward compares the value of every register of the design
+before and after each tick. Once a tick leaves all registers unchanged,
+the next ticks would not change them either, since the inputs of the
+design do not change, and the rest of the cycles are skipped. A request
+that is still travelling through a router or a terminal changes some
+registers, so it is never skipped even though the SPI side is idle.
+
+The inputs of the design must stay the same during a call to tick.
+Skipped cycles are added to sim_cycle_count and counted in
+skipped_cycles. State that is not kept in signals, e.g., the Python
+queues of the FL models, is not compared, so such components must only
+change their state when a port changes.
+
+pymtl3 has no public API to list the registers of a simulated design or
+to advance its cycle count, so IdleFastForward relies on internals of
+the simulation passes, which are kept in the helpers below.
+'''
+from pymtl3 import *
+
+#-------------------------------------------------------------------------
+# pymtl3 internals
+#-------------------------------------------------------------------------
+# Checked against PrepareSimPass of pymtl3 3.1.17:
+#
+#  - top._sim.signal_object_mapping maps every signal to a tuple whose
+#    last element is the object that holds its value,
+#  - signal._dsl.needs_double_buffer is set for the signals written by
+#    update_ff blocks,
+#  - top._sim.simulated_cycles is the counter behind sim_cycle_count.
+#
+# _check_internals fails when an IdleFastForward is created if any of
+# them is gone, rather than letting a pymtl3 upgrade skip cycles wrongly.
+
+def _check_internals( top ):
+  sim = getattr( top, '_sim', None )
+  if ( sim is None or not hasattr( sim, 'signal_object_mapping' ) or
+       not hasattr( sim, 'simulated_cycles' ) ):
+    raise RuntimeError( 'IdleFastForward needs the simulation internals of '
+                        'pymtl3 3.1.17, apply DefaultPassGroup first or '
+                        'check the pymtl3 version' )
+  for signal in sim.signal_object_mapping:
+    if not hasattr( signal._dsl, 'needs_double_buffer' ):
+      raise RuntimeError( 'IdleFastForward cannot tell the registers of '
+                          'the design apart in this pymtl3 version' )
+
+# Values of all signals written by update_ff blocks
+def _register_values( top ):
+  _check_internals( top )
+  mapping = top._sim.signal_object_mapping
+  return [ entry[-1] for signal, entry in mapping.items()
+           if signal._dsl.needs_double_buffer ]
+
+def _advance_cycle_count( top, ncycles ):
+  top._sim.simulated_cycles += ncycles
+
+#-------------------------------------------------------------------------
+# IdleFastForward
+#-------------------------------------------------------------------------
+
+class IdleFastForward:
+  def __init__( s, top, is_idle ):
+    s.top            = top
+    s.is_idle        = is_idle
+    s.skipped_cycles = 0
+
+    s.regs           = _register_values( top )
+
+  def snapshot( s ):
+    return [ int( v ) if isinstance( v, Bits ) else int( v.to_bits() )
+             for v in s.regs ]
+
+  # Advances the simulation by ncycles cycles and returns the number of
+  # cycles that were skipped
+  def tick( s, ncycles ):
+    before = None
+    for i in range( ncycles ):
+      if not s.is_idle():
+        before = None
+        s.top.sim_tick()
+        continue
+
+      if before is None:
+        before = s.snapshot()
+      s.top.sim_tick()
+      after = s.snapshot()
+      if after == before:
+        skipped = ncycles - i - 1
+        _advance_cycle_count( s.top, skipped )
+        s.skipped_cycles += skipped
+        return skipped
+      before = after
+
+    return 0
@@ -5,6 +5,25 @@ PushPull2CfgRespAdapter.py
 Adapter that converts push/pull interface to latency-insensitive req/resp
 interface.
 
+Burst writes: after a push whose payload is a BURST_WRITE header with a
+non-zero length, the following pushes are short burst frames that only
+carry valid, stall and one data word (see mk_burst_frame_bitstruct). Since
+the SPI minion shifts the frame into the LSBs of its shift register, a
+short frame ends up in the low bits of push.msg and the remaining bits
+are ignored. Each beat is sent out as a BURST_WRITE packet with the base
+address of the header, so the routers deliver all beats to the same
+terminal. No response is pulled during the burst frames, which keeps a
+truncated pull frame from dropping a response.
+
+Credits: with credits=True the PushPullPkt has two more fields that are
+filled in on every pull. credits is the number of free entries in the
+request queue, not counting a request pushed in the same cycle, and
+pending is the number of responses left in the response queue after the
+pull. The request queue only drains between two pulls, so a host may
+push a request in every frame whose pull reported a non-zero credit
+count and keep many requests in flight instead of polling. The fields
+are ignored on pushes. num_entries sets the depth of both queues.
+
 Author : Yanghui Ou
   Date : May 24, 2022
 '''
@@ -13,27 +32,52 @@ from pymtl3.stdlib.stream.queues import StreamNormalQueue as NormalQueueRTL
 from pymtl3.stdlib.stream.ifcs import IStreamIfc, OStreamIfc
 
 from ..ifcs import PushInIfc, PullOutIfc
+from ..ifcs.msg_types import CfgType
 
 #-------------------------------------------------------------------------
 # Helper functions
 #-------------------------------------------------------------------------
 
-def mk_push_pull_bitstruct( Cfg ):
-  return mk_bitstruct( f'PushPullPkt_{Cfg.__name__}', {
+def mk_push_pull_bitstruct( Cfg, cnt_nbits=0 ):
+  if cnt_nbits == 0:
+    return mk_bitstruct( f'PushPullPkt_{Cfg.__name__}', {
+      'valid'   : Bits1,
+      'stall'   : Bits1,
+      'payload' : Cfg,
+    })
+  return mk_bitstruct( f'PushPullPkt_{cnt_nbits}_{Cfg.__name__}', {
     'valid'   : Bits1,
     'stall'   : Bits1,
+    'credits' : mk_bits( cnt_nbits ),
+    'pending' : mk_bits( cnt_nbits ),
     'payload' : Cfg,
   })
 
+# Width of the credits and pending fields for a queue depth
+def credit_nbits( num_entries ):
+  return clog2( num_entries + 1 )
+
+def mk_burst_frame_bitstruct( Cfg ):
+  return mk_bitstruct( f'BurstFrame_{Cfg.__name__}', {
+    'valid' : Bits1,
+    'stall' : Bits1,
+    'data'  : Cfg.get_field_type( 'data' ),
+  })
+
 #-------------------------------------------------------------------------
 # PushPull2CfgRespAdapter
 #-------------------------------------------------------------------------
 
 class PushPull2ReqRespAdapter( Component ):
-  def construct( s, Cfg, num_entries=2 ):
+  def construct( s, Cfg, num_entries=2, credits=False ):
     # Local earameters
-    s.PushPullPkt = mk_push_pull_bitstruct( Cfg )
+    s.cnt_nbits   = credit_nbits( num_entries ) if credits else 0
+    s.PushPullPkt = mk_push_pull_bitstruct( Cfg, s.cnt_nbits )
+    s.BurstFrame  = mk_burst_frame_bitstruct( Cfg )
     s.num_entries = num_entries
+    s.credits     = credits
+    s.DType       = Cfg.get_field_type( 'data' )
+    s.AddrType    = Cfg.get_field_type( 'addr' )
 
     # Interface
     s.push = PushInIfc ( s.PushPullPkt )
@@ -51,10 +95,18 @@ class PushPull2ReqRespAdapter( Component ):
     # Wires
     s.req_send_xfer  = Wire()
     s.resp_send_xfer = Wire()
+    s.req_recv_xfer  = Wire()
+    s.in_burst       = Wire()
+    s.push_valid     = Wire()
+    s.push_stall     = Wire()
+    s.push_msg_bits  = Wire( s.PushPullPkt.nbits )
+    s.burst_frame    = Wire( s.BurstFrame )
 
     # Registers
     s.resp_stall_r  = Wire()
     s.send_msg_bits = Wire( mk_bits(Cfg.nbits) )
+    s.burst_cnt_r   = Wire( s.DType )
+    s.burst_addr_r  = Wire( s.AddrType )
 
     # Connections
     s.req  //= s.req_q.ostream
@@ -63,11 +115,16 @@ class PushPull2ReqRespAdapter( Component ):
     s.req_send_xfer  //= lambda: s.req_q.ostream.val  & s.req_q.ostream.rdy
     s.resp_send_xfer //= lambda: s.resp_q.ostream.val & s.resp_q.ostream.rdy
 
-    s.req_q.istream.val  //= lambda: s.push.en & s.push.msg.valid
-    s.req_q.istream.msg  //= lambda: s.push.msg.payload
+    s.req_recv_xfer  //= lambda: s.req_q.istream.val  & s.req_q.istream.rdy
 
-    s.resp_q.ostream.rdy //= lambda: (s.pull.en & ~s.resp_stall_r & 
-                                      ~(s.push.en & s.push.msg.stall))
+    s.in_burst   //= lambda: s.burst_cnt_r != 0
+    s.push_valid //= lambda: s.burst_frame.valid if s.in_burst else s.push.msg.valid
+    s.push_stall //= lambda: s.burst_frame.stall if s.in_burst else s.push.msg.stall
+
+    s.req_q.istream.val  //= lambda: s.push.en & s.push_valid
+
+    s.resp_q.ostream.rdy //= lambda: (s.pull.en & ~s.resp_stall_r & ~s.in_burst &
+                                      ~(s.push.en & s.push_stall))
 
     s.pull.msg.payload  //= s.resp_q.ostream.msg
     s.pull.msg.valid    //= s.resp_send_xfer
@@ -76,6 +133,12 @@ class PushPull2ReqRespAdapter( Component ):
                               (s.req_q.count == s.num_entries-1) & 
                               ~s.req_send_xfer))
 
+    if s.credits:
+      s.pull.msg.credits //= lambda: ( s.num_entries - s.req_q.count -
+                                       zext( s.req_recv_xfer, s.cnt_nbits ) )
+      s.pull.msg.pending //= lambda: ( s.resp_q.count -
+                                       zext( s.resp_send_xfer, s.cnt_nbits ) )
+
     s.parity //= lambda: reduce_xor( s.send_msg_bits )
 
     # Logic
@@ -84,14 +147,44 @@ class PushPull2ReqRespAdapter( Component ):
       if s.reset:
         s.resp_stall_r <<= b1(0)
       elif ~s.resp_stall_r:
-        s.resp_stall_r <<= s.push.en & s.push.msg.stall
+        s.resp_stall_r <<= s.push.en & s.push_stall
       else:
         s.resp_stall_r <<= ~s.pull.en
 
+    @update
+    def up_burst_frame():
+      s.push_msg_bits @= s.push.msg
+      s.burst_frame   @= s.push_msg_bits[0:s.BurstFrame.nbits]
+
+    @update
+    def up_req_msg():
+      s.req_q.istream.msg @= s.push.msg.payload
+      if s.in_burst:
+        s.req_q.istream.msg.type_ @= CfgType.BURST_WRITE
+        s.req_q.istream.msg.addr  @= s.burst_addr_r
+        s.req_q.istream.msg.data  @= s.burst_frame.data
+
+    @update_ff
+    def up_burst():
+      if s.reset:
+        s.burst_cnt_r  <<= 0
+        s.burst_addr_r <<= 0
+      elif s.req_recv_xfer & s.in_burst:
+        s.burst_cnt_r  <<= s.burst_cnt_r - 1
+      elif s.req_recv_xfer & ( s.push.msg.payload.type_ == CfgType.BURST_WRITE ):
+        s.burst_cnt_r  <<= s.push.msg.payload.data
+        s.burst_addr_r <<= s.push.msg.payload.addr
+
     @update
     def up_send_msg_bits():
       s.send_msg_bits @= s.req.msg
 
+  # For simulation only: no request is queued and no burst is in
+  # progress (see IdleFastForward). A response may still wait in the
+  # response queue, since it only leaves on a pull.
+  def is_idle( s ):
+    return bool( ( s.req_q.count == 0 ) & ~s.in_burst )
+
   # Line trace
   def line_trace( s ):
     return f'{s.push}|{s.pull}({s.req_q.istream}|{s.resp_q.ostream}|{s.parity}<{s.resp_stall_r}>){s.req}|{s.resp}'
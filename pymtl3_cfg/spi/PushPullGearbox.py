@@ -0,0 +1,121 @@
+'''
+==========================================================================
+PushPullGearbox.py
+==========================================================================
+Width-adapting gearbox between an SPI minion with a narrow word and
+PushPull2ReqRespAdapter.
+
+Without the gearbox the SPI minion has to be as wide as the whole
+PushPullPkt (valid + stall + Cfg). With the gearbox a PushPullPkt is
+transferred as nwords words of word_nbits bits each, most significant
+word first. The packet is zero-extended to nwords * word_nbits bits, so
+the padding bits are at the top of the first word.
+
+The deserializer collects pushed words and pushes the packet to the
+adapter together with the last word. The serializer pulls a packet from
+the adapter when the first word of a frame is pulled and sends the
+remaining words from a register. The push and pull sides count words
+independently, so both directions must always move whole packets. This
+includes burst frames, which are sent as full packets with the burst
+frame in the LSBs. cnt_nbits must match the cnt_nbits of the adapter
+when it is built with credits.
+
+mk_packed_cfg_pkt_type builds a Cfg type whose address field takes up
+the bits that would otherwise be padding, so no bits are wasted on the
+wire.
+'''
+from pymtl3 import *
+
+from ..ifcs import PushInIfc, PushOutIfc, PullInIfc, PullOutIfc
+from ..ifcs.msg_types import mk_cfg_pkt_type
+from .PushPull2ReqRespAdapter import mk_push_pull_bitstruct
+
+#-------------------------------------------------------------------------
+# Helper functions
+#-------------------------------------------------------------------------
+
+# Returns a Cfg type whose PushPullPkt is exactly nwords words wide
+def mk_packed_cfg_pkt_type( word_nbits, nwords, type_nbits=2, data_nbits=32,
+                            prefix='CfgPkt' ):
+  addr_nbits = word_nbits * nwords - 2 - type_nbits - data_nbits
+  assert addr_nbits > 0
+  return mk_cfg_pkt_type( type_nbits, addr_nbits, data_nbits, prefix )
+
+#-------------------------------------------------------------------------
+# PushPullGearbox
+#-------------------------------------------------------------------------
+
+class PushPullGearbox( Component ):
+  def construct( s, Cfg, word_nbits=8, cnt_nbits=0 ):
+    # Local parameters
+    s.PushPullPkt = mk_push_pull_bitstruct( Cfg, cnt_nbits )
+    s.word_nbits  = word_nbits
+    s.nwords      = ( s.PushPullPkt.nbits + word_nbits - 1 ) // word_nbits
+    s.frame_nbits = s.nwords * word_nbits
+    s.WordType    = mk_bits( word_nbits )
+    s.CntType     = mk_bits( max( clog2( s.nwords ), 1 ) )
+    assert s.nwords > 1
+
+    # Interface
+    s.word_push = PushInIfc ( s.WordType )
+    s.word_pull = PullOutIfc( s.WordType )
+
+    s.push = PushOutIfc( s.PushPullPkt )
+    s.pull = PullInIfc ( s.PushPullPkt )
+
+    # Registers
+    s.push_cnt_r = Wire( s.CntType )
+    s.pull_cnt_r = Wire( s.CntType )
+    s.push_buf_r = Wire( s.frame_nbits - word_nbits )
+    s.pull_buf_r = Wire( s.frame_nbits )
+
+    # Wires
+    s.push_bits     = Wire( s.frame_nbits )
+    s.pull_bits     = Wire( s.frame_nbits )
+    s.pull_msg_bits = Wire( s.PushPullPkt.nbits )
+
+    # Deserializer
+    s.push.en //= lambda: s.word_push.en & ( s.push_cnt_r == s.nwords - 1 )
+    s.push_bits //= lambda: concat( s.push_buf_r, s.word_push.msg )
+
+    @update
+    def up_push_msg():
+      s.push.msg @= s.push_bits[0:s.PushPullPkt.nbits]
+
+    @update_ff
+    def up_push_buf():
+      if s.reset:
+        s.push_cnt_r <<= 0
+      elif s.word_push.en:
+        s.push_buf_r <<= s.push_bits[0:s.frame_nbits-s.word_nbits]
+        if s.push_cnt_r == s.nwords - 1:
+          s.push_cnt_r <<= 0
+        else:
+          s.push_cnt_r <<= s.push_cnt_r + 1
+
+    # Serializer
+    s.pull.en //= lambda: s.word_pull.en & ( s.pull_cnt_r == 0 )
+
+    @update
+    def up_pull_bits():
+      s.pull_msg_bits @= s.pull.msg
+      if s.pull_cnt_r == 0:
+        s.pull_bits @= zext( s.pull_msg_bits, s.frame_nbits )
+      else:
+        s.pull_bits @= s.pull_buf_r
+
+    s.word_pull.msg //= s.pull_bits[s.frame_nbits-s.word_nbits:s.frame_nbits]
+
+    @update_ff
+    def up_pull_buf():
+      if s.reset:
+        s.pull_cnt_r <<= 0
+      elif s.word_pull.en:
+        s.pull_buf_r <<= s.pull_bits << s.word_nbits
+        if s.pull_cnt_r == s.nwords - 1:
+          s.pull_cnt_r <<= 0
+        else:
+          s.pull_cnt_r <<= s.pull_cnt_r + 1
+
+  def line_trace( s ):
+    return f'{s.word_push}|{s.word_pull}({s.push_cnt_r}|{s.pull_cnt_r}){s.push}|{s.pull}'
@@ -2,21 +2,23 @@
 ==========================================================================
 ShiftReg.py
 ==========================================================================
-N-bit shift register.
+N-bit shift register. Shifts in nlanes bits at a time from the LSB side.
 '''
 
 from pymtl3 import *
 
 class ShiftReg( Component ):
 
-  def construct( s, nbits ):
+  def construct( s, nbits, nlanes=1 ):
 
     # Local Parameters
-    s.nbits = nbits
+    assert nbits > nlanes and nbits % nlanes == 0
+    s.nbits  = nbits
+    s.nlanes = nlanes
 
     # Interface
 
-    s.in_       = InPort ()
+    s.in_       = InPort ( s.nlanes )
     s.out       = OutPort( s.nbits )
     s.shift_en  = InPort ()
     s.load_en   = InPort ()
@@ -31,7 +33,7 @@ class ShiftReg( Component ):
       elif ( s.load_en ):
         s.out <<= s.load_data
       elif ( ~s.load_en & s.shift_en ):
-        s.out <<= concat( s.out[0:s.nbits-1], s.in_ )
+        s.out <<= concat( s.out[0:s.nbits-s.nlanes], s.in_ )
 
 
   def line_trace( s ):
@@ -0,0 +1,282 @@
+'''
+==========================================================================
+SourceSyncSpiMinion.py
+==========================================================================
+Source-synchronous SPI minion split into clock-domain halves.
+
+SpiMinion oversamples sclk with the core clock, so sclk has to be several
+times slower than the core clock. Here the shift registers are clocked by
+sclk itself and only whole words cross into the core clock domain, so the
+bits of a word can be shifted as fast as, or faster than, the core clock.
+
+The minion uses the same SPI mode as SpiMinion: sclk idles low, mosi is
+sampled on the rising edge of sclk and miso changes on the falling edge,
+most significant bit first. Every cs-low window carries one nbits-bit
+word, and cs must be held high long enough for the received word to
+reach the core domain and for the next word to send to come back (see
+below), i.e., about 4 core clock cycles from the last rising edge of sclk
+in a window to the first rising edge in the next one. A window must
+carry a whole word: the bit counters are clocked by sclk, so they cannot
+be reset by cs. The short burst frames of PushPull2ReqRespAdapter must
+therefore be padded to full words.
+
+The minion consists of three halves:
+
+ - SourceSyncSpiMinionRx is clocked by sclk. It shifts in mosi and
+   writes every received word into an async FIFO (see AsyncFifo). If the
+   FIFO is full, the word is dropped and the sticky rx_overflow flag is
+   set. With the timing above the core side empties the FIFO long
+   before the next word arrives, so the flag flags a broken timing.
+ - SourceSyncSpiMinionTx is clocked by the inverted sclk. It shifts out
+   tx_data, which the core side only changes while cs is high, so it is
+   read directly without synchronization.
+ - SourceSyncSpiMinionCore is clocked by the core clock. It pushes the
+   words read from the FIFO and pulls the word to send in the next window
+   in the same cycle as every push, and once after reset for the first
+   window. Pushes and pulls therefore alternate as with SpiMinion, and
+   the stall and credit information of a pulled PushPullPkt accounts for
+   the request pushed before it. parity is the parity of the pushed word
+   and overflow is rx_overflow synchronized to the core clock.
+
+SourceSyncSpiMinion connects the three halves behind the interface of
+SpiMinion. PyMTL drives the clk port of every component from its parent,
+so the wrapper describes the structure only: the Rx and Tx halves have to
+be clocked by sclk and the inverted sclk in the netlist, and simulations
+run the halves as separate models, each ticked by its own clock (see the
+tests).
+'''
+from pymtl3 import *
+
+from ..ifcs import PushOutIfc, PullInIfc, SpiMinionIfc
+from .AsyncFifo import AsyncFifoWriteHalf, AsyncFifoReadHalf
+
+#-------------------------------------------------------------------------
+# SourceSyncSpiMinionRx
+#-------------------------------------------------------------------------
+
+class SourceSyncSpiMinionRx( Component ):
+
+  def construct( s, nbits=8, num_entries=2 ):
+
+    # Local parameters
+    assert nbits >= 2
+    s.nbits    = nbits
+    s.DataType = mk_bits( s.nbits )
+
+    # Interface
+    s.cs   = InPort()
+    s.mosi = InPort()
+
+    # Cross-domain interface
+    s.fifo = AsyncFifoWriteHalf( s.DataType, num_entries )
+
+    s.rx_entries  = [ OutPort( s.DataType ) for _ in range( num_entries ) ]
+    s.rx_wptr     = OutPort( s.fifo.PtrType )
+    s.rx_rptr     = InPort ( s.fifo.PtrType )
+    s.rx_overflow = OutPort()
+
+    for i in range( num_entries ):
+      s.rx_entries[i] //= s.fifo.o_entries[i]
+    s.rx_wptr     //= s.fifo.o_wptr
+    s.fifo.i_rptr //= s.rx_rptr
+
+    # Registers
+    s.bit_cnt    = Wire( clog2( s.nbits ) )
+    s.shreg      = Wire( s.DataType )
+    s.overflow_r = Wire()
+
+    # Wires
+    s.word_done = Wire()
+
+    # Logic
+    # The word is complete once its last bit is sampled
+    s.word_done //= lambda: ~s.cs & ( s.bit_cnt == s.nbits - 1 )
+
+    s.fifo.istream.val //= s.word_done
+    s.fifo.istream.msg //= lambda: concat( s.shreg[0:s.nbits-1], s.mosi )
+    s.rx_overflow      //= s.overflow_r
+
+    @update_ff
+    def up_rx():
+      if s.reset:
+        s.bit_cnt    <<= 0
+        s.overflow_r <<= 0
+      elif ~s.cs:
+        s.shreg <<= concat( s.shreg[0:s.nbits-1], s.mosi )
+        if s.bit_cnt == s.nbits - 1:
+          s.bit_cnt <<= 0
+        else:
+          s.bit_cnt <<= s.bit_cnt + 1
+        if s.word_done & ~s.fifo.istream.rdy:
+          s.overflow_r <<= 1
+
+  def line_trace( s ):
+    cs = '@' if s.cs else '.'
+    return f'{cs} {s.mosi} {s.fifo.line_trace()}'
+
+#-------------------------------------------------------------------------
+# SourceSyncSpiMinionTx
+#-------------------------------------------------------------------------
+
+class SourceSyncSpiMinionTx( Component ):
+
+  def construct( s, nbits=8 ):
+
+    # Local parameters
+    assert nbits >= 2
+    s.nbits    = nbits
+    s.DataType = mk_bits( s.nbits )
+
+    # Interface
+    s.cs   = InPort()
+    s.miso = OutPort()
+
+    # Cross-domain interface
+    s.tx_data = InPort( s.DataType )
+
+    # Registers
+    s.bit_cnt = Wire( clog2( s.nbits ) )
+    s.shreg   = Wire( s.DataType )
+
+    # Logic
+    # The first bit of a word is sent straight from tx_data, the others
+    # are shifted out on the falling edges
+    @update
+    def up_miso():
+      if s.bit_cnt == 0:
+        s.miso @= s.tx_data[s.nbits-1]
+      else:
+        s.miso @= s.shreg[s.nbits-1]
+
+    @update_ff
+    def up_tx():
+      if s.reset:
+        s.bit_cnt <<= 0
+      elif ~s.cs:
+        if s.bit_cnt == 0:
+          s.shreg <<= s.tx_data << 1
+        else:
+          s.shreg <<= s.shreg << 1
+        if s.bit_cnt == s.nbits - 1:
+          s.bit_cnt <<= 0
+        else:
+          s.bit_cnt <<= s.bit_cnt + 1
+
+  def line_trace( s ):
+    cs = '@' if s.cs else '.'
+    return f'{cs} {s.miso}'
+
+#-------------------------------------------------------------------------
+# SourceSyncSpiMinionCore
+#-------------------------------------------------------------------------
+
+class SourceSyncSpiMinionCore( Component ):
+
+  def construct( s, nbits=8, num_entries=2 ):
+
+    # Local parameters
+    s.nbits    = nbits
+    s.DataType = mk_bits( s.nbits )
+
+    # Interface
+    s.push = PushOutIfc( s.DataType )
+    s.pull = PullInIfc ( s.DataType )
+
+    s.parity   = OutPort()
+    s.overflow = OutPort()
+
+    # Cross-domain interface
+    s.fifo = AsyncFifoReadHalf( s.DataType, num_entries )
+
+    s.rx_entries  = [ InPort( s.DataType ) for _ in range( num_entries ) ]
+    s.rx_wptr     = InPort ( s.fifo.PtrType )
+    s.rx_rptr     = OutPort( s.fifo.PtrType )
+    s.rx_overflow = InPort()
+    s.tx_data     = OutPort( s.DataType )
+
+    for i in range( num_entries ):
+      s.fifo.i_entries[i] //= s.rx_entries[i]
+    s.fifo.i_wptr //= s.rx_wptr
+    s.rx_rptr     //= s.fifo.o_rptr
+
+    # Registers
+    s.first_r         = Wire()
+    s.tx_data_r       = Wire( s.DataType )
+    s.overflow_sync0  = Wire()
+    s.overflow_sync1  = Wire()
+
+    # Logic
+    s.push.en        //= s.fifo.ostream.val
+    s.push.msg       //= s.fifo.ostream.msg
+    s.fifo.ostream.rdy //= 1
+
+    # One pull for the first window and one with every push
+    s.pull.en  //= lambda: ~s.reset & ( s.first_r | s.fifo.ostream.val )
+    s.tx_data  //= s.tx_data_r
+    s.parity   //= lambda: reduce_xor( s.fifo.ostream.msg )
+    s.overflow //= s.overflow_sync1
+
+    @update_ff
+    def up_core():
+      if s.reset:
+        s.first_r        <<= 1
+        s.tx_data_r      <<= 0
+        s.overflow_sync0 <<= 0
+        s.overflow_sync1 <<= 0
+      else:
+        s.overflow_sync0 <<= s.rx_overflow
+        s.overflow_sync1 <<= s.overflow_sync0
+        if s.pull.en:
+          s.first_r   <<= 0
+          s.tx_data_r <<= s.pull.msg
+
+  def line_trace( s ):
+    return f'{s.pull} {s.fifo.line_trace()} {s.push}'
+
+#-------------------------------------------------------------------------
+# SourceSyncSpiMinion
+#-------------------------------------------------------------------------
+
+class SourceSyncSpiMinion( Component ):
+
+  def construct( s, nbits=8, num_entries=2 ):
+
+    # Local parameters
+    s.nbits = nbits
+
+    # Interface
+    s.spi_min = SpiMinionIfc()
+
+    s.push = PushOutIfc( mk_bits(s.nbits) )
+    s.pull = PullInIfc ( mk_bits(s.nbits) )
+
+    s.parity   = OutPort()
+    s.overflow = OutPort()
+
+    # Components
+    s.rx   = SourceSyncSpiMinionRx  ( nbits, num_entries ) # sclk
+    s.tx   = SourceSyncSpiMinionTx  ( nbits )              # inverted sclk
+    s.core = SourceSyncSpiMinionCore( nbits, num_entries ) # core clock
+
+    # Pins
+    s.rx.cs        //= s.spi_min.cs
+    s.rx.mosi      //= s.spi_min.mosi
+    s.tx.cs        //= s.spi_min.cs
+    s.spi_min.miso //= s.tx.miso
+
+    # Cross-domain connections
+    for i in range( num_entries ):
+      s.core.rx_entries[i] //= s.rx.rx_entries[i]
+    s.core.rx_wptr     //= s.rx.rx_wptr
+    s.rx.rx_rptr       //= s.core.rx_rptr
+    s.core.rx_overflow //= s.rx.rx_overflow
+    s.tx.tx_data       //= s.core.tx_data
+
+    # Core interface
+    s.push     //= s.core.push
+    s.pull     //= s.core.pull
+    s.parity   //= s.core.parity
+    s.overflow //= s.core.overflow
+
+  def line_trace( s ):
+    return f'{s.spi_min} {s.core.line_trace()}'
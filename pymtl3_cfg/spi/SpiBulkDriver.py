@@ -0,0 +1,152 @@
+'''
+==========================================================================
+SpiBulkDriver.py
+==========================================================================
+A host-side SPI master model that drives a whole list of words in bulk.
+
+Driving the minion one oversampled bit at a time from Python costs
+several port writes, a sim_eval_combinational and a sim_tick per cycle,
+plus the Python code that works out the next bit. SpiBulkDriver instead
+encodes all words into NumPy arrays of cs, sclk and mosi values up
+front, compresses them into runs of cycles over which the pins do not
+change, and then only writes the pins at the start of a run and ticks
+the simulator for the rest of it. miso is sampled at the end of the low
+half of every sclk cycle, and the samples are decoded back into words
+in one go.
+
+Every word is sent in its own cs window, most significant bits first,
+with the same timing as SpiMasterModel in SpiMinion_test: a sclk phase
+lasts half_period cycles, and cs stays high for cs_gap cycles after a
+window. With nlanes > 1 the word is sent nlanes bits per sclk cycle (see
+SpiMinionIfc). spi is the SpiMinionIfc of the design to drive.
+
+  drv = SpiBulkDriver( th, th.spi_min, PushPullPkt.nbits )
+  resps, stalls = drv.transfer_pkts( PushPullPkt, [ CfgPkt( ... ), ... ] )
+  assert not any( stalls )
+
+All windows are encoded before the first one is sent, so the driver
+cannot hold back a request when the minion reports a full request queue.
+transfer_pkts therefore returns the stall flag of every window, and a
+request sent in a window that reported a stall may have been dropped.
+The caller has to check the flags, and re-send or pace the requests if
+one is set.
+
+NumPy is only needed for this model.
+'''
+import numpy as np
+
+from pymtl3 import *
+
+
+class SpiBulkDriver:
+  def __init__( s, top, spi, nbits, half_period=4, cs_gap=8, nlanes=1 ):
+    assert nbits % nlanes == 0
+    s.top         = top
+    s.spi         = spi
+    s.nbits       = nbits
+    s.nlanes      = nlanes
+    s.nsyms       = nbits // nlanes
+    s.half_period = half_period
+    s.cs_gap      = cs_gap
+    s.nsclks      = 0
+
+    # Words wider than 63 bits are kept as Python integers
+    s.dtype  = np.uint64 if nbits < 64 else object
+    s.shifts = np.array( [ i * nlanes for i in reversed( range( s.nsyms ) ) ],
+                         dtype=s.dtype )
+    s.mask   = np.array( [ ( 1 << nlanes ) - 1 ], dtype=s.dtype )
+
+    # Pins of one window: half_period cycles of lead-in, two phases per
+    # symbol, half_period cycles of lead-out and cs_gap cycles with cs
+    # high
+    hp = half_period
+    s.frame_len = hp + 2 * hp * s.nsyms + hp + cs_gap
+    s.frame_cs   = np.zeros( s.frame_len, dtype=np.uint8 )
+    s.frame_cs[ s.frame_len - cs_gap: ] = 1
+    s.frame_sclk = np.zeros( s.frame_len, dtype=np.uint8 )
+    for k in range( s.nsyms ):
+      s.frame_sclk[ hp + 2*hp*k + hp : hp + 2*hp*( k + 1 ) ] = 1
+    # Cycles at the end of which miso is sampled
+    s.frame_sample = hp + 2 * hp * np.arange( s.nsyms ) + hp - 1
+
+  #-----------------------------------------------------------------------
+  # Encoding and decoding
+  #-----------------------------------------------------------------------
+
+  # Returns the cs, sclk and mosi value of every cycle
+  def encode( s, words ):
+    nwords = len( words )
+    syms   = ( np.array( words, dtype=s.dtype )[:, None] >> s.shifts ) & s.mask
+    syms   = syms.astype( np.uint8 )
+
+    hp   = s.half_period
+    mosi = np.zeros( ( nwords, s.frame_len ), dtype=np.uint8 )
+    mosi[ :, hp : hp + 2*hp*s.nsyms ] = np.repeat( syms, 2 * hp, axis=1 )
+
+    cs   = np.tile( s.frame_cs,   nwords )
+    sclk = np.tile( s.frame_sclk, nwords )
+    return cs, sclk, mosi.ravel()
+
+  # Returns the sampled miso values of every window as words
+  def decode( s, samples ):
+    samples = samples.reshape( -1, s.nsyms ).astype( s.dtype )
+    return [ int( w ) for w in ( samples << s.shifts ).sum( axis=1 ) ]
+
+  #-----------------------------------------------------------------------
+  # Simulation
+  #-----------------------------------------------------------------------
+
+  # Drives the pins and returns the miso values sampled at the cycles in
+  # sample_at
+  def run( s, cs, sclk, mosi, sample_at ):
+    ncycles = len( cs )
+    sample  = np.zeros( ncycles, dtype=bool )
+    sample[ sample_at ] = True
+
+    # Runs of cycles end where a pin changes or after a sampled cycle
+    pins   = ( cs.astype( np.int32 ) << 16 ) | ( sclk.astype( np.int32 ) << 8 ) | mosi
+    starts = np.flatnonzero( np.concatenate(
+               ( [ True ], ( pins[1:] != pins[:-1] ) | sample[:-1] ) ) )
+    ends   = np.append( starts[1:], ncycles )
+
+    top  = s.top
+    spi  = s.spi
+    tick = top.sim_tick
+    out  = []
+    for start, end, cs_, sclk_, mosi_, smp in zip(
+        starts.tolist(), ends.tolist(), cs[starts].tolist(),
+        sclk[starts].tolist(), mosi[starts].tolist(),
+        sample[ends - 1].tolist() ):
+      spi.cs   @= cs_
+      spi.sclk @= sclk_
+      spi.mosi @= mosi_
+      for _ in range( end - start ):
+        tick()
+      if smp:
+        out.append( int( spi.miso ) )
+
+    return np.array( out, dtype=np.uint8 )
+
+  # Sends the words and returns the words received on miso
+  def transfer( s, words ):
+    if not words:
+      return []
+    cs, sclk, mosi = s.encode( words )
+    sample_at = ( np.arange( len( words ) )[:, None] * s.frame_len +
+                  s.frame_sample[None, :] ).ravel()
+    s.nsclks += len( words ) * s.nsyms
+    return s.decode( s.run( cs, sclk, mosi, sample_at ) )
+
+  # Sends every packet as the payload of a valid PushPullPkt. Returns the
+  # payloads of the valid PushPullPkts received on miso and the stall
+  # flag of every window.
+  def transfer_pkts( s, PushPullPkt, pkts ):
+    words  = [ int( PushPullPkt( 1, 0, pkt ).to_bits() ) for pkt in pkts ]
+    resps  = []
+    stalls = []
+    for word in s.transfer( words ):
+      msg = PushPullPkt.from_bits( Bits( PushPullPkt.nbits, word ) )
+      if msg.valid:
+        resps.append( msg.payload )
+      stalls.append( bool( msg.stall ) )
+    return resps, stalls
@@ -0,0 +1,156 @@
+'''
+==========================================================================
+SpiMaster.py
+==========================================================================
+SPI master that sends a stream of words to a SpiMinion.
+
+Every word from recv is sent in its own cs-low window, like the minion
+expects in its default non-streaming mode, and the word shifted in on
+miso during the window is sent out on send. A window is laid out as
+follows, where a phase lasts half_period cycles:
+
+  cs   ```|___________________ ... ______________|```````````
+  sclk ______________|`````|__ ... __|`````|_____________________
+       gap  | lead  |  low | high |  | high | tail |  cs_gap  |
+
+mosi carries the next nlanes bits of the word during the low and high
+phases of a sclk cycle. The minion samples mosi on the rising edge of
+sclk and shifts out the next bits of miso on the falling edge, so the
+master samples miso in the first cycle of the high phase. half_period is
+the clock divider: a word takes (2*nbits/nlanes + 2) * half_period +
+cs_gap cycles. The minion synchronizes its inputs, which takes three
+cycles until miso follows a falling edge, so half_period must be at
+least three.
+
+A new window only starts once the word received in the previous one has
+been sent out.
+'''
+from pymtl3 import *
+from pymtl3.stdlib.stream.ifcs import IStreamIfc, OStreamIfc
+
+from ..ifcs import SpiMasterIfc
+
+# States
+GAP  = 0
+LEAD = 1
+LOW  = 2
+HIGH = 3
+TAIL = 4
+
+class SpiMaster( Component ):
+
+  def construct( s, nbits=8, half_period=4, cs_gap=8, nlanes=1 ):
+
+    # Local parameters
+    assert nbits > nlanes and nbits % nlanes == 0
+    assert half_period >= 3 and cs_gap >= 1
+    s.nbits       = nbits
+    s.nlanes      = nlanes
+    s.nsyms       = nbits // nlanes
+    s.half_period = half_period
+    s.cs_gap      = cs_gap
+
+    CntType = mk_bits( clog2( max( half_period, cs_gap ) ) + 1 )
+    SymType = mk_bits( clog2( s.nsyms ) + 1 )
+
+    # Interface
+    s.spi_ms = SpiMasterIfc( s.nlanes )
+
+    s.recv = IStreamIfc( mk_bits( s.nbits ) )
+    s.send = OStreamIfc( mk_bits( s.nbits ) )
+
+    # Registers
+    s.state_r    = Wire( Bits3 )
+    s.cnt_r      = Wire( CntType ) # cycles spent in the current phase
+    s.sym_r      = Wire( SymType ) # sclk cycles of the current window
+    s.shreg_r    = Wire( s.nbits )
+    s.miso_r     = Wire( s.nlanes )
+    s.send_val_r = Wire()
+
+    # Wires
+    s.phase_done = Wire()
+    s.last_sym   = Wire()
+    s.recv_xfer  = Wire()
+    s.shift_en   = Wire()
+
+    s.phase_done //= lambda: s.cnt_r == s.half_period - 1
+    s.last_sym   //= lambda: s.sym_r == s.nsyms - 1
+    s.recv_xfer  //= lambda: s.recv.val & s.recv.rdy
+    s.shift_en   //= lambda: ( s.state_r == HIGH ) & s.phase_done
+
+    s.recv.rdy //= lambda: ( ( s.state_r == GAP ) &
+                             ( s.cnt_r == s.cs_gap - 1 ) & ~s.send_val_r )
+    s.send.val //= s.send_val_r
+    s.send.msg //= s.shreg_r
+
+    s.spi_ms.cs   //= lambda: s.state_r == GAP
+    s.spi_ms.sclk //= lambda: s.state_r == HIGH
+
+    @update
+    def up_mosi():
+      if ( s.state_r == LOW ) | ( s.state_r == HIGH ):
+        s.spi_ms.mosi @= s.shreg_r[s.nbits-s.nlanes:s.nbits]
+      else:
+        s.spi_ms.mosi @= 0
+
+    # Logic
+    @update_ff
+    def up_state():
+      if s.reset:
+        s.state_r <<= GAP
+        s.cnt_r   <<= s.cs_gap - 1
+        s.sym_r   <<= 0
+
+      elif s.state_r == GAP:
+        if s.recv_xfer:
+          s.state_r <<= LEAD
+          s.cnt_r   <<= 0
+        elif s.cnt_r != s.cs_gap - 1:
+          s.cnt_r   <<= s.cnt_r + 1
+
+      elif ~s.phase_done:
+        s.cnt_r <<= s.cnt_r + 1
+
+      else:
+        s.cnt_r <<= 0
+        if s.state_r == LEAD:
+          s.state_r <<= LOW
+        elif s.state_r == LOW:
+          s.state_r <<= HIGH
+        elif s.state_r == HIGH:
+          if s.last_sym:
+            s.state_r <<= TAIL
+            s.sym_r   <<= 0
+          else:
+            s.state_r <<= LOW
+            s.sym_r   <<= s.sym_r + 1
+        else:
+          s.state_r <<= GAP
+
+    @update_ff
+    def up_data():
+      if s.reset:
+        s.shreg_r    <<= 0
+        s.miso_r     <<= 0
+        s.send_val_r <<= 0
+
+      else:
+        if s.recv_xfer:
+          s.shreg_r <<= s.recv.msg
+        elif s.shift_en:
+          s.shreg_r <<= concat( s.shreg_r[0:s.nbits-s.nlanes], s.miso_r )
+
+        if ( s.state_r == HIGH ) & ( s.cnt_r == 0 ):
+          s.miso_r <<= s.spi_ms.miso
+
+        if s.shift_en & s.last_sym:
+          s.send_val_r <<= 1
+        elif s.send.rdy:
+          s.send_val_r <<= 0
+
+  def line_trace( s ):
+    high = '@'
+    low  = '.'
+    cs   = high if s.spi_ms.cs   else low
+    sclk = high if s.spi_ms.sclk else low
+    return f'{s.recv}({cs} {sclk} {s.spi_ms.mosi} {s.spi_ms.miso}){s.send}'
@@ -4,6 +4,19 @@ SPIMinion.py
 ==========================================================================
 SPIMinion module. Supports SPI mode 3
 
+By default the minion transfers one word per chip-select window: it pulls
+a word when cs goes low and pushes the received word when cs goes high.
+
+In streaming mode a single cs-low window can carry many back-to-back
+words. A bit counter tracks the word boundaries: the received word is
+pushed right after its last bit is sampled, and the next word to send is
+pulled on the following sclk falling edge. A word that is pulled but not
+started before cs goes high is kept in the output shift register and sent
+in the next window. A trailing partial word is pushed when cs goes high.
+
+With nlanes > 1 the minion shifts nlanes bits per sclk edge (see
+SpiMinionIfc), so a word takes nbits/nlanes sclk cycles.
+
 Author : Yanghui Ou, Modified by Kyle Infantino
 '''
 
@@ -15,13 +28,15 @@ from ..ifcs import PushOutIfc, PullInIfc, SpiMinionIfc
 
 class SpiMinion( Component ):
 
-  def construct( s, nbits=8 ):
+  def construct( s, nbits=8, streaming=False, nlanes=1 ):
 
     # Local parameters
-    s.nbits = nbits
+    s.nbits     = nbits
+    s.streaming = streaming
+    s.nlanes    = nlanes
 
     # Interface
-    s.spi_min = SpiMinionIfc()
+    s.spi_min = SpiMinionIfc( s.nlanes )
 
     s.push = PushOutIfc( mk_bits(s.nbits) )
     s.pull = PullInIfc ( mk_bits(s.nbits) )
@@ -35,17 +50,19 @@ class SpiMinion( Component ):
     s.sclk_sync = Synchronizer(0)
     s.sclk_sync.in_ //= s.spi_min.sclk
 
-    s.mosi_sync = Synchronizer(0)
-    s.mosi_sync.in_ //= s.spi_min.mosi
+    s.mosi_sync = [ Synchronizer(0) for _ in range( s.nlanes ) ]
+    for i in range( s.nlanes ):
+      s.mosi_sync[i].in_ //= s.spi_min.mosi[i]
 
     # Add Comments
-    s.shreg_in = m = ShiftReg( s.nbits )
-    m.in_       //= s.mosi_sync.out
+    s.shreg_in = m = ShiftReg( s.nbits, s.nlanes )
+    for i in range( s.nlanes ):
+      m.in_[i] //= s.mosi_sync[i].out
     m.shift_en  //= lambda: ~s.cs_sync.out & s.sclk_sync.posedge_
     m.load_en   //= 0
     m.load_data //= 0
 
-    s.shreg_out = m = ShiftReg( s.nbits )
+    s.shreg_out = m = ShiftReg( s.nbits, s.nlanes )
     m.in_       //= 0
     m.shift_en  //= lambda: ~s.cs_sync.out & s.sclk_sync.negedge_
     m.load_en   //= s.pull.en
@@ -53,13 +70,61 @@ class SpiMinion( Component ):
 
     # TODO: register pull/push signal for one cycle?
     # TODO: force pull/push to 0 during reset?
-    s.spi_min.miso  //= s.shreg_out.out[s.nbits-1]
-    s.pull.en       //= s.cs_sync.negedge_
-    s.push.en       //= s.cs_sync.posedge_
+    s.spi_min.miso  //= s.shreg_out.out[s.nbits-s.nlanes:s.nbits]
     s.push.msg      //= s.shreg_in.out
 
+    if not s.streaming:
+      s.pull.en //= s.cs_sync.negedge_
+      s.push.en //= s.cs_sync.posedge_
+
+    else:
+      # Number of bits received of the current word
+      s.bit_cnt      = Wire( clog2( s.nbits ) + 1 )
+      # The last bit of a word has just been shifted in
+      s.word_done_r  = Wire()
+      # A word has been pulled but none of its bits has been sent yet
+      s.out_loaded_r = Wire()
+
+      s.pull.en //= lambda: ~s.out_loaded_r & (
+        s.cs_sync.negedge_ |
+        ( ~s.cs_sync.out & s.sclk_sync.negedge_ & ( s.bit_cnt == 0 ) ) )
+      s.push.en //= lambda: s.word_done_r | (
+        s.cs_sync.posedge_ & ( s.bit_cnt != 0 ) )
+
+      @update_ff
+      def up_bit_cnt():
+        if s.reset | s.cs_sync.out:
+          s.bit_cnt     <<= 0
+          s.word_done_r <<= 0
+        elif s.shreg_in.shift_en:
+          if s.bit_cnt == s.nbits - s.nlanes:
+            s.bit_cnt     <<= 0
+            s.word_done_r <<= 1
+          else:
+            s.bit_cnt     <<= s.bit_cnt + s.nlanes
+            s.word_done_r <<= 0
+        else:
+          s.word_done_r <<= 0
+
+      @update_ff
+      def up_out_loaded_r():
+        if s.reset:
+          s.out_loaded_r <<= 0
+        elif s.pull.en:
+          s.out_loaded_r <<= 1
+        elif s.shreg_in.shift_en & ( s.bit_cnt == 0 ):
+          s.out_loaded_r <<= 0
+
     s.parity //= lambda: reduce_xor(s.shreg_in.out)
 
+  # For simulation only: cs has been high long enough to reach the
+  # synchronizer output and none of the SPI inputs is changing, so the
+  # minion neither shifts nor pushes or pulls (see IdleFastForward)
+  def is_idle( s ):
+    return ( bool( s.cs_sync.out ) and s.cs_sync.is_stable() and
+             s.sclk_sync.is_stable() and
+             all( sync.is_stable() for sync in s.mosi_sync ) )
+
   def line_trace( s ):
 
     pull_msg = f'{s.pull}'
@@ -0,0 +1,184 @@
+'''
+==========================================================================
+IdleFastForward_test.py
+==========================================================================
+Test cases for IdleFastForward.
+'''
+import time
+
+import pytest
+
+from pymtl3 import *
+
+from ...ifcs import SpiMinionIfc
+from ...ifcs.msg_types import CfgType, mk_cfg_pkt_type
+from ...router.test.ReqRespRouter_test import RespDelay
+from ...terminal.ConfigTerminal import ConfigTerminal
+from ..IdleFastForward import IdleFastForward
+from ..PushPull2ReqRespAdapter import PushPull2ReqRespAdapter
+from ..SpiMinion import SpiMinion
+
+CfgPkt = mk_cfg_pkt_type( type_nbits=2, addr_nbits=16, data_nbits=32 )
+wr = CfgType.WRITE
+rd = CfgType.READ
+
+#-------------------------------------------------------------------------
+# TestHarness
+#-------------------------------------------------------------------------
+# SpiMinion -> PushPull2ReqRespAdapter -> ConfigTerminal. The responses
+# of the terminal go through resp_delay pipe queues.
+
+class TestHarness( Component ):
+  def construct( s, resp_delay=0, nlanes=1 ):
+    s.adapter  = PushPull2ReqRespAdapter( CfgPkt )
+    s.minion   = SpiMinion( s.adapter.PushPullPkt.nbits, nlanes=nlanes )
+    s.terminal = ConfigTerminal( CfgPkt, num_config_regs=4, num_status_regs=0 )
+    s.delay    = RespDelay( CfgPkt, resp_delay )
+
+    s.spi_min = SpiMinionIfc( nlanes )
+
+    s.spi_min //= s.minion.spi_min
+    s.minion.push.en  //= s.adapter.push.en
+    s.minion.pull.en  //= s.adapter.pull.en
+
+    @update
+    def up_push_pull_msg():
+      s.adapter.push.msg @= s.minion.push.msg
+      s.minion.pull.msg  @= s.adapter.pull.msg
+
+    s.adapter.req  //= s.terminal.minion_req
+    s.terminal.minion_resp //= s.delay.recv
+    s.delay.send   //= s.adapter.resp
+
+  def is_idle( s ):
+    return s.minion.is_idle() and s.adapter.is_idle()
+
+# Sends a word in every cs window and returns the words sampled on miso.
+# Idle cycles between the transactions are simulated with tick, or
+# skipped with IdleFastForward if fast_forward is set.
+
+class SpiHost:
+  def __init__( s, th, fast_forward, half_period=4, cs_gap=8 ):
+    s.th          = th
+    s.nbits       = th.adapter.PushPullPkt.nbits
+    s.half_period = half_period
+    s.cs_gap      = cs_gap
+    s.ff          = IdleFastForward( th, th.is_idle ) if fast_forward else None
+    s.resps       = []
+
+  def pins( s, cs, sclk, mosi ):
+    s.th.spi_min.cs   @= cs
+    s.th.spi_min.sclk @= sclk
+    s.th.spi_min.mosi @= mosi
+    s.th.sim_tick()
+
+  def frame( s, pkt ):
+    word = int( s.th.adapter.PushPullPkt( 1, 0, pkt ).to_bits() )
+    miso = 0
+    for _ in range( s.half_period ):
+      s.pins( 0, 0, 0 )
+    for i in reversed( range( s.nbits ) ):
+      bit = ( word >> i ) & 1
+      for _ in range( s.half_period ):
+        s.pins( 0, 0, bit )
+      miso = ( miso << 1 ) | int( s.th.spi_min.miso )
+      for _ in range( s.half_period ):
+        s.pins( 0, 1, bit )
+    for _ in range( s.half_period ):
+      s.pins( 0, 0, 0 )
+    for _ in range( s.cs_gap ):
+      s.pins( 1, 0, 0 )
+
+    # The valid bit is the MSB
+    if miso >> ( s.nbits - 1 ):
+      payload = miso & ( ( 1 << CfgPkt.nbits ) - 1 )
+      s.resps.append( CfgPkt.from_bits( Bits( CfgPkt.nbits, payload ) ) )
+
+  def idle( s, ncycles ):
+    if s.ff is None:
+      for _ in range( ncycles ):
+        s.th.sim_tick()
+    else:
+      s.ff.tick( ncycles )
+
+# Every request gets its response in the frame of the next request
+def run_script( fast_forward, idle_cycles, resp_delay=0, num_regs=4 ):
+  th = TestHarness( resp_delay )
+  th.elaborate()
+  th.apply( DefaultPassGroup() )
+  th.spi_min.cs @= 1
+  th.sim_reset()
+
+  host = SpiHost( th, fast_forward )
+  for i in range( num_regs ):
+    host.frame( CfgPkt( wr, i, 0xc0de0000 + i ) )
+    host.idle( idle_cycles )
+  for i in range( num_regs ):
+    host.frame( CfgPkt( rd, i, 0 ) )
+    host.idle( idle_cycles )
+  host.frame( CfgPkt( rd, 0, 0 ) )
+
+  configs = [ int( th.terminal.o_config[i] ) for i in range( num_regs ) ]
+  skipped = host.ff.skipped_cycles if fast_forward else 0
+  return host.resps, configs, th.sim_cycle_count(), skipped
+
+#-------------------------------------------------------------------------
+# Tests
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "idle_cycles, resp_delay", [
+  ( 1, 0 ), ( 10, 0 ), ( 100, 0 ), ( 100, 40 ),
+])
+def test_same_as_ticking( idle_cycles, resp_delay ):
+  resps, configs, ncycles, _ = run_script( False, idle_cycles, resp_delay )
+  assert resps == (
+    [ CfgPkt( wr, i, 0 ) for i in range( 4 ) ] +
+    [ CfgPkt( rd, i, 0xc0de0000 + i ) for i in range( 4 ) ] )
+  assert configs == [ 0xc0de0000 + i for i in range( 4 ) ]
+
+  ff_resps, ff_configs, ff_ncycles, skipped = \
+    run_script( True, idle_cycles, resp_delay )
+  assert ff_resps   == resps
+  assert ff_configs == configs
+  assert ff_ncycles == ncycles
+  if idle_cycles >= 100:
+    assert skipped > 0
+
+def test_no_skip_while_busy():
+  # The SPI side is idle while the responses travel through the delay
+  # queues, which takes longer than the idle time, so no cycle may be
+  # skipped
+  ref = run_script( False, 30, resp_delay=40 )
+  resps, configs, ncycles, skipped = run_script( True, 30, resp_delay=40 )
+  assert skipped == 0
+  assert ( resps, configs, ncycles ) == ref[:3]
+
+def test_needs_simulation():
+  # The registers are found through the simulation passes
+  th = TestHarness( 0, 1 )
+  th.elaborate()
+  with pytest.raises( RuntimeError ):
+    IdleFastForward( th, lambda: True )
+
+#-------------------------------------------------------------------------
+# Benchmarks
+#-------------------------------------------------------------------------
+# A boot script with long idle periods between the SPI transactions. Run
+# with -m benchmark -s to see the results.
+
+@pytest.mark.benchmark
+def test_sim_speed():
+  idle_cycles = 2000
+  results = {}
+  for fast_forward in [ False, True ]:
+    start = time.perf_counter()
+    resps, configs, ncycles, skipped = run_script( fast_forward, idle_cycles )
+    elapsed = time.perf_counter() - start
+    results[fast_forward] = ( resps, configs, ncycles, skipped )
+    print( f'fast forward {fast_forward!s:5}: {ncycles} cycles, '
+           f'{skipped} skipped, {elapsed:.2f}s, '
+           f'{ncycles/elapsed:.0f} cycles/s' )
+
+  assert results[True][:3] == results[False][:3]
+  assert results[False][3] == 0
+  assert results[True][3] > 0
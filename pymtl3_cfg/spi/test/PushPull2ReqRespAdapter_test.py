@@ -9,7 +9,12 @@ Author : Yanghui Ou
 '''
 from pymtl3 import *
 from ..PushPull2ReqRespAdapter import PushPull2ReqRespAdapter
+from ...ifcs import PullOutIfc, PushInIfc
 from ...ifcs.msg_types import CfgType, mk_cfg_pkt_type
+from ...router.ReqRespRouter import ReqRespRouter
+from ...terminal.ConfigTerminal import ConfigTerminal
+from ...terminal.MemConfigTerminal import MemConfigTerminal
+from ...test_utils import BurstyGate
 
 
 #-------------------------------------------------------------------------
@@ -18,6 +23,7 @@ from ...ifcs.msg_types import CfgType, mk_cfg_pkt_type
 
 wr = CfgType.WRITE
 rd = CfgType.READ
+bwr = CfgType.BURST_WRITE
 CfgPkt = mk_cfg_pkt_type()
 
 #-------------------------------------------------------------------------
@@ -185,3 +191,263 @@ def test_req_stall():
 
   dut.sim_tick()
   dut.sim_tick()
+
+#-------------------------------------------------------------------------
+# Burst writes
+#-------------------------------------------------------------------------
+# The adapter is connected to a ConfigTerminal (addresses below 0x1000)
+# and a MemConfigTerminal (addresses from 0x1000) through a ReqRespRouter.
+# Each SPI frame first pulls a response and then pushes a request, and
+# costs as many SPI bits as the frame is wide.
+
+class TwoTerminalRoutingLogic( Component ):
+  def construct( s, PacketType, IDType, num_outports ):
+    s.i_id  = InPort( IDType )
+    s.i_pkt = InPort( PacketType )
+    s.o_val = OutPort( mk_bits( num_outports ) )
+
+    @update
+    def up_routing_logic():
+      s.o_val @= 0b10 if s.i_pkt.addr >= 0x1000 else 0b01
+
+class BurstTestHarness( Component ):
+  def construct( s, Cfg, num_mem_regs ):
+    s.adapter  = PushPull2ReqRespAdapter( Cfg )
+    s.router   = ReqRespRouter( Cfg, Bits1, TwoTerminalRoutingLogic,
+                                num_terminals=2 )
+    s.cfg_term = ConfigTerminal( Cfg, num_config_regs=2, num_status_regs=0 )
+    s.mem_term = MemConfigTerminal( Cfg, num_mem_regs=num_mem_regs )
+
+    s.push = PushInIfc ( s.adapter.PushPullPkt )
+    s.pull = PullOutIfc( s.adapter.PushPullPkt )
+    s.mem_raddr = InPort ( s.mem_term.MemAddrType )
+    s.mem_rdata = OutPort( Cfg.get_field_type( 'data' ) )
+
+    s.push //= s.adapter.push
+    s.pull //= s.adapter.pull
+    s.adapter.req  //= s.router.minion_req
+    s.adapter.resp //= s.router.minion_resp
+    s.router.master_req[0]  //= s.cfg_term.minion_req
+    s.router.master_resp[0] //= s.cfg_term.minion_resp
+    s.router.master_req[1]  //= s.mem_term.minion_req
+    s.router.master_resp[1] //= s.mem_term.minion_resp
+    s.mem_term.i_mem_raddr //= s.mem_raddr
+    s.mem_term.o_mem_rdata //= s.mem_rdata
+
+class SpiFrameDriver:
+  def __init__( s, th ):
+    s.th    = th
+    s.nbits   = 0
+    s.nframes = 0
+    s.resps   = []
+
+  # Pull at the start of the frame and push at the end of the frame
+  def frame( s, nbits, push_bits=None ):
+    th = s.th
+    th.pull.en @= 1
+    th.sim_eval_combinational()
+    assert not th.pull.msg.stall
+    if th.pull.msg.valid:
+      s.resps.append( th.pull.msg.payload.clone() )
+    th.sim_tick()
+    th.pull.en @= 0
+    th.sim_tick()
+    if push_bits is not None:
+      th.push.en  @= 1
+      th.push.msg @= push_bits
+      th.sim_tick()
+      th.push.en  @= 0
+    th.sim_tick()
+    th.sim_tick()
+    s.nbits   += nbits
+    s.nframes += 1
+
+  def write( s, addr, data ):
+    PushPullPkt = s.th.adapter.PushPullPkt
+    s.frame( PushPullPkt.nbits, PushPullPkt( 1, 0, CfgPkt( wr, addr, data ) ) )
+
+  def burst_write( s, addr, data_lst ):
+    PushPullPkt = s.th.adapter.PushPullPkt
+    BurstFrame  = s.th.adapter.BurstFrame
+    s.frame( PushPullPkt.nbits,
+             PushPullPkt( 1, 0, CfgPkt( bwr, addr, len( data_lst ) ) ) )
+    for data in data_lst:
+      # Leftover bits from previous frames sit above the short frame
+      bits = concat( Bits2(0b11), BurstFrame( 1, 0, data ).to_bits() )
+      s.frame( BurstFrame.nbits, zext( bits, PushPullPkt.nbits ) )
+
+  def drain( s, num_resps ):
+    PushPullPkt = s.th.adapter.PushPullPkt
+    while len( s.resps ) < num_resps:
+      s.frame( PushPullPkt.nbits, PushPullPkt( 0, 0, CfgPkt() ) )
+
+def load_table( use_burst, num_entries=64 ):
+  th = BurstTestHarness( CfgPkt, num_mem_regs=num_entries )
+  th.elaborate()
+  th.apply( DefaultPassGroup() )
+  th.sim_reset()
+
+  table = [ 0xc0de0000 + i for i in range( num_entries ) ]
+  drv   = SpiFrameDriver( th )
+  if use_burst:
+    drv.burst_write( 0x1000, table )
+    drv.drain( 1 )
+    assert drv.resps == [ CfgPkt( bwr, 0x1000, 0 ) ]
+  else:
+    for i, data in enumerate( table ):
+      drv.write( 0x1000 + i, data )
+    drv.drain( num_entries )
+
+  for i, data in enumerate( table ):
+    th.mem_raddr @= i
+    th.sim_eval_combinational()
+    assert th.mem_rdata == data
+
+  return drv.nbits, drv.nframes
+
+# The number of SPI bits is also the number of sclk cycles
+def test_burst_load_table():
+  nbits,       nframes       = load_table( use_burst=False )
+  burst_nbits, burst_nframes = load_table( use_burst=True  )
+  print( f'single writes: {nbits} SPI bits in {nframes} frames' )
+  print( f'burst write  : {burst_nbits} SPI bits in {burst_nframes} frames' )
+  # 34-bit data frames instead of 52-bit request frames, and a single
+  # response to drain
+  assert burst_nbits < 0.7 * nbits
+
+def test_burst_then_single():
+  th = BurstTestHarness( CfgPkt, num_mem_regs=16 )
+  th.elaborate()
+  th.apply( DefaultPassGroup() )
+  th.sim_reset()
+
+  drv = SpiFrameDriver( th )
+  drv.burst_write( 0x0000, [ 0xdeadbeef, 0xcafef00d ] )
+  drv.burst_write( 0x1004, [] )
+  drv.write( 0x1003, 0xc001c0de )
+  drv.burst_write( 0x1002, [ 0xbadbed00 ] )
+  drv.drain( 4 )
+  assert drv.resps == [ CfgPkt( bwr, 0x0000, 0 ), CfgPkt( bwr, 0x1004, 0 ),
+                        CfgPkt( wr,  0x1003, 0 ), CfgPkt( bwr, 0x1002, 0 ) ]
+  assert th.cfg_term.o_config[0] == 0xdeadbeef
+  assert th.cfg_term.o_config[1] == 0xcafef00d
+  for addr, data in [ (2, 0xbadbed00), (3, 0xc001c0de) ]:
+    th.mem_raddr @= addr
+    th.sim_eval_combinational()
+    assert th.mem_rdata == data
+
+#-------------------------------------------------------------------------
+# Credits
+#-------------------------------------------------------------------------
+
+def check_credits( m, credits, pending ):
+  m.sim_eval_combinational()
+  assert m.pull.msg.credits == credits
+  assert m.pull.msg.pending == pending
+
+def test_credits():
+  dut = PushPull2ReqRespAdapter( CfgPkt, num_entries=4, credits=True )
+  dut.elaborate()
+  dut.apply( DefaultPassGroup(linetrace=True) )
+  dut.sim_reset()
+
+  dut.req.rdy @= b1(0)
+  check_credits( dut, 4, 0 )
+  for i in range( 4 ):
+    do_push( dut, 1, 0, CfgPkt(wr, i, i) )
+    check_credits( dut, 3-i, 0 )
+
+  dut.req.rdy @= b1(1)
+  dut.sim_tick()
+  check_credits( dut, 1, 0 )
+  for i in range( 3 ):
+    dut.sim_tick()
+  check_credits( dut, 4, 0 )
+
+  for i in range( 3 ):
+    do_resp( dut, CfgPkt(wr, i, 0) )
+  check_credits( dut, 4, 3 )
+  for i in range( 3 ):
+    check_pull_msg( dut, 1, 0, CfgPkt(wr, i, 0) )
+    check_credits( dut, 4, 2-i )
+
+#-------------------------------------------------------------------------
+# Credit throughput
+#-------------------------------------------------------------------------
+# The terminal sits behind a BurstyGate that blocks requests for
+# stall_cycles after every period requests.
+# Each frame lasts frame_cycles cycles, pulls at the start and pushes at
+# the end. The polling host keeps one request outstanding while the
+# credit host pushes whenever the pull of the frame reports a credit.
+
+class CreditTestHarness( Component ):
+  def construct( s, Cfg, num_entries, credits, period, stall_cycles ):
+    s.adapter  = PushPull2ReqRespAdapter( Cfg, num_entries, credits )
+    s.gate     = BurstyGate( Cfg, period, stall_cycles )
+    s.terminal = ConfigTerminal( Cfg, num_config_regs=4, num_status_regs=0 )
+
+    s.push = PushInIfc ( s.adapter.PushPullPkt )
+    s.pull = PullOutIfc( s.adapter.PushPullPkt )
+
+    s.push //= s.adapter.push
+    s.pull //= s.adapter.pull
+    s.adapter.req  //= s.gate.istream
+    s.gate.ostream //= s.terminal.minion_req
+    s.adapter.resp //= s.terminal.minion_resp
+
+def run_credit_host( num_entries, credits, num_reqs, frame_cycles=16,
+                     period=32, stall_cycles=512 ):
+  th = CreditTestHarness( CfgPkt, num_entries, credits, period, stall_cycles )
+  th.elaborate()
+  th.apply( DefaultPassGroup() )
+  th.sim_reset()
+  PushPullPkt = th.adapter.PushPullPkt
+
+  reqs  = [ CfgPkt( wr, i % 4, i ) for i in range( num_reqs ) ]
+  resps = []
+  outstanding = 0
+  while len( resps ) < num_reqs:
+    assert th.sim_cycle_count() < 100 * num_reqs * frame_cycles
+    th.pull.en @= 1
+    th.sim_eval_combinational()
+    if th.pull.msg.valid:
+      resps.append( th.pull.msg.payload.clone() )
+      outstanding -= 1
+    if credits:
+      can_push = th.pull.msg.credits > 0
+      assert th.pull.msg.stall == ( not can_push )
+    else:
+      can_push = outstanding == 0
+      assert not th.pull.msg.stall
+    th.sim_tick()
+    th.pull.en @= 0
+
+    for _ in range( frame_cycles - 2 ):
+      th.sim_tick()
+
+    th.push.en @= 1
+    if reqs and can_push:
+      th.push.msg @= PushPullPkt( 1, 0, payload=reqs.pop( 0 ) )
+      outstanding += 1
+    else:
+      th.push.msg @= PushPullPkt( 0, 0, payload=CfgPkt() )
+    th.sim_tick()
+    th.push.en @= 0
+
+  assert resps == [ CfgPkt( wr, i % 4, 0 ) for i in range( num_reqs ) ]
+  return th.sim_cycle_count()
+
+# Requests per second at a 100 MHz core clock
+def test_credit_throughput():
+  num_reqs = 128
+  results  = {}
+  ncycles  = run_credit_host( 2, False, num_reqs )
+  print( f'polling           : {num_reqs * 100e6 / ncycles:10.0f} requests/s' )
+  for num_entries in [ 2, 4, 16, 64 ]:
+    results[num_entries] = run_credit_host( num_entries, True, num_reqs )
+    print( f'credits, depth {num_entries:2}: '
+           f'{num_reqs * 100e6 / results[num_entries]:10.0f} requests/s' )
+
+  assert results[2]  < 0.75 * ncycles
+  assert results[16] < 0.9 * results[2]
+  assert results[64] < 0.9 * results[16]
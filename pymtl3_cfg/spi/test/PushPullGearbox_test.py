@@ -0,0 +1,142 @@
+'''
+==========================================================================
+PushPullGearbox_test.py
+==========================================================================
+Unit tests for PushPullGearbox.
+'''
+import pytest
+
+from pymtl3 import *
+from ..PushPullGearbox import PushPullGearbox, mk_packed_cfg_pkt_type
+from ..PushPull2ReqRespAdapter import PushPull2ReqRespAdapter
+from ...ifcs import PullOutIfc, PushInIfc
+from ...ifcs.msg_types import CfgType, mk_cfg_pkt_type
+from ...terminal.ConfigTerminal import ConfigTerminal
+
+#-------------------------------------------------------------------------
+# Local parameters
+#-------------------------------------------------------------------------
+
+wr = CfgType.WRITE
+rd = CfgType.READ
+
+#-------------------------------------------------------------------------
+# TestHarness
+#-------------------------------------------------------------------------
+# gearbox -> adapter -> config terminal with 4 config registers
+
+class TestHarness( Component ):
+  def construct( s, Cfg, word_nbits ):
+    s.gearbox  = PushPullGearbox( Cfg, word_nbits )
+    s.adapter  = PushPull2ReqRespAdapter( Cfg )
+    s.terminal = ConfigTerminal( Cfg, num_config_regs=4, num_status_regs=0 )
+
+    s.word_push = PushInIfc ( s.gearbox.WordType )
+    s.word_pull = PullOutIfc( s.gearbox.WordType )
+
+    s.word_push //= s.gearbox.word_push
+    s.word_pull //= s.gearbox.word_pull
+    s.gearbox.push //= s.adapter.push
+    s.gearbox.pull //= s.adapter.pull
+    s.adapter.req  //= s.terminal.minion_req
+    s.adapter.resp //= s.terminal.minion_resp
+
+  def line_trace( s ):
+    return f'{s.gearbox.line_trace()} > {s.terminal.line_trace()}'
+
+# Streams one PushPullPkt per frame as the SPI minion would in streaming
+# mode: each word is pulled before it is pushed.
+class WordDriver:
+  def __init__( s, th, Cfg ):
+    s.th     = th
+    s.Cfg    = Cfg
+    s.nbits  = 0
+    s.resps  = []
+
+  def frame( s, valid, pkt ):
+    th, gb = s.th, s.th.gearbox
+    bits = zext( gb.PushPullPkt( valid, 0, pkt ).to_bits(), gb.frame_nbits )
+    pull_bits = 0
+    for i in reversed( range( gb.nwords ) ):
+      th.word_pull.en @= 1
+      th.sim_eval_combinational()
+      pull_bits = ( pull_bits << gb.word_nbits ) | int( th.word_pull.msg )
+      th.sim_tick()
+      th.word_pull.en @= 0
+      th.word_push.en  @= 1
+      th.word_push.msg @= bits[i*gb.word_nbits:(i+1)*gb.word_nbits]
+      th.sim_tick()
+      th.word_push.en @= 0
+      th.sim_tick()
+    s.nbits += gb.frame_nbits
+
+    resp = gb.PushPullPkt.from_bits(
+             trunc( mk_bits( gb.frame_nbits )( pull_bits ),
+                    gb.PushPullPkt.nbits ) )
+    assert not resp.stall
+    if resp.valid:
+      s.resps.append( resp.payload )
+
+  def send( s, type_, addr, data ):
+    s.frame( 1, s.Cfg( type_, addr, data ) )
+
+  def drain( s, num_resps ):
+    while len( s.resps ) < num_resps:
+      s.frame( 0, s.Cfg() )
+
+def run_gearbox( Cfg, word_nbits ):
+  th = TestHarness( Cfg, word_nbits )
+  th.elaborate()
+  th.apply( DefaultPassGroup() )
+  th.sim_reset()
+
+  data_mask = ( 1 << Cfg.get_field_type( 'data' ).nbits ) - 1
+  data = [ 0xdeadbeef & data_mask, 0xc001cafe & data_mask,
+           0x12345678 & data_mask, 0x0badf00d & data_mask ]
+
+  drv = WordDriver( th, Cfg )
+  for i, d in enumerate( data ):
+    drv.send( wr, i, d )
+  for i in range( len( data ) ):
+    drv.send( rd, i, 0 )
+  drv.drain( 2 * len( data ) )
+
+  assert drv.resps[:len( data )] == [ Cfg( wr, i, 0 )
+                                      for i in range( len( data ) ) ]
+  assert drv.resps[len( data ):] == [ Cfg( rd, i, d )
+                                      for i, d in enumerate( data ) ]
+  for i, d in enumerate( data ):
+    assert th.terminal.o_config[i] == d
+
+#-------------------------------------------------------------------------
+# Tests
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "word_nbits", [ 8, 16, 32 ] )
+def test_round_trip( word_nbits ):
+  run_gearbox( mk_cfg_pkt_type(), word_nbits )
+
+def test_packed_cfg_pkt_type():
+  Cfg = mk_packed_cfg_pkt_type( 8, 4, data_nbits=16 )
+  assert Cfg.get_field_type( 'addr' ).nbits == 12
+  gb = PushPullGearbox( Cfg, 8 )
+  gb.elaborate()
+  assert gb.nwords == 4
+  run_gearbox( Cfg, 8 )
+
+# Checks the number of SPI bits per frame for a few packet formats
+def test_frame_nbits():
+  formats = [
+    ( 'default CfgPkt, 8-bit words ', mk_cfg_pkt_type(),           8, 52, 56 ),
+    ( 'default CfgPkt, 16-bit words', mk_cfg_pkt_type(),          16, 52, 64 ),
+    ( '6-bit addr, 16-bit data     ', mk_cfg_pkt_type( 2, 6, 16 ), 8, 26, 32 ),
+    ( 'packed 12-bit addr, 16-bit  ', mk_packed_cfg_pkt_type( 8, 4,
+                                        data_nbits=16 ),           8, 32, 32 ),
+  ]
+  for name, Cfg, word_nbits, pkt_nbits, frame_nbits in formats:
+    gb = PushPullGearbox( Cfg, word_nbits )
+    gb.elaborate()
+    print( f'{name}: {gb.PushPullPkt.nbits} packet bits, '
+           f'{gb.frame_nbits} SPI bits per frame' )
+    assert gb.PushPullPkt.nbits == pkt_nbits
+    assert gb.frame_nbits       == frame_nbits
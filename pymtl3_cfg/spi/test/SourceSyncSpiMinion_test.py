@@ -0,0 +1,303 @@
+'''
+==========================================================================
+SourceSyncSpiMinion_test.py
+==========================================================================
+Unit tests for SourceSyncSpiMinion.
+
+The three halves are simulated as separate models, each ticked by its own
+clock: the Rx half on the rising edges of sclk, the Tx half on the
+falling edges and the core half, or a harness around it, on the core
+clock. Time is counted in integer units: the core clock ticks every
+core_period units and every sclk phase lasts sclk_half_period units while
+cs is low. The cross-domain ports are copied between the models before
+each clock edge.
+'''
+
+import pytest
+
+from pymtl3 import *
+
+from ...ifcs.msg_types import CfgType
+from ...terminal.ConfigTerminal import ConfigTerminal
+from ..PushPull2ReqRespAdapter import PushPull2ReqRespAdapter
+from ..SourceSyncSpiMinion import (SourceSyncSpiMinion,
+                                   SourceSyncSpiMinionRx,
+                                   SourceSyncSpiMinionTx,
+                                   SourceSyncSpiMinionCore)
+from .SpiMinion_test import CfgPkt, PushPullPkt, run_spi_master
+
+#-------------------------------------------------------------------------
+# Co-simulation harness
+#-------------------------------------------------------------------------
+# core_top is the model ticked by the core clock. It is either a
+# SourceSyncSpiMinionCore or a harness exposing the core's cross-domain
+# ports. Words pulled by the core are taken from pull_words and pushed
+# words are recorded. With pull_words=None, core_top drives the core's
+# push/pull interface itself. cs stays high for cs_gap core cycles between
+# windows.
+
+class SourceSyncTestHarness:
+  def __init__( s, nbits, core_top, core_period, sclk_half_period,
+                num_entries=2, cs_gap=4, pull_words=None ):
+    s.nbits            = nbits
+    s.num_entries      = num_entries
+    s.core_period      = core_period
+    s.sclk_half_period = sclk_half_period
+    s.cs_gap           = cs_gap
+    s.pull_words       = None if pull_words is None else list( pull_words )
+    s.push_words       = []
+    s.push_parities    = []
+    s.miso_words       = []
+    s.time             = 0
+
+    s.rx_m = SourceSyncSpiMinionRx( nbits, num_entries )
+    s.tx_m = SourceSyncSpiMinionTx( nbits )
+    for m in [ s.rx_m, s.tx_m ]:
+      m.elaborate()
+      m.apply( DefaultPassGroup() )
+    s.core_top = core_top
+
+    s.set_cs( 1 )
+    s.rx_m.mosi @= 0
+    if s.pull_words is not None:
+      s.core_top.pull.msg @= 0
+    s.cross()
+    s.rx_m.sim_reset()
+    s.tx_m.sim_reset()
+    s.core_top.sim_reset()
+
+  def set_cs( s, cs ):
+    s.rx_m.cs @= cs
+    s.tx_m.cs @= cs
+
+  # Copy the cross-domain ports between the halves
+  def cross( s ):
+    rx_m, tx_m, core = s.rx_m, s.tx_m, s.core_top
+    for i in range( s.num_entries ):
+      core.rx_entries[i] @= rx_m.rx_entries[i]
+    core.rx_wptr     @= rx_m.rx_wptr
+    rx_m.rx_rptr     @= core.rx_rptr
+    core.rx_overflow @= rx_m.rx_overflow
+    tx_m.tx_data     @= core.tx_data
+    for m in [ rx_m, tx_m, s.core_top ]:
+      m.sim_eval_combinational()
+
+  def core_tick( s ):
+    core = s.core_top
+    if s.pull_words is not None:
+      core.pull.msg @= s.pull_words[0] if s.pull_words else 0
+      s.core_top.sim_eval_combinational()
+      if core.pull.en:
+        s.pull_words.pop( 0 )
+      if core.push.en:
+        s.push_words.append( int( core.push.msg ) )
+        s.push_parities.append( int( core.parity ) )
+    s.core_top.sim_tick()
+
+  # Advance time by nunits, ticking the core clock in between
+  def advance( s, nunits ):
+    for _ in range( nunits ):
+      s.time += 1
+      if s.time % s.core_period == 0:
+        s.cross()
+        s.core_tick()
+
+  # Rising edge of sclk. Returns the miso bit sampled by the master.
+  def sclk_rise( s, mosi ):
+    s.cross()
+    s.rx_m.mosi @= mosi
+    s.rx_m.sim_eval_combinational()
+    miso = int( s.tx_m.miso )
+    s.rx_m.sim_tick()
+    return miso
+
+  def sclk_fall( s ):
+    s.cross()
+    s.tx_m.sim_tick()
+
+  # One cs-low window carrying one word
+  def window( s, word ):
+    s.set_cs( 0 )
+    miso_word = 0
+    for i in reversed( range( s.nbits ) ):
+      s.advance( s.sclk_half_period )
+      miso_word = ( miso_word << 1 ) | s.sclk_rise( ( word >> i ) & 1 )
+      s.advance( s.sclk_half_period )
+      s.sclk_fall()
+    s.advance( s.sclk_half_period )
+    s.set_cs( 1 )
+    s.advance( s.cs_gap * s.core_period )
+    s.miso_words.append( miso_word )
+
+  # Only tick the core clock, e.g., to drain the receive FIFO
+  def idle( s, ncycles=8 ):
+    s.advance( ncycles * s.core_period )
+
+def run_source_sync( nbits, push_words, pull_words, core_period,
+                     sclk_half_period, num_entries=2, cs_gap=4 ):
+  core = SourceSyncSpiMinionCore( nbits, num_entries )
+  core.elaborate()
+  core.apply( DefaultPassGroup() )
+  th = SourceSyncTestHarness( nbits, core, core_period,
+                              sclk_half_period, num_entries, cs_gap,
+                              pull_words )
+  th.idle()
+  for word in push_words:
+    th.window( word )
+  th.idle()
+
+  assert th.push_words    == push_words
+  assert th.push_parities == [ bin( w ).count( '1' ) % 2 for w in push_words ]
+  assert th.miso_words    == pull_words[:len( push_words )]
+  assert core.overflow    == 0
+  return th.time
+
+#-------------------------------------------------------------------------
+# Tests
+#-------------------------------------------------------------------------
+
+def test_basic():
+  push_words = [ 0xa5, 0x3c, 0xff, 0x00 ]
+  pull_words = [ 0x12, 0x34, 0x56, 0x78, 0x9a ]
+  run_source_sync( 8, push_words, pull_words, core_period=4,
+                   sclk_half_period=2 )
+
+# 2 * sclk_half_period / core_period is the sclk period in core cycles
+@pytest.mark.parametrize( "core_period, sclk_half_period", [
+  ( 2, 8 ), ( 4, 3 ), ( 3, 2 ), ( 4, 2 ), ( 8, 3 ), ( 4, 1 ), ( 6, 1 ),
+])
+def test_clock_ratios( core_period, sclk_half_period ):
+  push_words = [ ( 0xdead << 16 ) + i for i in range( 8 ) ]
+  pull_words = [ ( 0xcafe << 16 ) + i for i in range( 9 ) ]
+  run_source_sync( 32, push_words, pull_words, core_period,
+                   sclk_half_period, num_entries=4 )
+
+# The core clock is stopped while three words arrive, so the third one
+# does not fit into the receive FIFO
+def test_overflow():
+  core = SourceSyncSpiMinionCore( 8, 2 )
+  core.elaborate()
+  core.apply( DefaultPassGroup() )
+  th = SourceSyncTestHarness( 8, core, core_period=10**6,
+                              sclk_half_period=1, cs_gap=0,
+                              pull_words=[ 0 ] * 4 )
+  for word in [ 0x11, 0x22, 0x33 ]:
+    th.window( word )
+  assert th.rx_m.rx_overflow == 1
+
+  th.core_period = 2
+  th.idle()
+  assert th.push_words == [ 0x11, 0x22 ]
+  assert core.overflow == 1
+
+# The wrapper simulates on a single clock, which is enough to check that
+# the halves are wired up
+def test_wrapper():
+  dut = SourceSyncSpiMinion( PushPullPkt.nbits )
+  dut.apply( DefaultPassGroup() )
+  dut.spi_min.cs   @= 1
+  dut.spi_min.sclk @= 0
+  dut.spi_min.mosi @= 0
+  dut.pull.msg     @= 0
+  dut.sim_reset()
+  assert dut.pull.en  == 1
+  assert dut.push.en  == 0
+  assert dut.overflow == 0
+
+# Finds the shortest sclk period, in core clock cycles, each minion works
+# with. The oversampling SpiMinion needs several core cycles per sclk
+# phase while the source-synchronous minion works with sclk faster than
+# the core clock.
+def test_min_sclk_period():
+  push_words = [ 0xa5, 0x3c, 0xff, 0x00, 0x81, 0x7e ]
+  pull_words = [ 0x12, 0x34, 0x56, 0x78, 0x9a, 0xbc, 0xde ]
+
+  oversampled = None
+  for half_period in range( 1, 8 ):
+    try:
+      run_spi_master( 8, False, 1, push_words, pull_words,
+                      half_period=half_period )
+    except AssertionError:
+      continue
+    oversampled = 2 * half_period
+    break
+
+  source_sync = None
+  for sclk_half_period in [ 4, 2, 1 ]:
+    try:
+      run_source_sync( 8, push_words, pull_words, 4, sclk_half_period )
+    except AssertionError:
+      break
+    source_sync = 2 * sclk_half_period / 4
+
+  print( f'SpiMinion           : sclk period >= {oversampled} core cycles' )
+  print( f'SourceSyncSpiMinion : sclk period >= {source_sync} core cycles' )
+  assert source_sync is not None and source_sync < 1
+  assert oversampled is None or oversampled > 1
+
+#-------------------------------------------------------------------------
+# Requests through PushPull2ReqRespAdapter
+#-------------------------------------------------------------------------
+
+class CoreTestHarness( Component ):
+  def construct( s, num_entries=2 ):
+    s.minion   = SourceSyncSpiMinionCore( PushPullPkt.nbits, num_entries )
+    s.adapter  = PushPull2ReqRespAdapter( CfgPkt )
+    s.terminal = ConfigTerminal( CfgPkt, num_config_regs=2,
+                                 num_status_regs=0 )
+
+    s.rx_entries  = [ InPort( mk_bits( PushPullPkt.nbits ) ) for _ in range( num_entries ) ]
+    s.rx_wptr     = InPort ( s.minion.fifo.PtrType )
+    s.rx_rptr     = OutPort( s.minion.fifo.PtrType )
+    s.rx_overflow = InPort()
+    s.tx_data     = OutPort( mk_bits( PushPullPkt.nbits ) )
+    s.overflow    = OutPort()
+
+    for i in range( num_entries ):
+      s.minion.rx_entries[i] //= s.rx_entries[i]
+    s.minion.rx_wptr     //= s.rx_wptr
+    s.rx_rptr            //= s.minion.rx_rptr
+    s.minion.rx_overflow //= s.rx_overflow
+    s.tx_data            //= s.minion.tx_data
+    s.overflow           //= s.minion.overflow
+
+    s.minion.push.en //= s.adapter.push.en
+    s.minion.pull.en //= s.adapter.pull.en
+    s.adapter.req    //= s.terminal.minion_req
+    s.adapter.resp   //= s.terminal.minion_resp
+
+    @update
+    def up_push_pull_msg():
+      s.adapter.push.msg @= s.minion.push.msg
+      s.minion.pull.msg  @= s.adapter.pull.msg
+
+@pytest.mark.parametrize( "core_period, sclk_half_period", [
+  ( 2, 4 ), ( 4, 1 ),
+])
+def test_adapter( core_period, sclk_half_period ):
+  wr, rd = CfgType.WRITE, CfgType.READ
+  reqs = [ CfgPkt( wr, 0, 0xdeadbeef ), CfgPkt( wr, 1, 0xc001cafe ),
+           CfgPkt( rd, 0, 0 ), CfgPkt( rd, 1, 0 ),
+           CfgPkt( wr, 0, 0x12345678 ), CfgPkt( rd, 0, 0 ) ]
+  resps = [ CfgPkt( wr, 0, 0 ), CfgPkt( wr, 1, 0 ),
+            CfgPkt( rd, 0, 0xdeadbeef ), CfgPkt( rd, 1, 0xc001cafe ),
+            CfgPkt( wr, 0, 0 ), CfgPkt( rd, 0, 0x12345678 ) ]
+
+  top = CoreTestHarness()
+  top.elaborate()
+  top.apply( DefaultPassGroup() )
+  th = SourceSyncTestHarness( PushPullPkt.nbits, top, core_period,
+                              sclk_half_period )
+  th.idle()
+  for req in reqs:
+    th.window( int( PushPullPkt( 1, 0, req ).to_bits() ) )
+  for _ in range( 3 ):
+    th.window( 0 )
+
+  pulled = [ PushPullPkt.from_bits( mk_bits( PushPullPkt.nbits )( word ) )
+             for word in th.miso_words ]
+  assert not any( pkt.stall for pkt in pulled )
+  assert [ pkt.payload for pkt in pulled if pkt.valid ] == resps
+  assert top.terminal.o_config[0] == 0x12345678
+  assert top.terminal.o_config[1] == 0xc001cafe
+  assert top.overflow == 0
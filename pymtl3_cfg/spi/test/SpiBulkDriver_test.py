@@ -0,0 +1,136 @@
+'''
+==========================================================================
+SpiBulkDriver_test.py
+==========================================================================
+Test cases for SpiBulkDriver, and a benchmark against driving the pins
+cycle by cycle.
+'''
+import time
+
+import pytest
+
+from pymtl3 import *
+
+from ...ifcs.msg_types import CfgType
+from .IdleFastForward_test import CfgPkt, SpiHost, TestHarness
+
+np = pytest.importorskip( 'numpy' )
+
+from ..SpiBulkDriver import SpiBulkDriver
+
+wr = CfgType.WRITE
+rd = CfgType.READ
+
+def mk_harness( resp_delay=0, nlanes=1 ):
+  th = TestHarness( resp_delay, nlanes )
+  th.elaborate()
+  th.apply( DefaultPassGroup() )
+  th.spi_min.cs @= 1
+  th.sim_reset()
+  return th
+
+# Writes num_regs registers and reads them back. Every request gets its
+# response in the frame of the next request.
+def mk_script( num_regs ):
+  return ( [ CfgPkt( wr, i % 4, 0xc0de0000 + i ) for i in range( num_regs ) ] +
+           [ CfgPkt( rd, i % 4, 0 ) for i in range( num_regs ) ] +
+           [ CfgPkt( rd, 0, 0 ) ] )
+
+# Reads miso before every tick like the t() helper of SpiMinion_test,
+# which needs a sim_eval_combinational per cycle
+
+class CheckingSpiHost( SpiHost ):
+  def pins( s, cs, sclk, mosi ):
+    s.th.spi_min.cs   @= cs
+    s.th.spi_min.sclk @= sclk
+    s.th.spi_min.mosi @= mosi
+    s.th.sim_eval_combinational()
+    s.miso = int( s.th.spi_min.miso )
+    s.th.sim_tick()
+
+def run_per_cycle( pkts, resp_delay=0, HostType=SpiHost ):
+  th   = mk_harness( resp_delay )
+  host = HostType( th, fast_forward=False )
+  for pkt in pkts:
+    host.frame( pkt )
+  configs = [ int( th.terminal.o_config[i] ) for i in range( 4 ) ]
+  return host.resps, configs, th.sim_cycle_count()
+
+def run_bulk( pkts, resp_delay=0, nlanes=1 ):
+  th  = mk_harness( resp_delay, nlanes )
+  drv = SpiBulkDriver( th, th.spi_min, th.adapter.PushPullPkt.nbits,
+                       nlanes=nlanes )
+  resps, stalls = drv.transfer_pkts( th.adapter.PushPullPkt, pkts )
+  # No request was dropped
+  assert not any( stalls )
+  configs = [ int( th.terminal.o_config[i] ) for i in range( 4 ) ]
+  return resps, configs, th.sim_cycle_count()
+
+#-------------------------------------------------------------------------
+# Tests
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "nbits, nlanes", [
+  ( 8, 1 ), ( 52, 1 ), ( 52, 4 ), ( 100, 2 ),
+])
+def test_encode_decode( nbits, nlanes ):
+  drv   = SpiBulkDriver( None, None, nbits, nlanes=nlanes )
+  words = [ 0, ( 1 << nbits ) - 1, 0xa5a5a5a5a5a5a5a5a5a5a5a5a5 % ( 1 << nbits ) ]
+  cs, sclk, mosi = drv.encode( words )
+  assert len( cs ) == len( sclk ) == len( mosi ) == 3 * drv.frame_len
+
+  # Sampling mosi where miso is sampled gives back the words
+  sample_at = ( np.arange( 3 )[:, None] * drv.frame_len +
+                drv.frame_sample[None, :] ).ravel()
+  assert drv.decode( mosi[sample_at] ) == words
+
+  # mosi only changes while sclk is low
+  changes = np.flatnonzero( mosi[1:] != mosi[:-1] ) + 1
+  assert not sclk[changes].any()
+
+@pytest.mark.parametrize( "resp_delay", [ 0, 10 ] )
+def test_same_as_per_cycle( resp_delay ):
+  pkts = mk_script( 4 )
+  resps, configs, ncycles = run_per_cycle( pkts, resp_delay )
+  expected = ( [ CfgPkt( wr, i, 0 ) for i in range( 4 ) ] +
+               [ CfgPkt( rd, i, 0xc0de0000 + i ) for i in range( 4 ) ] )
+  # Delayed responses miss the frame of the next request and come one
+  # frame later, so the response of the last read is still queued
+  if resp_delay == 0:
+    assert resps == expected
+  else:
+    assert resps == expected[:-1]
+  assert configs == [ 0xc0de0000 + i for i in range( 4 ) ]
+
+  assert run_bulk( pkts, resp_delay ) == ( resps, configs, ncycles )
+
+@pytest.mark.parametrize( "nlanes", [ 2, 4 ] )
+def test_lanes( nlanes ):
+  resps, configs, _ = run_bulk( mk_script( 4 ), nlanes=nlanes )
+  assert resps == (
+    [ CfgPkt( wr, i, 0 ) for i in range( 4 ) ] +
+    [ CfgPkt( rd, i, 0xc0de0000 + i ) for i in range( 4 ) ] )
+  assert configs == [ 0xc0de0000 + i for i in range( 4 ) ]
+
+#-------------------------------------------------------------------------
+# Benchmarks
+#-------------------------------------------------------------------------
+# The same boot script driven cycle by cycle like in SpiMinion_test and
+# in bulk. Run with -m benchmark -s to see the results.
+
+@pytest.mark.benchmark
+def test_sim_speed():
+  pkts = mk_script( 16 )
+  results = {}
+  for name, run in [
+    ( 'per cycle', lambda pkts: run_per_cycle( pkts, HostType=CheckingSpiHost ) ),
+    ( 'bulk     ', run_bulk ),
+  ]:
+    start = time.perf_counter()
+    resps, configs, ncycles = run( pkts )
+    elapsed = time.perf_counter() - start
+    results[name] = ( resps, configs, ncycles, elapsed )
+    print( f'{name}: {len( pkts )} frames, {ncycles} cycles, '
+           f'{elapsed:.2f}s, {ncycles/elapsed:.0f} cycles/s' )
+
+  assert results['bulk     '][:3] == results['per cycle'][:3]
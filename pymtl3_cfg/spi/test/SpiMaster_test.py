@@ -0,0 +1,232 @@
+'''
+==========================================================================
+SpiMaster_test.py
+==========================================================================
+Test cases for SpiMaster, and a benchmark of the throughput of the whole
+SPI config path for different clock dividers.
+'''
+import time
+
+import pytest
+
+from pymtl3 import *
+from pymtl3.stdlib.stream import StreamSourceFL
+from pymtl3.stdlib.test_utils import config_model_with_cmdline_opts
+
+from ...ifcs.msg_types import CfgType, mk_cfg_pkt_type
+from ...router.ReqRespRouter import ReqRespRouter
+from ...router.test.ReqRespRouter_test import TestRoutingLogic
+from ...terminal.ConfigTerminal import ConfigTerminal
+from ..PushPull2ReqRespAdapter import (PushPull2ReqRespAdapter,
+                                      mk_push_pull_bitstruct)
+from ..SpiMaster import SpiMaster
+from ..SpiMinion import SpiMinion
+
+CfgPkt      = mk_cfg_pkt_type( type_nbits=2, addr_nbits=16, data_nbits=32 )
+PushPullPkt = mk_push_pull_bitstruct( CfgPkt )
+wr = CfgType.WRITE
+rd = CfgType.READ
+
+#-------------------------------------------------------------------------
+# Pin-level tests
+#-------------------------------------------------------------------------
+# The master talks to an ideal minion that samples mosi on the rising
+# edge of sclk and shifts out the next bits of miso right on the falling
+# edge.
+
+def run_pins( dut, words, miso_words ):
+  nlanes, nsyms = dut.nlanes, dut.nsyms
+  mask = ( 1 << nlanes ) - 1
+
+  dut.spi_ms.miso @= 0
+  dut.recv.val    @= 0
+  dut.send.rdy    @= 1
+  dut.sim_reset()
+
+  sent  = 0
+  rx    = []      # words received by the minion
+  tx    = []      # words received by the master
+  cs_runs = []    # cycles cs stayed low or high, starting with high
+  run   = 0
+  bits  = 0
+  sym   = 0
+  prev  = ( 1, 0 )
+  for _ in range( 2 * len( words ) * ( ( 2*nsyms + 2 ) * 16 + 16 ) ):
+    if len( rx ) == len( tx ) == len( words ):
+      break
+
+    cs, sclk, mosi = int( dut.spi_ms.cs ), int( dut.spi_ms.sclk ), \
+                     int( dut.spi_ms.mosi )
+    if cs != prev[0]:
+      cs_runs.append( run )
+      run = 0
+    run += 1
+
+    if cs:
+      if not prev[0]:
+        rx.append( bits )
+      bits = 0
+      sym  = 0
+    elif sclk and not prev[1]:
+      bits = ( bits << nlanes ) | mosi
+    elif not sclk and prev[1]:
+      sym += 1
+    prev = ( cs, sclk )
+
+    miso = miso_words[ len( rx ) ] if len( rx ) < len( miso_words ) else 0
+    if not cs and sym < nsyms:
+      dut.spi_ms.miso @= ( miso >> ( ( nsyms - 1 - sym ) * nlanes ) ) & mask
+    else:
+      dut.spi_ms.miso @= 0
+
+    dut.recv.val @= sent < len( words )
+    if sent < len( words ):
+      dut.recv.msg @= words[sent]
+      if dut.recv.rdy:
+        sent += 1
+    if dut.send.val:
+      tx.append( int( dut.send.msg ) )
+
+    dut.sim_tick()
+
+  return rx, tx, cs_runs
+
+@pytest.mark.parametrize( "nbits, nlanes, half_period, cs_gap", [
+  ( 8, 1, 3, 1 ), ( 8, 1, 4, 8 ), ( 8, 2, 5, 3 ), ( 52, 1, 4, 8 ),
+  ( 52, 4, 3, 2 ),
+])
+def test_pins( cmdline_opts, nbits, nlanes, half_period, cs_gap ):
+  dut = SpiMaster( nbits, half_period, cs_gap, nlanes )
+  dut = config_model_with_cmdline_opts( dut, cmdline_opts, duts=[] )
+  dut.apply( DefaultPassGroup() )
+
+  mask  = ( 1 << nbits ) - 1
+  words = [ 0xa5a5a5a5a5a5a5 & mask, 0, mask, 0x123456789abcde & mask ]
+  miso  = [ ~w & mask for w in words ]
+  rx, tx, cs_runs = run_pins( dut, words, miso )
+  assert rx == words
+  assert tx == miso
+
+  # Every window lasts the same number of cycles, and back-to-back
+  # windows are cs_gap cycles apart
+  nsyms = nbits // nlanes
+  assert cs_runs[1::2] == [ ( 2*nsyms + 2 ) * half_period ] * len( words )
+  assert cs_runs[2::2] == [ cs_gap ] * ( len( words ) - 1 )
+
+#-------------------------------------------------------------------------
+# SPI config path
+#-------------------------------------------------------------------------
+# SpiMaster -> SpiMinion -> PushPull2ReqRespAdapter -> ReqRespRouter ->
+# ConfigTerminals. The master sends the PushPullPkt words of src, and the
+# words it receives are collected by the test.
+
+class TestHarness( Component ):
+  def construct( s, words, half_period=4, cs_gap=8, nlanes=1,
+                 num_terminals=4 ):
+    nbits = PushPullPkt.nbits
+
+    s.src       = StreamSourceFL( mk_bits( nbits ), words )
+    s.master    = SpiMaster( nbits, half_period, cs_gap, nlanes )
+    s.minion    = SpiMinion( nbits, nlanes=nlanes )
+    s.adapter   = PushPull2ReqRespAdapter( CfgPkt )
+    s.router    = ReqRespRouter( CfgPkt, Bits16, TestRoutingLogic,
+                                 num_terminals=num_terminals )
+    s.terminals = [ ConfigTerminal( CfgPkt, num_config_regs=1,
+                                    num_status_regs=0 )
+                    for _ in range( num_terminals ) ]
+
+    s.src.ostream     //= s.master.recv
+    s.master.send.rdy //= 1
+    s.master.spi_ms   //= s.minion.spi_min
+
+    s.minion.push.en //= s.adapter.push.en
+    s.minion.pull.en //= s.adapter.pull.en
+
+    @update
+    def up_push_pull_msg():
+      s.adapter.push.msg @= s.minion.push.msg
+      s.minion.pull.msg  @= s.adapter.pull.msg
+
+    s.adapter.req        //= s.router.minion_req
+    s.router.minion_resp //= s.adapter.resp
+    for i in range( num_terminals ):
+      s.router.master_req[i]     //= s.terminals[i].minion_req
+      s.terminals[i].minion_resp //= s.router.master_resp[i]
+
+  def line_trace( s ):
+    return f'{s.master.line_trace()} {s.adapter.line_trace()}'
+
+# Sends the packets followed by enough empty frames to pull all
+# responses. Returns the responses and the cycles at which the master
+# received the words.
+def run_path( pkts, half_period=4, cs_gap=8, nlanes=1, num_polls=4 ):
+  words = ( [ PushPullPkt( 1, 0, pkt ).to_bits() for pkt in pkts ] +
+            [ PushPullPkt( 0, 0, CfgPkt() ).to_bits() ] * num_polls )
+
+  th = TestHarness( words, half_period, cs_gap, nlanes )
+  th.elaborate()
+  th.apply( DefaultPassGroup() )
+  th.sim_reset()
+
+  resps  = []
+  cycles = []
+  while len( cycles ) < len( words ):
+    if th.master.send.val:
+      msg = PushPullPkt.from_bits( th.master.send.msg )
+      assert not msg.stall
+      if msg.valid:
+        resps.append( msg.payload )
+      cycles.append( th.sim_cycle_count() )
+    th.sim_tick()
+    assert th.sim_cycle_count() < 1000 * len( words ) * half_period
+
+  configs = [ int( t.o_config[0] ) for t in th.terminals ]
+  return resps, configs, cycles
+
+def mk_script( num_terminals=4 ):
+  pkts, resps = [], []
+  for i in range( num_terminals ):
+    pkts  += [ CfgPkt( wr, 0x1000 * i, 0xc0de0000 + i ) ]
+    resps += [ CfgPkt( wr, 0x1000 * i, 0 ) ]
+  for i in range( num_terminals ):
+    pkts  += [ CfgPkt( rd, 0x1000 * i, 0 ) ]
+    resps += [ CfgPkt( rd, 0x1000 * i, 0xc0de0000 + i ) ]
+  return pkts, resps
+
+@pytest.mark.parametrize( "half_period, cs_gap, nlanes", [
+  ( 3, 1, 1 ), ( 4, 8, 1 ), ( 8, 2, 1 ), ( 3, 8, 4 ),
+])
+def test_path( half_period, cs_gap, nlanes ):
+  pkts, ref = mk_script()
+  resps, configs, _ = run_path( pkts, half_period, cs_gap, nlanes )
+  key = lambda pkt: int( pkt.to_bits() )
+  assert sorted( resps, key=key ) == sorted( ref, key=key )
+  assert configs == [ 0xc0de0000 + i for i in range( 4 ) ]
+
+#-------------------------------------------------------------------------
+# Benchmarks
+#-------------------------------------------------------------------------
+# Throughput of the SPI config path for different clock dividers. The
+# master sends one word per window, so a transaction takes a window of
+# (2*nbits/nlanes + 2) * half_period + cs_gap cycles. Run with
+# -m benchmark -s to see the results.
+
+@pytest.mark.benchmark
+def test_sim_speed():
+  pkts, _ = mk_script()
+  nbits = PushPullPkt.nbits
+  for half_period in [ 3, 6, 12 ]:
+    for nlanes in [ 1, 4 ]:
+      start = time.perf_counter()
+      resps, configs, cycles = run_path( pkts, half_period, nlanes=nlanes )
+      elapsed = time.perf_counter() - start
+
+      window = ( 2 * nbits // nlanes + 2 ) * half_period + 8
+      assert len( resps ) == len( pkts )
+      assert configs == [ 0xc0de0000 + i for i in range( 4 ) ]
+      assert all( b - a == window for a, b in zip( cycles, cycles[1:] ) )
+
+      print( f'half_period {half_period:2}, {nlanes} lanes: '
+             f'{window} cycles/transaction, '
+             f'{1000/window:5.2f} transactions/kcycle, '
+             f'{cycles[-1]/elapsed:5.0f} cycles/s' )
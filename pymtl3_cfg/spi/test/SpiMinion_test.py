@@ -5,9 +5,16 @@ SPIMinionRTL_test.py
 Unit test for SPIMinionRTL.
 '''
 
+import pytest
+
 from pymtl3 import *
 from pymtl3.stdlib.test_utils import config_model_with_cmdline_opts
 
+from ...ifcs import SpiMinionIfc
+from ...ifcs.msg_types import CfgType, mk_cfg_pkt_type
+from ...terminal.ConfigTerminal import ConfigTerminal
+from ..PushPull2ReqRespAdapter import (PushPull2ReqRespAdapter,
+                                      mk_push_pull_bitstruct)
 from ..SpiMinion import SpiMinion
 
 def test_basic( cmdline_opts ):
@@ -142,3 +149,195 @@ def test_basic( cmdline_opts ):
   t(   0,  1,   1,    0,   0,   0,   0xBB,        0xAA)
   t(   0,  0,   1,    0,   0,   0,   0xBB,        '?' )
 
+
+#-------------------------------------------------------------------------
+# Streaming mode
+#-------------------------------------------------------------------------
+# A simple SPI master model. Each sclk phase lasts half_period cycles and
+# cs stays high for cs_gap cycles between windows. Words pulled by the
+# minion are taken from pull_msgs and the words sampled on miso are
+# returned along with the pushed words. With pull_msgs=None, dut is a
+# harness that only exposes spi_min and the model only drives the pins.
+
+class SpiMasterModel:
+  def __init__( s, dut, nbits, pull_msgs, half_period=4, cs_gap=8,
+                nlanes=1 ):
+    s.dut         = dut
+    s.nbits       = nbits
+    s.nlanes      = nlanes
+    s.nsclks      = 0
+    s.pull_msgs   = None if pull_msgs is None else list( pull_msgs )
+    s.half_period = half_period
+    s.cs_gap      = cs_gap
+    s.push_msgs   = []
+    s.miso_words  = []
+    s.cur_word    = 0
+    s.cur_nbits   = 0
+
+  def tick( s, cs, sclk, mosi ):
+    dut = s.dut
+    dut.spi_min.cs   @= cs
+    dut.spi_min.sclk @= sclk
+    dut.spi_min.mosi @= mosi
+    if s.pull_msgs is not None:
+      dut.pull.msg @= s.pull_msgs[0] if s.pull_msgs else 0
+      dut.sim_eval_combinational()
+      if dut.pull.en:
+        s.pull_msgs.pop( 0 )
+      if dut.push.en:
+        s.push_msgs.append( int( dut.push.msg ) )
+    dut.sim_tick()
+
+  def window( s, words ):
+    for _ in range( s.half_period ):
+      s.tick( 0, 0, 0 )
+    for word in words:
+      for i in reversed( range( 0, s.nbits, s.nlanes ) ):
+        bits = ( word >> i ) & ( ( 1 << s.nlanes ) - 1 )
+        for _ in range( s.half_period ):
+          s.tick( 0, 0, bits )
+        # The master samples miso on the rising edge
+        s.cur_word  = ( s.cur_word << s.nlanes ) | int( s.dut.spi_min.miso )
+        s.cur_nbits += s.nlanes
+        if s.cur_nbits == s.nbits:
+          s.miso_words.append( s.cur_word )
+          s.cur_word  = 0
+          s.cur_nbits = 0
+        for _ in range( s.half_period ):
+          s.tick( 0, 1, bits )
+        s.nsclks += 1
+    for _ in range( s.half_period ):
+      s.tick( 0, 0, 0 )
+    for _ in range( s.cs_gap ):
+      s.tick( 1, 0, 0 )
+
+def run_spi_master( nbits, streaming, words_per_window, push_words,
+                    pull_words, nlanes=1, half_period=4 ):
+  dut = SpiMinion( nbits, streaming=streaming, nlanes=nlanes )
+  dut.apply( DefaultPassGroup() )
+  dut.spi_min.cs   @= 1
+  dut.spi_min.sclk @= 0
+  dut.spi_min.mosi @= 0
+  dut.pull.msg     @= 0
+  dut.sim_reset()
+
+  master = SpiMasterModel( dut, nbits, pull_words, half_period=half_period,
+                           nlanes=nlanes )
+  for i in range( 0, len( push_words ), words_per_window ):
+    master.window( push_words[i:i+words_per_window] )
+
+  assert master.push_msgs  == push_words
+  assert master.miso_words == pull_words[:len( push_words )]
+  return dut.sim_cycle_count(), master.nsclks
+
+def test_streaming_one_word_per_window():
+  push_words = [ 0xa5, 0x3c, 0xff, 0x00 ]
+  pull_words = [ 0x12, 0x34, 0x56, 0x78, 0x9a ]
+  run_spi_master( 8, True, 1, push_words, pull_words )
+
+def test_streaming_multi_word_window():
+  push_words = [ 0xa5, 0x3c, 0xff, 0x00, 0x81, 0x7e ]
+  pull_words = [ 0x12, 0x34, 0x56, 0x78, 0x9a, 0xbc, 0xde, 0xf0 ]
+  run_spi_master( 8, True, 3, push_words, pull_words )
+
+def test_streaming_cycles():
+  push_words = [ i * 0x01010101 for i in range( 16 ) ]
+  pull_words = [ 0xffffffff - i for i in range( 17 ) ]
+  ncycles,        _ = run_spi_master( 32, False, 1,  push_words, pull_words )
+  stream_ncycles, _ = run_spi_master( 32, True,  16, push_words, pull_words )
+  print( f'one word per window : {ncycles} cycles' )
+  print( f'16 words per window : {stream_ncycles} cycles' )
+  # The sclk cycles of the words take 16 * 32 * 8 cycles, so streaming
+  # only saves the lead, tail and cs gap of every window. What is left is
+  # the lead, tail and gap of the single window, and the cycles of reset.
+  assert stream_ncycles < ncycles
+  assert stream_ncycles <= 16 * 32 * 8 + 4 + 4 + 8 + 4
+
+#-------------------------------------------------------------------------
+# Streaming through PushPull2ReqRespAdapter
+#-------------------------------------------------------------------------
+# A streaming minion in front of an adapter and a ConfigTerminal. The
+# requests of a window are pushed word by word, and every word pulls the
+# oldest response that is ready, so the responses come back in the same
+# window or in the idle frames of the next one.
+
+CfgPkt      = mk_cfg_pkt_type( type_nbits=2, addr_nbits=16, data_nbits=32 )
+PushPullPkt = mk_push_pull_bitstruct( CfgPkt )
+
+class StreamingTestHarness( Component ):
+  def construct( s ):
+    s.minion   = SpiMinion( PushPullPkt.nbits, streaming=True )
+    s.adapter  = PushPull2ReqRespAdapter( CfgPkt )
+    s.terminal = ConfigTerminal( CfgPkt, num_config_regs=2,
+                                 num_status_regs=0 )
+
+    s.spi_min = SpiMinionIfc()
+
+    s.spi_min        //= s.minion.spi_min
+    s.minion.push.en //= s.adapter.push.en
+    s.minion.pull.en //= s.adapter.pull.en
+    s.adapter.req    //= s.terminal.minion_req
+    s.adapter.resp   //= s.terminal.minion_resp
+
+    @update
+    def up_push_pull_msg():
+      s.adapter.push.msg @= s.minion.push.msg
+      s.minion.pull.msg  @= s.adapter.pull.msg
+
+def test_streaming_adapter():
+  wr, rd = CfgType.WRITE, CfgType.READ
+  reqs = [ CfgPkt( wr, 0, 0xdeadbeef ), CfgPkt( wr, 1, 0xc001cafe ),
+           CfgPkt( rd, 0, 0 ), CfgPkt( rd, 1, 0 ),
+           CfgPkt( wr, 0, 0x12345678 ), CfgPkt( rd, 0, 0 ) ]
+  resps = [ CfgPkt( wr, 0, 0 ), CfgPkt( wr, 1, 0 ),
+            CfgPkt( rd, 0, 0xdeadbeef ), CfgPkt( rd, 1, 0xc001cafe ),
+            CfgPkt( wr, 0, 0 ), CfgPkt( rd, 0, 0x12345678 ) ]
+
+  th = StreamingTestHarness()
+  th.apply( DefaultPassGroup() )
+  th.spi_min.cs   @= 1
+  th.spi_min.sclk @= 0
+  th.spi_min.mosi @= 0
+  th.sim_reset()
+
+  master = SpiMasterModel( th, PushPullPkt.nbits, None )
+  words  = [ int( PushPullPkt( 1, 0, req ).to_bits() ) for req in reqs ]
+  master.window( words )
+  master.window( [ 0 ] * 4 )
+
+  pulled = [ PushPullPkt.from_bits( mk_bits( PushPullPkt.nbits )( word ) )
+             for word in master.miso_words ]
+  assert not any( pkt.stall for pkt in pulled )
+  assert [ pkt.payload for pkt in pulled if pkt.valid ] == resps
+  assert th.terminal.o_config[0] == 0x12345678
+  assert th.terminal.o_config[1] == 0xc001cafe
+
+#-------------------------------------------------------------------------
+# Multi-lane
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "nlanes, streaming", [ (2, False), (4, False),
+                                                 (2, True ), (4, True ) ] )
+def test_multi_lane( nlanes, streaming ):
+  push_words = [ 0xa5, 0x3c, 0xff, 0x00, 0x81, 0x7e ]
+  pull_words = [ 0x12, 0x34, 0x56, 0x78, 0x9a, 0xbc, 0xde ]
+  run_spi_master( 8, streaming, 2 if streaming else 1, push_words,
+                  pull_words, nlanes=nlanes )
+
+# Transfers 8 frames as wide as a PushPullPkt of the default CfgPkt
+def test_multi_lane_cycles():
+  nbits      = 52
+  push_words = [ ( 0xdeadbeef << 20 ) + i for i in range( 8 ) ]
+  pull_words = [ ( 0xc001cafe << 20 ) + i for i in range( 9 ) ]
+
+  results = {}
+  for nlanes in [ 1, 2, 4 ]:
+    results[nlanes] = run_spi_master( nbits, False, 1, push_words,
+                                      pull_words, nlanes=nlanes )
+    ncycles, nsclks = results[nlanes]
+    print( f'{nlanes} lane(s): {nsclks // len( push_words )} sclk cycles per '
+           f'frame, {ncycles} cycles' )
+    assert nsclks == len( push_words ) * nbits // nlanes
+
+  assert results[2][0] < 0.6 * results[1][0]
+  assert results[4][0] < 0.6 * results[2][0]
@@ -16,36 +16,63 @@ registers and 2 status registers, then the config registers will be
 indexed by address 0x00 and 0x01 and the status registers will be indexed
 by address 0x02 and 0x03.
 
+The request and response queues are built from QueueType with qsize
+entries each. The request queue is dequeued only when the response queue
+can accept the response, so the two queues form a two-stage pipeline.
+With the default 1-entry pipe queues (or normal queues with qsize >= 2)
+the terminal sustains one request per cycle. A 1-entry normal queue
+cannot enqueue and dequeue in the same cycle and therefore limits the
+terminal to one request every two cycles, but it cuts the combinational
+path from minion_resp.rdy to minion_req.rdy.
+
+With a type field of at least 3 bits, the terminal also performs the
+SET_BITS, CLEAR_BITS and TOGGLE_BITS read-modify-write operations (see
+CfgType) on its config registers, and with a type field of at least 4
+bits and a mask field, MASKED_WRITE. The new value is computed from the
+read data of the register, so an operation takes one request like a
+write, and the response carries the old value like a read. These
+operations on status registers only return the value of the register.
+
 Author : Yanghui Ou
   Date : June 13, 2020
 '''
 from pymtl3 import *
 from pymtl3.stdlib.primitive import Reg, RegEnRst
 from pymtl3.stdlib.stream.ifcs import IStreamIfc, OStreamIfc
-from pymtl3.stdlib.stream.queues import StreamNormalQueue
+from pymtl3.stdlib.stream.queues import StreamPipeQueue
 
 from ..ifcs.msg_types import CfgType
 
 
 class ConfigTerminal( Component ):
-  def construct( s, PacketType, num_config_regs=2, num_status_regs=2, qsize=1 ):
+  def construct( s, PacketType, num_config_regs=2, num_status_regs=2, qsize=1,
+                 QueueType=StreamPipeQueue ):
     # Local parameters
     assert (num_config_regs >= 0 and num_status_regs >= 0 and
             num_status_regs + num_config_regs > 0)
+    assert qsize > 0
 
     s.num_config_regs = num_config_regs
     s.num_status_regs = num_status_regs
     s.total_num_regs  = num_config_regs + num_status_regs
     s.csr_addr_nbits  = max( clog2( s.total_num_regs ), 1 )
     s.DType           = PacketType.get_field_type( 'data' )
+    s.type_nbits      = PacketType.get_field_type( 'type_' ).nbits
+    s.has_rmw         = s.type_nbits >= 3
+    s.has_mask        = ( s.type_nbits >= 4 and
+                          'mask' in PacketType.__bitstruct_fields__ )
 
     # Minion Interface
     s.minion_req  = IStreamIfc( PacketType )
     s.minion_resp = OStreamIfc( PacketType )
 
     # Components
-    s.req_q  = StreamNormalQueue( PacketType, num_entries=1 )
-    s.resp_q = StreamNormalQueue( PacketType, num_entries=1 )
+    s.req_q  = QueueType( PacketType, num_entries=qsize )
+    s.resp_q = QueueType( PacketType, num_entries=qsize )
+
+    # Write data and read data of the addressed register
+    s.wdata = Wire( s.DType )
+    s.rdata = Wire( s.DType )
 
     # Config and status interface
     if s.num_config_regs > 0:
@@ -54,35 +81,126 @@ class ConfigTerminal( Component ):
                      for i in range( s.num_config_regs ) ]
       for i in range( s.num_config_regs ):
         s.o_config[i]     //= s.config_r[i].out
-        s.config_r[i].in_ //= s.req_q.ostream.msg.data
+        s.config_r[i].in_ //= s.wdata
 
     if s.num_status_regs > 0:
       s.i_status = [ InPort ( s.DType ) for i in range( s.num_status_regs ) ]
       s.status_r = [ Reg( s.DType ) for i in range( s.num_status_regs ) ]
 
-      for i in range( s.num_config_regs ):
+      for i in range( s.num_status_regs ):
         s.i_status[i] //= s.status_r[i].in_
 
     # Wires and register
     s.is_write     = Wire()
     s.is_read      = Wire()
+    s.is_burst_hdr = Wire()
+    s.is_posted    = Wire()
+    s.is_rmw       = Wire()
+    s.in_burst     = Wire()
+    s.has_resp     = Wire()
     s.req_deq_xfer = Wire()
     s.csr_addr     = Wire( s.csr_addr_nbits )
 
+    s.burst_cnt_r  = Wire( s.DType )
+    s.burst_addr_r = Wire( s.csr_addr_nbits )
+
+    # Read data of all registers, indexed by csr_addr
+    s.reg_data = [ Wire( s.DType ) for _ in range( s.total_num_regs ) ]
+    for i in range( s.num_config_regs ):
+      s.reg_data[i] //= s.config_r[i].out
+    for i in range( s.num_status_regs ):
+      s.reg_data[s.num_config_regs+i] //= s.status_r[i].out
+
     # Connections
     s.minion_req  //= s.req_q.istream
     s.minion_resp //= s.resp_q.ostream
 
     s.resp_q.istream.msg.type_ //= s.req_q.ostream.msg.type_
     s.resp_q.istream.msg.addr  //= s.req_q.ostream.msg.addr
-    s.resp_q.istream.val       //= s.req_q.ostream.val
-    s.req_q.ostream.rdy        //= s.resp_q.istream.rdy
+    s.resp_q.istream.msg.data  //= s.rdata
+    # Responses carry no mask
+    if 'mask' in PacketType.__bitstruct_fields__:
+      s.resp_q.istream.msg.mask //= 0
+    s.resp_q.istream.val       //= lambda: s.req_q.ostream.val & s.has_resp
+    s.req_q.ostream.rdy        //= lambda: s.resp_q.istream.rdy | ~s.has_resp
 
     # Logic
-    s.is_write //= lambda: s.req_q.ostream.msg.type_ == CfgType.WRITE
-    s.is_read  //= lambda: s.req_q.ostream.msg.type_ == CfgType.READ
+    # Every packet of an ongoing burst is a data beat that writes to the
+    # auto-incremented burst address.
+    s.in_burst //= lambda: s.burst_cnt_r != 0
+    s.is_posted //= lambda: ( ~s.in_burst &
+      ( s.req_q.ostream.msg.type_ == CfgType.POSTED_WRITE ) )
+    s.is_write //= lambda: ( s.in_burst | s.is_posted | s.is_rmw |
+                             ( s.req_q.ostream.msg.type_ == CfgType.WRITE ) )
+    s.is_read  //= lambda: ( ~s.in_burst &
+                             ( s.req_q.ostream.msg.type_ == CfgType.READ ) )
+    s.is_burst_hdr //= lambda: ( ~s.in_burst &
+      ( s.req_q.ostream.msg.type_ == CfgType.BURST_WRITE ) )
+    # No response for a posted write, a non-empty burst header or any
+    # beat but the last one
+    s.has_resp //= lambda: ~(
+      ( s.is_burst_hdr & ( s.req_q.ostream.msg.data != 0 ) ) |
+      ( s.in_burst & ( s.burst_cnt_r != 1 ) ) | s.is_posted )
     s.req_deq_xfer //= lambda: s.req_q.ostream.val & s.req_q.ostream.rdy
-    s.csr_addr //= s.req_q.ostream.msg.addr[0:s.csr_addr_nbits]
+
+    # Read-modify-write logic. The types are only decoded if the type
+    # field can hold them. The new value is computed from the read data.
+    if s.has_rmw:
+      s.is_set    = Wire()
+      s.is_clear  = Wire()
+      s.is_toggle = Wire()
+      s.is_masked = Wire()
+      s.mask      = Wire( s.DType )
+
+      s.is_set //= lambda: ( ~s.in_burst &
+        ( s.req_q.ostream.msg.type_ == CfgType.SET_BITS ) )
+      s.is_clear //= lambda: ( ~s.in_burst &
+        ( s.req_q.ostream.msg.type_ == CfgType.CLEAR_BITS ) )
+      s.is_toggle //= lambda: ( ~s.in_burst &
+        ( s.req_q.ostream.msg.type_ == CfgType.TOGGLE_BITS ) )
+
+      if s.has_mask:
+        s.mask //= s.req_q.ostream.msg.mask
+        s.is_masked //= lambda: ( ~s.in_burst &
+          ( s.req_q.ostream.msg.type_ == CfgType.MASKED_WRITE ) )
+      else:
+        s.mask      //= 0
+        s.is_masked //= 0
+
+      s.is_rmw //= lambda: s.is_set | s.is_clear | s.is_toggle | s.is_masked
+
+      @update
+      def up_wdata():
+        if s.is_set:
+          s.wdata @= s.rdata | s.req_q.ostream.msg.data
+        elif s.is_clear:
+          s.wdata @= s.rdata & ~s.req_q.ostream.msg.data
+        elif s.is_toggle:
+          s.wdata @= s.rdata ^ s.req_q.ostream.msg.data
+        elif s.is_masked:
+          s.wdata @= ( ( s.rdata & ~s.mask ) |
+                       ( s.req_q.ostream.msg.data & s.mask ) )
+        else:
+          s.wdata @= s.req_q.ostream.msg.data
+
+    else:
+      s.is_rmw //= 0
+      s.wdata  //= s.req_q.ostream.msg.data
+    s.csr_addr //= lambda: ( s.burst_addr_r if s.in_burst else
+                             s.req_q.ostream.msg.addr[0:s.csr_addr_nbits] )
+
+    # Burst logic
+    @update_ff
+    def up_burst():
+      if s.reset:
+        s.burst_cnt_r  <<= 0
+        s.burst_addr_r <<= 0
+      elif s.req_deq_xfer & s.is_burst_hdr:
+        s.burst_cnt_r  <<= s.req_q.ostream.msg.data
+        s.burst_addr_r <<= s.csr_addr
+      elif s.req_deq_xfer & s.in_burst:
+        s.burst_cnt_r  <<= s.burst_cnt_r - 1
+        s.burst_addr_r <<= s.burst_addr_r + 1
 
     # Write enable logic
     if s.num_config_regs > 0:
@@ -91,37 +209,15 @@ class ConfigTerminal( Component ):
                                         ( s.csr_addr == i ) )
 
     # Read data logic
-    # Only has config registers
-    if s.num_config_regs > 0 and s.num_status_regs == 0:
-      @update
-      def up_read_data_config_only():
-        s.resp_q.istream.msg.data @= 0
-        if s.is_read:
-          for i in range( s.num_config_regs ):
-            if ( s.req_q.ostream.val & ( s.csr_addr == i ) ):
-              s.resp_q.istream.msg.data @= s.config_r[i].out
-
-    # Only has status registers
-    elif s.num_config_regs == 0 and s.num_status_regs > 0:
-      @update
-      def up_read_data_status_only():
-        s.resp_q.istream.msg.data @= 0
-        if s.is_read:
-          for i in range( s.num_status_regs ):
-            if ( s.req_q.ostream.val & ( s.csr_addr == i ) ):
-              s.resp_q.istream.msg.data @= s.status_r[i].out
-
-    # Has both config and status registers
-    else:
-      @update
-      def up_read_data():
-        s.resp_q.istream.msg.data @= 0
-        if s.is_read:
-          for i in range( s.total_num_regs ):
-            if ( s.req_q.ostream.val & ( s.csr_addr == i ) ):
-              s.resp_q.istream.msg.data @= (
-                s.config_r[i].out if i < s.num_config_regs
-                                  else s.status_r[i-s.num_config_regs].out )
+    # The read data is looked up by indexing into reg_data with csr_addr
+    # and is only evaluated when there is a valid read or read-modify-write
+    # request. Addresses beyond the last register read as zero.
+    @update
+    def up_read_data():
+      s.rdata @= 0
+      if s.req_q.ostream.val & ( s.is_read | s.is_rmw ):
+        if zext( s.csr_addr, s.csr_addr_nbits+1 ) < s.total_num_regs:
+          s.rdata @= s.reg_data[s.csr_addr]
 
   def line_trace( s ):
     return f'{s.minion_req}(){s.minion_resp}'
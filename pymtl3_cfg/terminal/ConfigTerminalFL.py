@@ -0,0 +1,147 @@
+'''
+==========================================================================
+ConfigTerminalFL.py
+==========================================================================
+A functional-level model of ConfigTerminal for system-scale simulation.
+It has the same ports and handles the same packets as ConfigTerminal (see
+there for the register map, bursts, posted writes, fences and
+read-modify-write operations), but the registers are a Python list and
+the whole terminal is a single update_ff block, so an idle terminal costs
+little more than one function call per cycle.
+
+The model is not cycle-accurate: a request is performed in the cycle it
+is accepted and its response is valid in the next cycle, and a read of a
+status register returns the value of i_status in that cycle instead of
+the registered value. Up to resp_qsize responses are buffered, and
+minion_req.rdy only depends on the number of buffered responses.
+
+qsize and QueueType are accepted so that the model can replace a
+ConfigTerminal without changing its parameters, and are ignored.
+'''
+from collections import deque
+
+from pymtl3 import *
+from pymtl3.stdlib.stream.ifcs import IStreamIfc, OStreamIfc
+from pymtl3.stdlib.stream.queues import StreamPipeQueue
+
+from ..ifcs.msg_types import CfgType
+
+
+class ConfigTerminalFL( Component ):
+  def construct( s, PacketType, num_config_regs=2, num_status_regs=2, qsize=1,
+                 QueueType=StreamPipeQueue, resp_qsize=2 ):
+    # Local parameters
+    assert (num_config_regs >= 0 and num_status_regs >= 0 and
+            num_status_regs + num_config_regs > 0)
+    assert resp_qsize > 0
+
+    s.PacketType      = PacketType
+    s.num_config_regs = num_config_regs
+    s.num_status_regs = num_status_regs
+    s.total_num_regs  = num_config_regs + num_status_regs
+    s.csr_addr_nbits  = max( clog2( s.total_num_regs ), 1 )
+    s.resp_qsize      = resp_qsize
+    s.DType           = PacketType.get_field_type( 'data' )
+    s.type_nbits      = PacketType.get_field_type( 'type_' ).nbits
+    s.has_rmw         = s.type_nbits >= 3
+    s.has_mask        = ( s.type_nbits >= 4 and
+                          'mask' in PacketType.__bitstruct_fields__ )
+
+    # Minion Interface
+    s.minion_req  = IStreamIfc( PacketType )
+    s.minion_resp = OStreamIfc( PacketType )
+
+    # Config and status interface. The update block refers to o_config,
+    # so it is an empty list without config registers.
+    s.o_config = [ OutPort( s.DType ) for i in range( s.num_config_regs ) ]
+
+    if s.num_status_regs > 0:
+      s.i_status = [ InPort ( s.DType ) for i in range( s.num_status_regs ) ]
+
+    # State
+    s.regs       = [ 0 ] * s.num_config_regs
+    s.resps      = deque()
+    s.burst_cnt  = 0
+    s.burst_addr = 0
+
+    @update_ff
+    def up_fl():
+      if s.reset:
+        s.regs[:]    = [ 0 ] * s.num_config_regs
+        s.burst_cnt  = 0
+        s.burst_addr = 0
+        s.resps.clear()
+        for i in range( s.num_config_regs ):
+          s.o_config[i] <<= 0
+
+      else:
+        if s.minion_resp.val & s.minion_resp.rdy:
+          s.resps.popleft()
+        if s.minion_req.val & s.minion_req.rdy:
+          s.handle( s.minion_req.msg )
+
+      s.minion_req.rdy  <<= len( s.resps ) < s.resp_qsize
+      s.minion_resp.val <<= len( s.resps ) > 0
+      if s.resps:
+        s.minion_resp.msg <<= s.resps[0]
+
+  # Performs a request and queues its response, if it has one
+  def handle( s, msg ):
+    type_ = int( msg.type_ )
+    addr  = int( msg.addr )
+    data  = int( msg.data )
+
+    has_resp = True
+    rdata    = 0
+    if s.burst_cnt != 0:
+      s.write( s.burst_addr, data )
+      s.burst_addr = ( s.burst_addr + 1 ) % 2**s.csr_addr_nbits
+      s.burst_cnt -= 1
+      has_resp = s.burst_cnt == 0
+
+    elif type_ == CfgType.BURST_WRITE:
+      s.burst_cnt  = data
+      s.burst_addr = addr % 2**s.csr_addr_nbits
+      has_resp     = data == 0
+
+    elif type_ == CfgType.WRITE or type_ == CfgType.POSTED_WRITE:
+      s.write( addr % 2**s.csr_addr_nbits, data )
+      has_resp = type_ == CfgType.WRITE
+
+    elif type_ == CfgType.READ:
+      rdata = s.read( addr % 2**s.csr_addr_nbits )
+
+    elif s.has_rmw and type_ in ( CfgType.SET_BITS, CfgType.CLEAR_BITS,
+                                  CfgType.TOGGLE_BITS ):
+      idx   = addr % 2**s.csr_addr_nbits
+      rdata = s.read( idx )
+      if type_ == CfgType.SET_BITS:
+        s.write( idx, rdata | data )
+      elif type_ == CfgType.CLEAR_BITS:
+        s.write( idx, rdata & ~data )
+      else:
+        s.write( idx, rdata ^ data )
+
+    elif s.has_mask and type_ == CfgType.MASKED_WRITE:
+      idx   = addr % 2**s.csr_addr_nbits
+      mask  = int( msg.mask )
+      rdata = s.read( idx )
+      s.write( idx, ( rdata & ~mask ) | ( data & mask ) )
+
+    if has_resp:
+      s.resps.append( s.PacketType( type_, addr, rdata ) )
+
+  def write( s, idx, data ):
+    if idx < s.num_config_regs:
+      s.regs[idx] = data
+      s.o_config[idx] <<= data
+
+  def read( s, idx ):
+    if idx < s.num_config_regs:
+      return s.regs[idx]
+    if idx < s.total_num_regs:
+      return int( s.i_status[ idx - s.num_config_regs ] )
+    return 0
+
+  def line_trace( s ):
+    return f'{s.minion_req}(){s.minion_resp}'
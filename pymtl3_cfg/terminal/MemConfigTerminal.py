@@ -0,0 +1,196 @@
+'''
+==========================================================================
+MemConfigTerminal.py
+==========================================================================
+A memory-backed config terminal for blocks with a large number of
+configuration registers (e.g., coefficient or lookup tables). It speaks
+the same minion_req/minion_resp protocol as ConfigTerminal.
+
+The terminal has a small flop-based region and a bulk memory region. The
+flop-based region works exactly like ConfigTerminal: read-write config
+registers drive the o_config ports and read-only status registers sample
+the i_status ports. The memory region is a register file with one read
+port and one write port for the config side, plus a second read port
+(i_mem_raddr/o_mem_rdata) for the block that consumes the table. Both
+regions are accessed with an O(1) indexed read instead of comparing the
+address against every register.
+
+The config registers occupy the lowest addresses, followed by the status
+registers and then the memory region. For example, with 2 config
+registers, 2 status registers and 1024 memory entries, the config
+registers are at 0x000-0x001, the status registers are at 0x002-0x003 and
+the memory entries are at 0x004-0x403. Reads to unmapped addresses return
+zero and writes to them are dropped.
+
+Burst writes, posted writes and fences (see CfgType) are handled the same
+way as in ConfigTerminal. Burst writes are the preferred way to load a
+table. Read-modify-write operations are not supported: the terminal
+answers them with zero data and does not change any register.
+'''
+from pymtl3 import *
+from pymtl3.stdlib.primitive import Reg, RegEnRst, RegisterFile
+from pymtl3.stdlib.stream.ifcs import IStreamIfc, OStreamIfc
+from pymtl3.stdlib.stream.queues import StreamPipeQueue
+
+from ..ifcs.msg_types import CfgType
+
+
+class MemConfigTerminal( Component ):
+  def construct( s, PacketType, num_mem_regs=1024, num_config_regs=0,
+                 num_status_regs=0, qsize=1, QueueType=StreamPipeQueue ):
+    # Local parameters
+    assert num_mem_regs > 0 and num_config_regs >= 0 and num_status_regs >= 0
+    assert qsize > 0
+
+    s.num_mem_regs    = num_mem_regs
+    s.num_config_regs = num_config_regs
+    s.num_status_regs = num_status_regs
+    s.num_flop_regs   = num_config_regs + num_status_regs
+    s.total_num_regs  = s.num_flop_regs + num_mem_regs
+    s.csr_addr_nbits  = max( clog2( s.total_num_regs ), 1 )
+    s.mem_addr_nbits  = max( clog2( num_mem_regs ), 1 )
+    s.DType           = PacketType.get_field_type( 'data' )
+    s.MemAddrType     = mk_bits( s.mem_addr_nbits )
+
+    # Minion Interface
+    s.minion_req  = IStreamIfc( PacketType )
+    s.minion_resp = OStreamIfc( PacketType )
+
+    # Memory read interface for the block consuming the table
+    s.i_mem_raddr = InPort ( s.MemAddrType )
+    s.o_mem_rdata = OutPort( s.DType )
+
+    # Components
+    s.req_q  = QueueType( PacketType, num_entries=qsize )
+    s.resp_q = QueueType( PacketType, num_entries=qsize )
+    s.mem    = RegisterFile( s.DType, nregs=num_mem_regs, rd_ports=2 )
+
+    # Config and status interface
+    if s.num_config_regs > 0:
+      s.o_config = [ OutPort( s.DType ) for i in range( s.num_config_regs ) ]
+      s.config_r = [ RegEnRst( s.DType, reset_value=0 )
+                     for i in range( s.num_config_regs ) ]
+      for i in range( s.num_config_regs ):
+        s.o_config[i]     //= s.config_r[i].out
+        s.config_r[i].in_ //= s.req_q.ostream.msg.data
+
+    if s.num_status_regs > 0:
+      s.i_status = [ InPort ( s.DType ) for i in range( s.num_status_regs ) ]
+      s.status_r = [ Reg( s.DType ) for i in range( s.num_status_regs ) ]
+
+      for i in range( s.num_status_regs ):
+        s.i_status[i] //= s.status_r[i].in_
+
+    # Wires and register
+    s.is_write     = Wire()
+    s.is_read      = Wire()
+    s.is_mem       = Wire()
+    s.is_burst_hdr = Wire()
+    s.is_posted    = Wire()
+    s.in_burst     = Wire()
+    s.has_resp     = Wire()
+    s.req_deq_xfer = Wire()
+    s.csr_addr     = Wire( s.csr_addr_nbits )
+    s.mem_addr     = Wire( s.MemAddrType )
+
+    s.burst_cnt_r  = Wire( s.DType )
+    s.burst_addr_r = Wire( s.csr_addr_nbits )
+
+    # Read data of the flop-based registers, indexed by csr_addr
+    if s.num_flop_regs > 0:
+      s.flop_data = [ Wire( s.DType ) for _ in range( s.num_flop_regs ) ]
+      for i in range( s.num_config_regs ):
+        s.flop_data[i] //= s.config_r[i].out
+      for i in range( s.num_status_regs ):
+        s.flop_data[s.num_config_regs+i] //= s.status_r[i].out
+
+    # Connections
+    s.minion_req  //= s.req_q.istream
+    s.minion_resp //= s.resp_q.ostream
+
+    s.resp_q.istream.msg.type_ //= s.req_q.ostream.msg.type_
+    s.resp_q.istream.msg.addr  //= s.req_q.ostream.msg.addr
+    # Responses carry no mask
+    if 'mask' in PacketType.__bitstruct_fields__:
+      s.resp_q.istream.msg.mask //= 0
+    s.resp_q.istream.val       //= lambda: s.req_q.ostream.val & s.has_resp
+    s.req_q.ostream.rdy        //= lambda: s.resp_q.istream.rdy | ~s.has_resp
+
+    s.mem.raddr[0] //= s.mem_addr
+    s.mem.waddr[0] //= s.mem_addr
+    s.mem.wdata[0] //= s.req_q.ostream.msg.data
+    s.mem.raddr[1] //= s.i_mem_raddr
+    s.o_mem_rdata  //= s.mem.rdata[1]
+
+    # Logic
+    s.in_burst //= lambda: s.burst_cnt_r != 0
+    s.is_posted //= lambda: ( ~s.in_burst &
+      ( s.req_q.ostream.msg.type_ == CfgType.POSTED_WRITE ) )
+    s.is_write //= lambda: ( s.in_burst | s.is_posted |
+                             ( s.req_q.ostream.msg.type_ == CfgType.WRITE ) )
+    s.is_read  //= lambda: ( ~s.in_burst &
+                             ( s.req_q.ostream.msg.type_ == CfgType.READ ) )
+    s.is_burst_hdr //= lambda: ( ~s.in_burst &
+      ( s.req_q.ostream.msg.type_ == CfgType.BURST_WRITE ) )
+    s.has_resp //= lambda: ~(
+      ( s.is_burst_hdr & ( s.req_q.ostream.msg.data != 0 ) ) |
+      ( s.in_burst & ( s.burst_cnt_r != 1 ) ) | s.is_posted )
+    s.req_deq_xfer //= lambda: s.req_q.ostream.val & s.req_q.ostream.rdy
+    s.csr_addr //= lambda: ( s.burst_addr_r if s.in_burst else
+                             s.req_q.ostream.msg.addr[0:s.csr_addr_nbits] )
+    s.is_mem   //= lambda: ( ( s.csr_addr >= s.num_flop_regs ) &
+                             ( zext( s.csr_addr, s.csr_addr_nbits+1 ) <
+                               s.total_num_regs ) )
+
+    s.mem.wen[0] //= lambda: s.req_deq_xfer & s.is_write & s.is_mem
+
+    # Burst logic
+    @update_ff
+    def up_burst():
+      if s.reset:
+        s.burst_cnt_r  <<= 0
+        s.burst_addr_r <<= 0
+      elif s.req_deq_xfer & s.is_burst_hdr:
+        s.burst_cnt_r  <<= s.req_q.ostream.msg.data
+        s.burst_addr_r <<= s.csr_addr
+      elif s.req_deq_xfer & s.in_burst:
+        s.burst_cnt_r  <<= s.burst_cnt_r - 1
+        s.burst_addr_r <<= s.burst_addr_r + 1
+
+    # Memory address logic. The address is forced to zero outside the
+    # memory region so that the register file is never indexed out of
+    # bounds.
+    @update
+    def up_mem_addr():
+      s.mem_addr @= 0
+      if s.is_mem:
+        s.mem_addr @= trunc( s.csr_addr - s.num_flop_regs, s.mem_addr_nbits )
+
+    # Write enable logic
+    if s.num_config_regs > 0:
+      for i in range( s.num_config_regs ):
+        s.config_r[i].en //= lambda: ( s.req_deq_xfer & s.is_write &
+                                        ( s.csr_addr == i ) )
+
+    # Read data logic
+    # Only has the memory region
+    if s.num_flop_regs == 0:
+      @update
+      def up_read_data_mem_only():
+        s.resp_q.istream.msg.data @= 0
+        if s.req_q.ostream.val & s.is_read & s.is_mem:
+          s.resp_q.istream.msg.data @= s.mem.rdata[0]
+
+    # Has both flop-based and memory regions
+    else:
+      @update
+      def up_read_data():
+        s.resp_q.istream.msg.data @= 0
+        if s.req_q.ostream.val & s.is_read:
+          if s.is_mem:
+            s.resp_q.istream.msg.data @= s.mem.rdata[0]
+          elif s.csr_addr < s.num_flop_regs:
+            s.resp_q.istream.msg.data @= s.flop_data[s.csr_addr]
+
+  def line_trace( s ):
+    return f'{s.minion_req}(){s.minion_resp}'
@@ -0,0 +1,158 @@
+'''
+==========================================================================
+ConfigTerminalFL_test.py
+==========================================================================
+Test cases for ConfigTerminalFL.
+'''
+import random
+
+import pytest
+
+from pymtl3 import *
+from pymtl3.stdlib.test_utils import run_sim
+
+from ...ifcs.msg_types import CfgType, mk_cfg_pkt_type
+from ..ConfigTerminal import ConfigTerminal
+from ..ConfigTerminalFL import ConfigTerminalFL
+from .ConfigTerminal_test import (TestHarness, TestPkt, bwr,
+                                  mk_req_resp_msgs, rd, wr)
+
+# MASKED_WRITE needs a 4-bit type field and a mask field
+RmwPkt = mk_cfg_pkt_type( type_nbits=4, addr_nbits=16, data_nbits=32,
+                          mask=True )
+pwr   = CfgType.POSTED_WRITE
+fence = CfgType.FENCE
+setb  = CfgType.SET_BITS
+clrb  = CfgType.CLEAR_BITS
+togb  = CfgType.TOGGLE_BITS
+mwr   = CfgType.MASKED_WRITE
+
+#-------------------------------------------------------------------------
+# Directed tests
+#-------------------------------------------------------------------------
+
+def test_status_only():
+  req_msgs, resp_msgs = mk_req_resp_msgs([
+    (rd, 0x1000, 0), (rd, 0x1000, 0),
+    (wr, 0x1000, 1), (wr, 0x1000, 0),
+  ])
+  th = TestHarness( TestPkt, req_msgs, resp_msgs, num_config_regs=0,
+                    num_status_regs=1, TerminalType=ConfigTerminalFL )
+  run_sim( th )
+
+@pytest.mark.parametrize( "sink_delay", [ 0, 20 ] )
+def test_stream_reqs( sink_delay ):
+  req_resps = [
+    (wr, 0x1000, 0xdeadbeef), (wr, 0x1000, 0),
+    (rd, 0x1000, 0         ), (rd, 0x1000, 0xdeadbeef),
+    (wr, 0x1001, 0xc001cafe), (wr, 0x1001, 0),
+    (rd, 0x1001, 0         ), (rd, 0x1001, 0xc001cafe),
+    (rd, 0x1002, 0         ), (rd, 0x1002, 2),
+    (rd, 0x1003, 0         ), (rd, 0x1003, 3),
+  ]
+  req_msgs, resp_msgs = mk_req_resp_msgs( req_resps )
+  th = TestHarness( TestPkt, req_msgs, resp_msgs,
+                    TerminalType=ConfigTerminalFL )
+  th.set_param( 'top.sink.construct', initial_delay=sink_delay )
+  run_sim( th )
+  assert th.dut.o_config[0] == 0xdeadbeef
+  assert th.dut.o_config[1] == 0xc001cafe
+
+def test_burst_wr():
+  req_msgs = [
+    TestPkt( bwr, 0x1000, 2 ),
+    TestPkt( bwr, 0x1000, 0xdeadbeef ),
+    TestPkt( bwr, 0x1000, 0xc001cafe ),
+    TestPkt( bwr, 0x1001, 0 ),
+    TestPkt( rd,  0x1001, 0 ),
+  ]
+  resp_msgs = [
+    TestPkt( bwr, 0x1000, 0 ),
+    TestPkt( bwr, 0x1001, 0 ),
+    TestPkt( rd,  0x1001, 0xc001cafe ),
+  ]
+  th = TestHarness( TestPkt, req_msgs, resp_msgs,
+                    TerminalType=ConfigTerminalFL )
+  run_sim( th )
+
+def test_throughput():
+  num_reqs = 64
+  req_resps = []
+  for i in range( num_reqs ):
+    req_resps.append( (wr, 0x1000 + i % 2, i) )
+    req_resps.append( (wr, 0x1000 + i % 2, 0) )
+  req_msgs, resp_msgs = mk_req_resp_msgs( req_resps )
+  th = TestHarness( TestPkt, req_msgs, resp_msgs,
+                    TerminalType=ConfigTerminalFL )
+  th.elaborate()
+  th.apply( DefaultPassGroup() )
+  th.sim_reset()
+  while not th.done() and th.sim_cycle_count() < 4 * num_reqs:
+    th.sim_tick()
+
+  assert th.done()
+  assert th.sim_cycle_count() <= num_reqs + 8
+
+#-------------------------------------------------------------------------
+# Random tests against ConfigTerminal
+#-------------------------------------------------------------------------
+# Both terminals get the same random requests under random backpressure
+# and must send back the same responses and end up with the same config
+# registers.
+
+def mk_random_reqs( rng, num_reqs, num_regs ):
+  reqs = []
+  while len( reqs ) < num_reqs:
+    addr = 0x1000 + rng.randrange( num_regs + 2 )
+    op   = rng.choice( [ wr, rd, pwr, fence, bwr, setb, clrb, togb, mwr ] )
+    if op == bwr:
+      nbeats = rng.randrange( 4 )
+      reqs.append( RmwPkt( bwr, addr, nbeats ) )
+      for _ in range( nbeats ):
+        reqs.append( RmwPkt( bwr, addr, rng.getrandbits( 32 ) ) )
+    else:
+      reqs.append( RmwPkt( op, addr, rng.getrandbits( 32 ),
+                           rng.getrandbits( 32 ) ) )
+  return reqs
+
+def run_terminal( TerminalType, reqs, num_config_regs, num_status_regs,
+                  seed ):
+  dut = TerminalType( RmwPkt, num_config_regs=num_config_regs,
+                      num_status_regs=num_status_regs )
+  dut.elaborate()
+  dut.apply( DefaultPassGroup() )
+  dut.sim_reset()
+  for i in range( num_status_regs ):
+    dut.i_status[i] @= 0x5000 + i
+
+  rng   = random.Random( seed )
+  reqs  = list( reqs )
+  resps = []
+  for _ in range( 20 * len( reqs ) ):
+    dut.minion_req.val  @= len( reqs ) > 0 and rng.random() < 0.7
+    if reqs:
+      dut.minion_req.msg @= reqs[0]
+    dut.minion_resp.rdy @= rng.random() < 0.7
+    dut.sim_eval_combinational()
+
+    if dut.minion_req.val & dut.minion_req.rdy:
+      reqs.pop( 0 )
+    if dut.minion_resp.val & dut.minion_resp.rdy:
+      resps.append( dut.minion_resp.msg.clone() )
+    dut.sim_tick()
+
+  assert not reqs
+  configs = [ int( dut.o_config[i] ) for i in range( num_config_regs ) ]
+  return resps, configs
+
+@pytest.mark.parametrize( "num_config_regs, num_status_regs, seed", [
+  ( 1, 0, 0 ), ( 2, 2, 1 ), ( 3, 1, 2 ), ( 4, 4, 3 ),
+])
+def test_random( num_config_regs, num_status_regs, seed ):
+  reqs = mk_random_reqs( random.Random( seed ), 200,
+                         num_config_regs + num_status_regs )
+  ref = run_terminal( ConfigTerminal, reqs, num_config_regs,
+                      num_status_regs, seed )
+  fl  = run_terminal( ConfigTerminalFL, reqs, num_config_regs,
+                      num_status_regs, seed )
+  assert fl == ref
@@ -7,11 +7,15 @@ Test cases for ConfigTerminal.
 Author : Yanghui Ou
   Date : Sep 20, 2023
 '''
+import time
+
 import pytest
 
 from pymtl3 import *
 from pymtl3.stdlib.stream.StreamSinkFL import StreamSinkFL
 from pymtl3.stdlib.stream.StreamSourceFL import StreamSourceFL
+from pymtl3.stdlib.stream.queues import (StreamBypassQueue, StreamNormalQueue,
+                                         StreamPipeQueue)
 from pymtl3.stdlib.test_utils import config_model_with_cmdline_opts, run_sim
 
 from ...ifcs.msg_types import CfgType, mk_cfg_pkt_type
@@ -21,6 +25,7 @@ from ..ConfigTerminal import ConfigTerminal
 TestPkt = mk_cfg_pkt_type( type_nbits=2, addr_nbits=16, data_nbits=32)
 wr = CfgType.WRITE
 rd = CfgType.READ
+bwr = CfgType.BURST_WRITE
 
 
 def mk_req_resp_msgs( lst ):
@@ -42,11 +47,13 @@ def test_elaborate( num_config_regs, num_status_regs ):
 
 class TestHarness( Component ):
   def construct( s, PacketType, req_msgs, resp_msgs, num_config_regs=2,
-                 num_status_regs=2 ):
+                 num_status_regs=2, qsize=1, QueueType=StreamPipeQueue,
+                 TerminalType=ConfigTerminal ):
     s.src  = StreamSourceFL( PacketType, req_msgs )
     s.sink = StreamSinkFL  ( PacketType, resp_msgs )
-    s.dut = ConfigTerminal( PacketType, num_config_regs=num_config_regs,
-                            num_status_regs=num_status_regs )
+    s.dut = TerminalType( PacketType, num_config_regs=num_config_regs,
+                          num_status_regs=num_status_regs, qsize=qsize,
+                          QueueType=QueueType )
 
     s.src.ostream  //= s.dut.minion_req
     s.sink.istream //= s.dut.minion_resp
@@ -107,3 +114,142 @@ def test_stream_reqs( cmdline_opts, sink_delay ):
   th.set_param( 'top.sink.construct', initial_delay=sink_delay )
   config_model_with_cmdline_opts( th, cmdline_opts, duts=['dut'] )
   run_sim( th, cmdline_opts )
+
+
+@pytest.mark.parametrize( "QueueType, qsize",
+  [ (StreamPipeQueue, 1), (StreamBypassQueue, 1), (StreamNormalQueue, 2),
+    (StreamNormalQueue, 4) ] )
+def test_throughput( cmdline_opts, QueueType, qsize ):
+  num_reqs = 64
+  req_resps = []
+  for i in range( num_reqs ):
+    req_resps.append( (wr, 0x1000 + i % 2, i) )
+    req_resps.append( (wr, 0x1000 + i % 2, 0) )
+  req_msgs, resp_msgs = mk_req_resp_msgs( req_resps )
+  th = TestHarness( TestPkt, req_msgs, resp_msgs, qsize=qsize,
+                    QueueType=QueueType )
+  config_model_with_cmdline_opts( th, cmdline_opts, duts=['dut'] )
+  th.apply( DefaultPassGroup() )
+  th.sim_reset()
+  while not th.done() and th.sim_cycle_count() < 4 * num_reqs:
+    th.sim_tick()
+
+  # One request per cycle plus a few cycles of pipeline fill latency
+  assert th.done()
+  assert th.sim_cycle_count() <= num_reqs + 8
+
+
+def test_burst_wr( cmdline_opts ):
+  # A burst produces a single response after the last beat
+  req_msgs = [
+    TestPkt( bwr, 0x1000, 2 ),
+    TestPkt( bwr, 0x1000, 0xdeadbeef ),
+    TestPkt( bwr, 0x1000, 0xc001cafe ),
+    TestPkt( bwr, 0x1001, 0 ),
+    TestPkt( rd,  0x1000, 0 ),
+    TestPkt( bwr, 0x1001, 1 ),
+    TestPkt( bwr, 0x1001, 0xbadbed00 ),
+    TestPkt( rd,  0x1001, 0 ),
+  ]
+  resp_msgs = [
+    TestPkt( bwr, 0x1000, 0 ),
+    TestPkt( bwr, 0x1001, 0 ),
+    TestPkt( rd,  0x1000, 0xdeadbeef ),
+    TestPkt( bwr, 0x1001, 0 ),
+    TestPkt( rd,  0x1001, 0xbadbed00 ),
+  ]
+  th = TestHarness( TestPkt, req_msgs, resp_msgs )
+  config_model_with_cmdline_opts( th, cmdline_opts, duts=['dut'] )
+  run_sim( th, cmdline_opts )
+
+
+def test_posted_wr_fence( cmdline_opts ):
+  # FENCE needs a 3-bit type field
+  FencePkt = mk_cfg_pkt_type( type_nbits=3, addr_nbits=16, data_nbits=32 )
+  pwr   = CfgType.POSTED_WRITE
+  fence = CfgType.FENCE
+  req_msgs = [
+    FencePkt( pwr,   0x1000, 0xdeadbeef ),
+    FencePkt( pwr,   0x1001, 0xc001cafe ),
+    FencePkt( fence, 0x1000, 0 ),
+    FencePkt( pwr,   0x1000, 0xbadbed00 ),
+    FencePkt( rd,    0x1000, 0 ),
+    FencePkt( rd,    0x1001, 0 ),
+  ]
+  resp_msgs = [
+    FencePkt( fence, 0x1000, 0 ),
+    FencePkt( rd,    0x1000, 0xbadbed00 ),
+    FencePkt( rd,    0x1001, 0xc001cafe ),
+  ]
+  th = TestHarness( FencePkt, req_msgs, resp_msgs )
+  config_model_with_cmdline_opts( th, cmdline_opts, duts=['dut'] )
+  run_sim( th, cmdline_opts )
+
+
+def test_rmw( cmdline_opts ):
+  # Read-modify-write operations return the old value. MASKED_WRITE needs
+  # a 4-bit type field and a mask field.
+  RmwPkt = mk_cfg_pkt_type( type_nbits=4, addr_nbits=16, data_nbits=32,
+                            mask=True )
+  setb   = CfgType.SET_BITS
+  clrb   = CfgType.CLEAR_BITS
+  togb   = CfgType.TOGGLE_BITS
+  mwr    = CfgType.MASKED_WRITE
+  req_msgs = [
+    RmwPkt( wr,   0x1000, 0x0000ff00 ),
+    RmwPkt( setb, 0x1000, 0x00000011 ),
+    RmwPkt( clrb, 0x1000, 0x00001100 ),
+    RmwPkt( togb, 0x1000, 0x000000ff ),
+    RmwPkt( mwr,  0x1000, 0xabcdef12, 0xffff0000 ),
+    RmwPkt( setb, 0x1001, 0x80000000 ),
+    RmwPkt( setb, 0x1002, 0xffffffff ),
+    RmwPkt( rd,   0x1000, 0 ),
+    RmwPkt( rd,   0x1001, 0 ),
+  ]
+  resp_msgs = [
+    RmwPkt( wr,   0x1000, 0 ),
+    RmwPkt( setb, 0x1000, 0x0000ff00 ),
+    RmwPkt( clrb, 0x1000, 0x0000ff11 ),
+    RmwPkt( togb, 0x1000, 0x0000ee11 ),
+    RmwPkt( mwr,  0x1000, 0x0000eeee ),
+    RmwPkt( setb, 0x1001, 0 ),
+    RmwPkt( setb, 0x1002, 2 ),
+    RmwPkt( rd,   0x1000, 0xabcdeeee ),
+    RmwPkt( rd,   0x1001, 0x80000000 ),
+  ]
+  th = TestHarness( RmwPkt, req_msgs, resp_msgs )
+  config_model_with_cmdline_opts( th, cmdline_opts, duts=['dut'] )
+  run_sim( th, cmdline_opts )
+
+
+#-------------------------------------------------------------------------
+# Simulation speed
+#-------------------------------------------------------------------------
+# Writes and reads back every register. Run with -m benchmark -s to see the
+# simulation speed.
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize( "num_regs", [ 2, 32, 256 ] )
+def test_sim_speed( num_regs ):
+  req_resps = []
+  for i in range( num_regs ):
+    req_resps.append( (wr, 0x1000 + i, 0x100 + i) )
+    req_resps.append( (wr, 0x1000 + i, 0        ) )
+  for i in range( num_regs ):
+    req_resps.append( (rd, 0x1000 + i, 0        ) )
+    req_resps.append( (rd, 0x1000 + i, 0x100 + i) )
+  req_msgs, resp_msgs = mk_req_resp_msgs( req_resps )
+  th = TestHarness( TestPkt, req_msgs, resp_msgs, num_config_regs=num_regs,
+                    num_status_regs=0 )
+  th.elaborate()
+  th.apply( DefaultPassGroup() )
+  th.sim_reset()
+
+  start = time.perf_counter()
+  while not th.done():
+    th.sim_tick()
+  elapsed = time.perf_counter() - start
+
+  ncycles = th.sim_cycle_count()
+  print( f'{num_regs:5} regs: {ncycles} cycles, '
+         f'{ncycles/elapsed:.0f} cycles/sec' )
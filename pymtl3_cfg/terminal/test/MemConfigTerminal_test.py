@@ -0,0 +1,186 @@
+'''
+==========================================================================
+MemConfigTerminal_test.py
+==========================================================================
+Test cases for MemConfigTerminal.
+'''
+import time
+
+import pytest
+
+from pymtl3 import *
+from pymtl3.stdlib.stream.StreamSinkFL import StreamSinkFL
+from pymtl3.stdlib.stream.StreamSourceFL import StreamSourceFL
+from pymtl3.stdlib.test_utils import config_model_with_cmdline_opts, run_sim
+
+from ...ifcs.msg_types import CfgType, mk_cfg_pkt_type
+from ..MemConfigTerminal import MemConfigTerminal
+from .ConfigTerminal_test import TestHarness as FlopTestHarness
+
+
+TestPkt = mk_cfg_pkt_type( type_nbits=2, addr_nbits=16, data_nbits=32)
+wr = CfgType.WRITE
+rd = CfgType.READ
+
+
+def mk_req_resp_msgs( lst ):
+  req_msgs =  [ TestPkt( type_, addr, data ) for type_, addr, data in lst[0::2] ]
+  resp_msgs = [ TestPkt( type_, addr, data ) for type_, addr, data in lst[1::2] ]
+  return req_msgs, resp_msgs
+
+
+def mk_table_wr_rd( base, num_entries ):
+  req_resps = []
+  for i in range( num_entries ):
+    req_resps.append( (wr, base + i, 0x1000 + i) )
+    req_resps.append( (wr, base + i, 0         ) )
+  for i in range( num_entries ):
+    req_resps.append( (rd, base + i, 0         ) )
+    req_resps.append( (rd, base + i, 0x1000 + i) )
+  return req_resps
+
+
+@pytest.mark.parametrize( "num_mem_regs, num_config_regs, num_status_regs",
+                          [ (1, 0, 0), (16, 1, 0), (1000, 2, 2) ] )
+def test_elaborate( num_mem_regs, num_config_regs, num_status_regs ):
+  dut = MemConfigTerminal( TestPkt, num_mem_regs=num_mem_regs,
+                           num_config_regs=num_config_regs,
+                           num_status_regs=num_status_regs )
+  dut.elaborate()
+  dut.apply( DefaultPassGroup() )
+  dut.sim_reset()
+  for _ in range(10): dut.sim_tick()
+
+
+class TestHarness( Component ):
+  def construct( s, PacketType, req_msgs, resp_msgs, num_mem_regs=16,
+                 num_config_regs=2, num_status_regs=2 ):
+    s.src  = StreamSourceFL( PacketType, req_msgs )
+    s.sink = StreamSinkFL  ( PacketType, resp_msgs )
+    s.dut = MemConfigTerminal( PacketType, num_mem_regs=num_mem_regs,
+                               num_config_regs=num_config_regs,
+                               num_status_regs=num_status_regs )
+
+    s.mem_raddr = InPort ( s.dut.MemAddrType )
+    s.mem_rdata = OutPort( PacketType.get_field_type( 'data' ) )
+
+    s.src.ostream  //= s.dut.minion_req
+    s.sink.istream //= s.dut.minion_resp
+
+    s.dut.i_mem_raddr //= s.mem_raddr
+    s.dut.o_mem_rdata //= s.mem_rdata
+    for i in range( num_status_regs ):
+      s.dut.i_status[i] //= num_config_regs + i
+
+  def done( s ):
+    return s.src.done() and s.sink.done()
+
+  def line_trace( s ):
+    return s.dut.line_trace()
+
+
+def test_flop_regs( cmdline_opts ):
+  req_resps = [
+    (wr, 0x1000, 0xdeadbeef), (wr, 0x1000, 0),
+    (wr, 0x1001, 0xc001cafe), (wr, 0x1001, 0),
+    (rd, 0x1000, 0         ), (rd, 0x1000, 0xdeadbeef),
+    (rd, 0x1001, 0         ), (rd, 0x1001, 0xc001cafe),
+    (rd, 0x1002, 0         ), (rd, 0x1002, 2),
+    (rd, 0x1003, 0         ), (rd, 0x1003, 3),
+  ]
+  req_msgs, resp_msgs = mk_req_resp_msgs( req_resps )
+  th = TestHarness( TestPkt, req_msgs, resp_msgs )
+  config_model_with_cmdline_opts( th, cmdline_opts, duts=['dut'] )
+  run_sim( th, cmdline_opts )
+  assert th.dut.o_config[0] == 0xdeadbeef
+  assert th.dut.o_config[1] == 0xc001cafe
+
+
+@pytest.mark.parametrize( "num_mem_regs, num_config_regs, num_status_regs",
+                          [ (16, 0, 0), (16, 2, 2), (13, 1, 2) ] )
+def test_mem_regs( cmdline_opts, num_mem_regs, num_config_regs,
+                   num_status_regs ):
+  base = num_config_regs + num_status_regs
+  req_resps = mk_table_wr_rd( base, num_mem_regs )
+  req_msgs, resp_msgs = mk_req_resp_msgs( req_resps )
+  th = TestHarness( TestPkt, req_msgs, resp_msgs, num_mem_regs,
+                    num_config_regs, num_status_regs )
+  config_model_with_cmdline_opts( th, cmdline_opts, duts=['dut'] )
+  run_sim( th, cmdline_opts )
+
+  # Check the table through the block-side read port
+  for i in range( num_mem_regs ):
+    th.mem_raddr @= i
+    th.sim_eval_combinational()
+    assert th.mem_rdata == 0x1000 + i
+
+
+def test_unmapped_addr( cmdline_opts ):
+  req_resps = [
+    (wr, 0x000f, 0xdeadbeef), (wr, 0x000f, 0),
+    (rd, 0x000f, 0         ), (rd, 0x000f, 0),
+    (rd, 0x0000, 0         ), (rd, 0x0000, 0),
+  ]
+  req_msgs, resp_msgs = mk_req_resp_msgs( req_resps )
+  th = TestHarness( TestPkt, req_msgs, resp_msgs, num_mem_regs=12,
+                    num_config_regs=1, num_status_regs=2 )
+  config_model_with_cmdline_opts( th, cmdline_opts, duts=['dut'] )
+  run_sim( th, cmdline_opts )
+
+
+def test_mask_pkt( cmdline_opts ):
+  # Packets with a mask field get responses with a zero mask
+  MaskPkt = mk_cfg_pkt_type( type_nbits=2, addr_nbits=16, data_nbits=32,
+                             mask=True )
+  req_msgs = [
+    MaskPkt( wr, 0x0000, 0xdeadbeef, 0xffffffff ),
+    MaskPkt( wr, 0x0004, 0xc001cafe, 0x0000ffff ),
+    MaskPkt( rd, 0x0000, 0,          0xffffffff ),
+    MaskPkt( rd, 0x0004, 0,          0x0000ffff ),
+  ]
+  resp_msgs = [
+    MaskPkt( wr, 0x0000, 0 ),
+    MaskPkt( wr, 0x0004, 0 ),
+    MaskPkt( rd, 0x0000, 0xdeadbeef ),
+    MaskPkt( rd, 0x0004, 0xc001cafe ),
+  ]
+  th = TestHarness( MaskPkt, req_msgs, resp_msgs )
+  config_model_with_cmdline_opts( th, cmdline_opts, duts=['dut'] )
+  run_sim( th, cmdline_opts )
+
+
+#-------------------------------------------------------------------------
+# Simulation speed
+#-------------------------------------------------------------------------
+# Loads and reads back a full table through a flop-based ConfigTerminal
+# and through a MemConfigTerminal of the same size. Run with
+# -m benchmark -s to see the simulation speed.
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize( "num_regs", [ 16, 256 ] )
+def test_sim_speed( num_regs ):
+  req_resps = mk_table_wr_rd( 0, num_regs )
+  req_msgs, resp_msgs = mk_req_resp_msgs( req_resps )
+
+  harnesses = {
+    'ConfigTerminal'    : FlopTestHarness( TestPkt, req_msgs, resp_msgs,
+                                           num_config_regs=num_regs,
+                                           num_status_regs=0 ),
+    'MemConfigTerminal' : TestHarness( TestPkt, req_msgs, resp_msgs,
+                                       num_mem_regs=num_regs,
+                                       num_config_regs=0, num_status_regs=0 ),
+  }
+
+  for name, th in harnesses.items():
+    th.elaborate()
+    th.apply( DefaultPassGroup() )
+    th.sim_reset()
+
+    start = time.perf_counter()
+    while not th.done():
+      th.sim_tick()
+    elapsed = time.perf_counter() - start
+
+    ncycles = th.sim_cycle_count()
+    print( f'{name:>18} {num_regs:5} regs: {ncycles} cycles, '
+           f'{ncycles/elapsed:.0f} cycles/sec' )
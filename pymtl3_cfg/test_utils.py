@@ -0,0 +1,45 @@
+'''
+==========================================================================
+test_utils.py
+==========================================================================
+Test components shared by the test suites of several packages.
+'''
+from pymtl3 import *
+from pymtl3.stdlib.stream.ifcs import IStreamIfc, OStreamIfc
+
+#-------------------------------------------------------------------------
+# BurstyGate
+#-------------------------------------------------------------------------
+# Passes a stream through but blocks it for stall_cycles after every
+# period transfers, e.g., like a block that is periodically busy.
+
+class BurstyGate( Component ):
+  def construct( s, PacketType, period, stall_cycles ):
+    s.istream = IStreamIfc( PacketType )
+    s.ostream = OStreamIfc( PacketType )
+
+    s.xfer_cnt  = Wire( 16 )
+    s.stall_cnt = Wire( 16 )
+    s.open_     = Wire()
+
+    s.open_       //= lambda: s.stall_cnt == 0
+    s.ostream.msg //= s.istream.msg
+    s.ostream.val //= lambda: s.istream.val & s.open_
+    s.istream.rdy //= lambda: s.ostream.rdy & s.open_
+
+    @update_ff
+    def up_cnt():
+      if s.reset:
+        s.xfer_cnt  <<= 0
+        s.stall_cnt <<= 0
+      elif s.ostream.val & s.ostream.rdy:
+        if s.xfer_cnt == period - 1:
+          s.xfer_cnt  <<= 0
+          s.stall_cnt <<= stall_cycles
+        else:
+          s.xfer_cnt  <<= s.xfer_cnt + 1
+      elif s.stall_cnt != 0:
+        s.stall_cnt <<= s.stall_cnt - 1
+
+  def line_trace( s ):
+    return f'{s.istream}({s.stall_cnt}){s.ostream}'